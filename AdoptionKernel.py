@@ -0,0 +1,122 @@
+from typing import Tuple
+from abc import ABC, abstractmethod
+import numpy as np
+
+import config
+
+#Adoption kernels: the probability that someone reacts to a meme (or fact-check) they have seen x times.
+#The exposure counts are small integers, so instead of evaluating a formula for every exposure,
+#a kernel tabulates its values once and then just looks them up. The table grows when a bigger count shows up.
+#Kernels are plugged into a network per run (SocialNetwork.kernel), so different runs can use different kernels.
+#
+#To add a kernel, subclass AdoptionKernel and implement parameters() and _compute().
+
+
+class AdoptionKernel(ABC):
+    def __init__(self) -> None:
+        self._table = np.zeros(0)
+        self._values: list = []
+        self._parameters = None
+
+    def __call__(self, x: np.ndarray) -> np.ndarray:
+        """
+        Looks up the probabilities for an array of exposure counts (for the vectorised engines).
+        """
+        x = np.asarray(x)
+        if x.size and int(x.max()) >= len(self._table):
+            self._grow(int(x.max()))
+        return self._table[x]
+
+    def probability(self, x: int) -> float:
+        """
+        Looks up the probability for a single exposure count.
+        """
+        if x >= len(self._values):
+            self._grow(x)
+        return self._values[x]
+
+    @abstractmethod
+    def parameters(self) -> tuple:
+        """
+        Returns the values the kernel depends on. When they change, the table is recomputed (see update()).
+        """
+
+    def update(self) -> None:
+        """
+        Recomputes the table if the parameters have changed since it was made. Called once per time step.
+        """
+        if self.parameters() != self._parameters:
+            self.refresh()
+
+    def refresh(self) -> None:
+        """
+        Throws away the table, so it is recomputed with the current parameters.
+        """
+        self._parameters = self.parameters()
+        self._table = np.zeros(0)
+        self._values = []
+
+    def _grow(self, x: int) -> None:
+        #Double the size, so a slowly increasing count doesn't make us recompute the table all the time.
+        if self._parameters is None:
+            self._parameters = self.parameters()
+        size = max(x + 1, 2 * len(self._table), 64)
+        self._table = np.asarray(self._compute(np.arange(size)), dtype=np.float64)
+        self._values = self._table.tolist()
+
+    @abstractmethod
+    def _compute(self, x: np.ndarray) -> np.ndarray:
+        """
+        Evaluates the kernel for an array of exposure counts.
+        """
+
+
+#The kernel of BetaFunction.py: alpha * x * (1 - gamma) ^ (x ^ omega).
+#Parameters that are left out follow config.ALPHA, config.GAMMA and config.OMEGA (also when those change later).
+class BetaKernel(AdoptionKernel):
+    def __init__(self, alpha: float = None, gamma: float = None, omega: float = None) -> None:
+        super().__init__()
+        self.alpha = alpha
+        self.gamma = gamma
+        self.omega = omega
+
+    def parameters(self) -> Tuple[float, float, float]:
+        return (config.ALPHA if self.alpha is None else self.alpha,
+                config.GAMMA if self.gamma is None else self.gamma,
+                config.OMEGA if self.omega is None else self.omega)
+
+    def _compute(self, x: np.ndarray) -> np.ndarray:
+        #Evaluated with python floats rather than NumPy's power, so the values are exactly those of beta_function.
+        alpha, gamma, omega = self._parameters
+        return np.array([alpha * count * (1 - gamma) ** (count ** omega) for count in x.tolist()])
+
+
+#Nobody reacts until they have seen something threshold times, from then on they react with the given probability.
+class ThresholdKernel(AdoptionKernel):
+    def __init__(self, threshold: int, probability: float = 1.0) -> None:
+        super().__init__()
+        self.threshold = threshold
+        self.probability_above = probability
+
+    def parameters(self) -> Tuple[int, float]:
+        return (self.threshold, self.probability_above)
+
+    def _compute(self, x: np.ndarray) -> np.ndarray:
+        threshold, probability = self._parameters
+        return np.where(x >= threshold, probability, 0.0)
+
+
+#The probability rises with every exposure, but levels off at maximum: maximum * x / (x + half_saturation).
+#(After half_saturation exposures, the probability is half the maximum.)
+class SaturatingKernel(AdoptionKernel):
+    def __init__(self, maximum: float, half_saturation: float) -> None:
+        super().__init__()
+        self.maximum = maximum
+        self.half_saturation = half_saturation
+
+    def parameters(self) -> Tuple[float, float]:
+        return (self.maximum, self.half_saturation)
+
+    def _compute(self, x: np.ndarray) -> np.ndarray:
+        maximum, half_saturation = self._parameters
+        return maximum * x / (x + half_saturation)
@@ -0,0 +1,295 @@
+from typing import Callable, Dict, List, NamedTuple
+import gc
+import json
+import os
+import pickle
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+
+from SocialNetwork import SocialNetwork
+from Bianconi import BianconiBarabasiModel
+from GraphCache import cache_path
+import config
+
+#Benchmarks of the main components: the graph generators, importing, seeding, hub detection and evolve_state,
+#on random (Erdos-Renyi) and Bianconi graphs of every size in config.benchmark_scales, all with fixed seeds.
+#For every component, it measures the wall time (the fastest of benchmark_repeats runs), the peak memory it allocates
+#and, for the simulation, the spreading events processed per second.
+#
+#Run it with "python Benchmark.py". The first run stores its results in config.benchmark_baseline_path.
+#Later runs are compared with that baseline, and the script exits with status 1 if any component became slower
+#(or needs more memory) than config.benchmark_tolerance allows. Timings depend on the computer, so make the baseline
+#on the computer you compare on: delete the file to make a new one (e.g. after a deliberate change).
+
+SEED = 12345
+#The average number of edges per person (in plus out) of the synthetic graphs.
+AVERAGE_DEGREE = 10
+#The networkx backend and the python engine are only benchmarked up to this many people (they are too slow beyond that).
+SLOW_PATH_LIMIT = 100_000
+#The original Bianconi generator takes O(N^2) time, so it is only benchmarked up to this many people.
+QUADRATIC_LIMIT = 10_000
+#Timings this small (in seconds) are noise, so a regression must be at least this much slower.
+MIN_DIFFERENCE = 0.005
+
+
+#One benchmark. setup() prepares whatever run() needs (and is not measured).
+#For the simulation, run() returns the number of spreading events it processed (other return values are ignored).
+class Case(NamedTuple):
+    name: str
+    num_people: int
+    setup: Callable[[], object]
+    run: Callable[[object], object]
+
+
+class Result(NamedTuple):
+    seconds: float
+    peak_bytes: int
+    events_per_second: float
+
+
+def run_benchmarks(scales: List[int], repeats: int = 3, real_data_path: str = None) -> Dict[str, Result]:
+    """
+    Runs all benchmarks.
+    :param scales: the sizes of the synthetic graphs (numbers of people).
+    :param repeats: optional. How often each benchmark is timed; the fastest time counts.
+    :param real_data_path: optional. A network file (like config.input_data_path) to benchmark as well.
+    :return: the result of each benchmark, by "name@num_people".
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for num_people in scales:
+            for case in synthetic_cases(num_people, work_dir):
+                results[f"{case.name}@{case.num_people}"] = measure(case, repeats)
+                print(f"{case.name}@{case.num_people}: {format_result(results[f'{case.name}@{case.num_people}'])}")
+        if real_data_path:
+            for case in real_data_cases(real_data_path):
+                results[f"{case.name}@real"] = measure(case, repeats)
+                print(f"{case.name}@real: {format_result(results[f'{case.name}@real'])}")
+    return results
+
+
+def measure(case: Case, repeats: int) -> Result:
+    """
+    Runs case.run once to measure its peak memory (which also warms up caches), then times it repeats times.
+    Memory is measured separately, because tracing the allocations slows the run down.
+    Like timeit, the garbage collector is switched off while timing, so its pauses don't add noise.
+    """
+    state = case.setup()
+    tracemalloc.start()
+    case.run(state)
+    peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del state
+
+    best = float("inf")
+    events = 0
+    for _ in range(repeats):
+        state = case.setup()
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            result = case.run(state)
+            best = min(best, time.perf_counter() - start)
+        finally:
+            gc.enable()
+        events = result if isinstance(result, int) else 0
+        del state
+    return Result(best, peak_bytes, events / best if events and best > 0 else 0.0)
+
+
+def synthetic_cases(num_people: int, work_dir: str) -> List[Case]:
+    """
+    The benchmarks on synthetic graphs of num_people people.
+    Expensive inputs (networks and files) are made once, the first time a benchmark needs them.
+    """
+    follow_prob = AVERAGE_DEGREE / 2 / (num_people - 1)
+    edges_per_step = AVERAGE_DEGREE // 2
+    inputs = {}
+
+    def seeded_network(backend: str, engine: str, model: str = "random") -> Callable[[], SocialNetwork]:
+        #The network is built and seeded once; every run restores it from a snapshot, so all runs are identical.
+        def setup() -> SocialNetwork:
+            key = (backend, engine, model)
+            if key not in inputs:
+                if model == "random":
+                    sn = SocialNetwork.create_random(num_people, follow_prob, backend=backend, seed=SEED)
+                else:
+                    bianconi_model = BianconiBarabasiModel(num_people, edges_per_step, seed=SEED)
+                    bianconi_model.run()
+                    sn = SocialNetwork.from_bianconi(bianconi_model, backend=backend, seed=SEED)
+                sn.set_engine(engine)
+                sn.seed_meme(max(1, num_people // 100))
+                inputs[key] = (sn, sn.snapshot())
+            sn, snapshot = inputs[key]
+            sn.restore(snapshot)
+            return sn
+        return setup
+
+    def unseeded_network(backend: str) -> Callable[[], SocialNetwork]:
+        def setup() -> SocialNetwork:
+            sn = seeded_network(backend, "python")()
+            sn.reset_state()
+            sn.clear_centrality()
+            return sn
+        return setup
+
+    def igraph_file(build_cache: bool) -> Callable[[], str]:
+        def setup() -> str:
+            path = os.path.join(work_dir, f"random_{num_people}.pkl")
+            if not os.path.exists(path):
+                import igraph
+                sources, targets = SocialNetwork.create_random(num_people, follow_prob, backend="compact", seed=SEED).graph.edges()
+                #igraph edges go from follower to user.
+                with open(path, "wb") as f:
+                    pickle.dump(igraph.Graph(n=num_people, edges=np.column_stack([targets, sources]).tolist(), directed=True), f)
+            shutil.rmtree(cache_path(path), ignore_errors=True)
+            if build_cache:
+                SocialNetwork.import_from_igraph(path, backend="compact", use_cache=True, seed=SEED)
+            return path
+        return setup
+
+    def grow(fast: bool) -> Callable[[], BianconiBarabasiModel]:
+        def setup() -> BianconiBarabasiModel:
+            return BianconiBarabasiModel(num_people, edges_per_step, fast=fast, seed=SEED)
+        return setup
+
+    def bianconi_model() -> BianconiBarabasiModel:
+        model = BianconiBarabasiModel(num_people, edges_per_step, seed=SEED)
+        model.run()
+        return model
+
+    cases = [
+        Case("create_random[compact]", num_people, lambda: None,
+             lambda _: SocialNetwork.create_random(num_people, follow_prob, backend="compact", seed=SEED)),
+        Case("bianconi.grow_network_fast", num_people, grow(True), lambda model: model.run()),
+        Case("from_bianconi[compact]", num_people, bianconi_model,
+             lambda model: SocialNetwork.from_bianconi(model, backend="compact", seed=SEED)),
+        Case("seed_meme[compact]", num_people, unseeded_network("compact"),
+             lambda sn: sn.seed_meme(max(1, num_people // 100))),
+        Case("identify_hub_nodes[compact]", num_people, unseeded_network("compact"),
+             lambda sn: sn.identify_hub_nodes(0.99)),
+        Case("evolve_state[vectorized]", num_people, seeded_network("compact", "vectorized"), run_cascade),
+        Case("evolve_state[vectorized,bianconi]", num_people, seeded_network("compact", "vectorized", "bianconi"), run_cascade),
+    ]
+    if _has_igraph():
+        cases += [
+            Case("import_from_igraph[pickle]", num_people, igraph_file(False),
+                 lambda path: SocialNetwork.import_from_igraph(path, backend="compact", use_cache=False, seed=SEED)),
+            Case("import_from_igraph[build_cache]", num_people, igraph_file(False),
+                 lambda path: SocialNetwork.import_from_igraph(path, backend="compact", use_cache=True, seed=SEED)),
+            Case("import_from_igraph[cached]", num_people, igraph_file(True),
+                 lambda path: SocialNetwork.import_from_igraph(path, backend="compact", use_cache=True, seed=SEED)),
+        ]
+    if num_people <= QUADRATIC_LIMIT:
+        cases.append(Case("bianconi.grow_network", num_people, grow(False), lambda model: model.run()))
+    if num_people <= SLOW_PATH_LIMIT:
+        cases += [
+            Case("create_random[networkx]", num_people, lambda: None,
+                 lambda _: SocialNetwork.create_random(num_people, follow_prob, backend="networkx", seed=SEED)),
+            Case("seed_meme[networkx]", num_people, unseeded_network("networkx"),
+                 lambda sn: sn.seed_meme(max(1, num_people // 100))),
+            Case("identify_hub_nodes[networkx]", num_people, unseeded_network("networkx"),
+                 lambda sn: sn.identify_hub_nodes(0.99)),
+            Case("evolve_state[python,compact]", num_people, seeded_network("compact", "python"), run_cascade),
+            Case("evolve_state[python,networkx]", num_people, seeded_network("networkx", "python"), run_cascade),
+        ]
+    return cases
+
+
+def run_cascade(sn: SocialNetwork) -> int:
+    """
+    Evolves a seeded network until nothing is left to spread.
+    :return: the number of spreading events processed.
+    """
+    while sn.num_pending_events() > 0:
+        sn.evolve_state()
+    return sum(record.events_processed for record in sn.step_history)
+
+
+def real_data_cases(path: str) -> List[Case]:
+    """
+    The benchmarks on a real network file: importing it (from its cache, if it has one) and simulating on it.
+    """
+    def load() -> SocialNetwork:
+        if path.endswith(".pkl"):
+            return SocialNetwork.import_from_igraph(path, backend="compact", use_cache=True, seed=SEED)
+        return SocialNetwork.import_from_edge_list(path, backend="compact", seed=SEED)
+
+    network = {}
+
+    def seeded() -> SocialNetwork:
+        if "sn" not in network:
+            sn = load()
+            sn.set_engine("vectorized")
+            sn.seed_meme(config.num_with_initial_meme)
+            network["sn"] = (sn, sn.snapshot())
+        sn, snapshot = network["sn"]
+        sn.restore(snapshot)
+        return sn
+
+    return [
+        Case("import", 0, lambda: None, lambda _: load()),
+        Case("evolve_state[vectorized]", 0, seeded, run_cascade),
+    ]
+
+
+def compare(results: Dict[str, Result], baseline: Dict[str, Result], tolerance: float) -> List[str]:
+    """
+    :return: a description of every benchmark that is slower, or needs more memory, than the baseline allows.
+    """
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        base = baseline[key]
+        if result.seconds > base.seconds * (1 + tolerance) + MIN_DIFFERENCE:
+            regressions.append(f"{key}: {result.seconds:.4f}s instead of {base.seconds:.4f}s")
+        if result.peak_bytes > base.peak_bytes * (1 + tolerance) + (1 << 20):
+            regressions.append(f"{key}: {result.peak_bytes / 2**20:.1f} MiB instead of {base.peak_bytes / 2**20:.1f} MiB")
+    return regressions
+
+
+def format_result(result: Result) -> str:
+    text = f"{result.seconds:.4f}s, {result.peak_bytes / 2**20:.1f} MiB"
+    if result.events_per_second:
+        text += f", {result.events_per_second:,.0f} events/s"
+    return text
+
+
+def save_results(path: str, results: Dict[str, Result]) -> None:
+    with open(path, "w") as f:
+        json.dump({"machine": platform.platform(), "python": platform.python_version(),
+                   "results": {key: result._asdict() for key, result in results.items()}}, f, indent=1)
+
+
+def load_results(path: str) -> Dict[str, Result]:
+    with open(path) as f:
+        return {key: Result(**result) for key, result in json.load(f)["results"].items()}
+
+
+def _has_igraph() -> bool:
+    try:
+        import igraph
+    except ImportError:
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    results = run_benchmarks(config.benchmark_scales, config.benchmark_repeats, config.benchmark_real_data)
+    if not os.path.exists(config.benchmark_baseline_path):
+        save_results(config.benchmark_baseline_path, results)
+        print(f"Baseline saved to {config.benchmark_baseline_path}")
+        sys.exit(0)
+    regressions = compare(results, load_results(config.benchmark_baseline_path), config.benchmark_tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        sys.exit(1)
+    print(f"No regressions compared with {config.benchmark_baseline_path}")
@@ -3,25 +3,48 @@ import numpy as np
 import matplotlib.pyplot as plt
 
 class BianconiBarabasiModel:
-    def __init__(self, N, m):
+    def __init__(self, N, m, fast=True, seed=None):
         """
         N: total number of nodes
         m: add m egdes to the network each setp
+        fast: if True, grow the network with grow_network_fast (same model, but O(N) instead of O(N^2)).
+              The edges are then stored as an array and the networkx graph is only built if get_graph() is called.
+        seed: Seed for the random numbers (an int or a numpy SeedSequence). The same seed gives the same network.
         fitness_distribution: Distribution of fitness values
         """
         self.N = N
         self.m = m
+        self.fast = fast
         self.graph = nx.Graph()
         self.fitness = {}
+        self.edges = None
+        self.fitness_array = None
+        self.rng = np.random.default_rng(seed)
 
     def _get_fitness(self):
-        return np.random.uniform(0.01, 1.0)
+        return self.rng.uniform(0.01, 1.0)
 
     def get_graph(self):
+        if self.edges is not None and self.graph.number_of_nodes() == 0:
+            self.graph.add_nodes_from(range(self.N))
+            self.graph.add_edges_from(self.edges.tolist())
         return self.graph
 
     def get_fitness_dict(self):
+        if self.fitness_array is not None and not self.fitness:
+            self.fitness = dict(enumerate(self.fitness_array.tolist()))
         return self.fitness
+
+    def get_num_nodes(self):
+        return self.N if self.edges is not None else self.graph.number_of_nodes()
+
+    def get_edges(self):
+        """
+        Returns the (undirected) edges as an array of shape (num_edges, 2).
+        """
+        if self.edges is not None:
+            return self.edges
+        return np.array(self.graph.edges(), dtype=np.int64).reshape(-1, 2)
     
     def initialize_network(self):
         # create a complete graph with m nodes
@@ -48,7 +71,7 @@ class BianconiBarabasiModel:
 
             # add edges
             existing_nodes = list(self.graph.nodes())
-            targets = np.random.choice(existing_nodes, size=self.m, replace=False, p=probs)
+            targets = self.rng.choice(existing_nodes, size=self.m, replace=False, p=probs)
             self.graph.add_node(new_node)
             for target in targets:
                 self.graph.add_edge(new_node, target)
@@ -58,12 +81,58 @@ class BianconiBarabasiModel:
             etas = np.append(etas, eta_new)  # Append new node's fitness
 
 
+    def grow_network_fast(self):
+        """
+        Grows the whole network (including the initial complete graph) straight into an edge array.
+        Same model as initialize_network + grow_network, but each new node costs O(m) instead of O(N):
+        a node is proposed with probability proportional to its degree, by picking a random endpoint of a random edge,
+        and accepted with probability equal to its fitness (fitness <= 1), which together makes the probability
+        proportional to degree * fitness. Rejecting nodes that were already picked gives sampling without replacement.
+        """
+        N, m = self.N, self.m
+        fitness = self.rng.uniform(0.01, 1.0, N)
+        fitness_list = fitness.tolist()
+
+        #Every edge adds both of its endpoints to this list, so each node appears (degree) times.
+        initial_edges = [(i, j) for i in range(m) for j in range(i + 1, m)]
+        endpoints = [node for edge in initial_edges for node in edge]
+        targets = []
+        uniforms = []
+        next_uniform = 0
+        for new_node in range(m, N):
+            chosen = []
+            while len(chosen) < m:
+                if next_uniform + 2 > len(uniforms):
+                    uniforms = self.rng.random(1 << 16).tolist()
+                    next_uniform = 0
+                if endpoints:
+                    candidate = endpoints[int(uniforms[next_uniform] * len(endpoints))]
+                    accepted = uniforms[next_uniform + 1] < fitness_list[candidate]
+                else:
+                    #Nobody has any edges yet (only possible when m == 1): pick uniformly.
+                    candidate = int(uniforms[next_uniform] * new_node)
+                    accepted = True
+                next_uniform += 2
+                if accepted and candidate not in chosen:
+                    chosen.append(candidate)
+            for target in chosen:
+                endpoints.append(new_node)
+                endpoints.append(target)
+            targets.extend(chosen)
+
+        grown_edges = np.column_stack([np.repeat(np.arange(m, N, dtype=np.int64), m), np.array(targets, dtype=np.int64)])
+        self.edges = np.concatenate([np.array(initial_edges, dtype=np.int64).reshape(-1, 2), grown_edges])
+        self.fitness_array = fitness
+
     def run(self):
+        if self.fast:
+            self.grow_network_fast()
+            return
         self.initialize_network()
         self.grow_network()
 
     def plot_degree_distribution(self, loglog=True):
-        degrees = [self.graph.degree(n) for n in self.graph.nodes()]
+        degrees = [self.get_graph().degree(n) for n in self.get_graph().nodes()]
         plt.figure(figsize=(8, 5))
         if loglog:
             plt.hist(degrees, bins=np.logspace(np.log10(1), np.log10(max(degrees)), 50), log=True)
@@ -76,20 +145,22 @@ class BianconiBarabasiModel:
         plt.show()
 
     def plot_network(self, node_size_factor=50):        
-        pos = nx.spring_layout(self.graph, seed=42)  
+        graph = self.get_graph()
+        fitness = self.get_fitness_dict()
+        pos = nx.spring_layout(graph, seed=42)  
 
-        degrees = dict(self.graph.degree())
-        node_sizes = [degrees[n] * node_size_factor for n in self.graph.nodes()]
-        node_colors = [self.fitness[n] for n in self.graph.nodes()] 
+        degrees = dict(graph.degree())
+        node_sizes = [degrees[n] * node_size_factor for n in graph.nodes()]
+        node_colors = [fitness[n] for n in graph.nodes()] 
 
         nodes = nx.draw_networkx_nodes(
-            self.graph, pos, node_size=node_sizes, node_color=node_colors, cmap=plt.cm.viridis
+            graph, pos, node_size=node_sizes, node_color=node_colors, cmap=plt.cm.viridis
         )
-        nx.draw_networkx_edges(self.graph, pos, alpha=0.3)
+        nx.draw_networkx_edges(graph, pos, alpha=0.3)
 
         # add label
-        labels = {n: str(degrees[n]) for n in self.graph.nodes()}
-        nx.draw_networkx_labels(self.graph, pos, labels=labels, font_size=8, font_color="white")
+        labels = {n: str(degrees[n]) for n in graph.nodes()}
+        nx.draw_networkx_labels(graph, pos, labels=labels, font_size=8, font_color="white")
 
         plt.colorbar(nodes, label="Fitness (η)")
         plt.title("Network Visualization")
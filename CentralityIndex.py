@@ -0,0 +1,181 @@
+from typing import Dict
+import contextlib
+import os
+import tempfile
+import numpy as np
+
+from CompactGraph import CompactGraph
+from FrontierEngine import expand_followers
+
+#Centrality scores of every person, computed once per graph and then reused (see SocialNetwork.centrality()).
+#Edges go from a person to their followers, so "out_degree" is the number of followers and "in_degree" the number
+#of people someone follows. The measures are:
+# - "degree": (in-degree + out-degree) / (n - 1), like nx.degree_centrality,
+# - "in_degree" and "out_degree": in-degree / (n - 1) and out-degree / (n - 1),
+# - "pagerank": PageRank of the follow graph (being followed by important people makes you important),
+# - "kcore": the core number, treating the graph as undirected (like nx.core_number).
+#If the graph is memory-mapped from a graph cache (see GraphCache.py), the scores are also saved in the cache
+#directory, keyed by the graph's fingerprint, so the next run on the same graph doesn't have to compute them again.
+
+MEASURES = ["degree", "in_degree", "out_degree", "pagerank", "kcore"]
+
+
+class CentralityIndex:
+    def __init__(self, graph: CompactGraph, cache_dir: str = None, scores: Dict[str, np.ndarray] = None) -> None:
+        """
+        :param graph: The graph. If its edges change, make a new index (SocialNetwork.centrality() does this for you).
+        :param cache_dir: optional. Where to save the scores (default: in the graph cache, if the graph comes from one).
+        :param scores: optional. Scores of the graph that are already known (by measure), e.g. computed by another process.
+        """
+        self.graph = graph
+        self.cache_dir = cache_dir or _graph_cache_dir(graph)
+        self._scores: Dict[str, np.ndarray] = dict(scores or {})
+
+    def scores(self, measure: str) -> np.ndarray:
+        """
+        Returns the centrality of every person (indexed by id) according to the given measure.
+        """
+        if measure not in self._scores:
+            self._scores[measure] = self._load(measure)
+        return self._scores[measure]
+
+    def top_fraction(self, measure: str, threshold: float) -> np.ndarray:
+        """
+        Returns the ids of the people whose score is at least the threshold-quantile of all scores
+        (e.g. threshold=0.99 gives the top 1%), from most to least central. Ties are ordered by id.
+        """
+        scores = self.scores(measure)
+        if len(scores) == 0:
+            return np.zeros(0, dtype=np.int64)
+        candidates = np.flatnonzero(scores >= np.percentile(scores, threshold * 100))
+        return candidates[np.lexsort((candidates, -scores[candidates]))]
+
+    def top_k(self, measure: str, k: int) -> np.ndarray:
+        """
+        Returns the ids of the k most central people, from most to least central.
+        """
+        scores = self.scores(measure)
+        k = min(k, len(scores))
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64)
+        candidates = np.argpartition(-scores, k - 1)[:k]
+        return candidates[np.lexsort((candidates, -scores[candidates]))]
+
+    #---Private Methods---------------------------------------------------
+    def _load(self, measure: str) -> np.ndarray:
+        if measure not in MEASURES:
+            raise ValueError(f"Unknown centrality measure: {measure} (choose from {MEASURES})")
+        path = None
+        if self.cache_dir is not None:
+            path = os.path.join(self.cache_dir, "centrality", f"{measure}_{self.graph.fingerprint()[:16]}.npy")
+            if os.path.exists(path):
+                return np.load(path)
+
+        scores = getattr(self, "_compute_" + measure)()
+        if path is not None:
+            temporary = None
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                #Every writer gets its own temporary file, so processes computing the same measure (e.g. ensemble workers)
+                #don't write to the same file. Whichever finishes last replaces the file; the scores are the same anyway.
+                descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f"{measure}_", suffix=".tmp.npy")
+                with os.fdopen(descriptor, "wb") as f:
+                    np.save(f, scores)
+                os.replace(temporary, path)
+            except OSError:
+                #A read-only cache (or a failed replace): we just don't get to reuse the scores next time.
+                if temporary is not None:
+                    with contextlib.suppress(OSError):
+                        os.remove(temporary)
+        return scores
+
+    def _normalise(self, degree: np.ndarray) -> np.ndarray:
+        n = self.graph.number_of_nodes()
+        #Multiplied by 1 / (n - 1), exactly like networkx does, so the scores are identical.
+        return degree * (1.0 / (n - 1)) if n > 1 else np.ones(n)
+
+    def _compute_degree(self) -> np.ndarray:
+        return self._normalise(self.graph.in_degree() + self.graph.out_degree())
+
+    def _compute_in_degree(self) -> np.ndarray:
+        return self._normalise(self.graph.in_degree())
+
+    def _compute_out_degree(self) -> np.ndarray:
+        return self._normalise(self.graph.out_degree())
+
+    def _compute_pagerank(self, damping: float = 0.85, tolerance: float = 1e-6, max_iterations: int = 100) -> np.ndarray:
+        """
+        Power iteration, with the same parameters and stopping rule as nx.pagerank on the follow graph.
+        A person passes their rank on to everyone they follow, so rank flows from followers to the people they follow.
+        """
+        n = self.graph.number_of_nodes()
+        if n == 0:
+            return np.zeros(0)
+        offsets = self.graph.offsets
+        targets = self.graph.targets
+        num_following = self.graph.in_degree()
+        #np.add.reduceat sums from every start to the next one, so it only gets the people with followers
+        #(whose starts are increasing), and the sums are put back in place. People without followers receive nothing.
+        has_followers = np.flatnonzero(offsets[1:] > offsets[:-1])
+        starts = offsets[:-1][has_followers]
+        dangling = num_following == 0
+
+        rank = np.full(n, 1.0 / n)
+        received = np.zeros(n)
+        for _ in range(max_iterations):
+            share = np.divide(rank, num_following, out=np.zeros(n), where=~dangling)
+            if len(targets):
+                received[has_followers] = np.add.reduceat(share[targets], starts)
+            new_rank = damping * received + (damping * rank[dangling].sum() + 1 - damping) / n
+            error = np.abs(new_rank - rank).sum()
+            rank = new_rank
+            if error < n * tolerance:
+                break
+        return rank
+
+    def _compute_kcore(self) -> np.ndarray:
+        """
+        Peels the graph like nx.core_number: repeatedly remove everyone with at most k remaining neighbours.
+        All the people that can be removed at once are removed in one vectorised batch.
+        """
+        n = self.graph.number_of_nodes()
+        offsets = self.graph.offsets
+        targets = self.graph.targets
+        sources = np.repeat(np.arange(n), np.diff(offsets))
+        #The reverse graph: for every person, the people they follow.
+        order = np.argsort(targets, kind="stable")
+        reverse_offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(targets, minlength=n), out=reverse_offsets[1:])
+        reverse_targets = sources[order]
+        del sources, order
+
+        degree = (self.graph.in_degree() + self.graph.out_degree()).astype(np.int64)
+        core = np.zeros(n, dtype=np.int64)
+        removed = np.zeros(n, dtype=bool)
+        num_removed = 0
+        k = 0
+        while num_removed < n:
+            k = max(k, int(degree[~removed].min()))
+            batch = np.flatnonzero(~removed & (degree <= k))
+            while len(batch):
+                core[batch] = k
+                removed[batch] = True
+                num_removed += len(batch)
+                neighbours = np.concatenate([expand_followers(offsets, targets, batch)[0],
+                                             expand_followers(reverse_offsets, reverse_targets, batch)[0]]).astype(np.int64)
+                neighbours = neighbours[~removed[neighbours]]
+                candidates, counts = np.unique(neighbours, return_counts=True)
+                degree[candidates] -= counts
+                batch = candidates[degree[candidates] <= k]
+        return core.astype(np.float64)
+
+
+#---Private Methods---------------------------------------------------
+def _graph_cache_dir(graph: CompactGraph) -> str | None:
+    """
+    Returns the graph cache directory the graph's arrays are memory-mapped from, or None.
+    """
+    offsets = graph.offsets
+    if isinstance(offsets, np.memmap) and offsets.filename is not None:
+        return os.path.dirname(offsets.filename)
+    return None
@@ -0,0 +1,205 @@
+from typing import Tuple
+import hashlib
+import numpy as np
+import networkx as nx
+
+
+def index_dtype(max_value: int) -> type:
+    """
+    Returns the smallest integer type we use for indices up to max_value.
+    """
+    return np.int32 if max_value < np.iinfo(np.int32).max else np.int64
+
+
+#A compact, array-backed directed graph in CSR (compressed sparse row) format.
+#Nodes are the integers 0..n-1. The followers of node u are targets[offsets[u]:offsets[u+1]].
+#Edges can still be added one by one: they are buffered and the CSR arrays are rebuilt lazily.
+class CompactGraph:
+    def __init__(self, num_nodes: int = 0) -> None:
+        self.num_nodes: int = num_nodes
+        self._offsets = np.zeros(num_nodes + 1, dtype=np.int32)
+        self._targets = np.zeros(0, dtype=np.int32)
+        self._pending_sources = []
+        self._pending_targets = []
+        self._fingerprint = None
+        #Increases whenever nodes or edges are added or removed, so derived data (such as a CentralityIndex) can tell it is stale.
+        self.version: int = 0
+
+    @staticmethod
+    def from_edges(num_nodes: int, sources: np.ndarray, targets: np.ndarray) -> 'CompactGraph':
+        """
+        Builds a graph directly from edge arrays (edge i goes from sources[i] to targets[i]).
+        Parallel edges are merged, just like in a networkx DiGraph.
+        """
+        graph = CompactGraph(num_nodes)
+        graph._set_edges(np.asarray(sources), np.asarray(targets))
+        return graph
+
+    @staticmethod
+    def from_csr(offsets: np.ndarray, targets: np.ndarray, fingerprint: str = None) -> 'CompactGraph':
+        """
+        Wraps existing CSR arrays without copying them (they may be memory-mapped or shared).
+        The arrays are assumed to be sorted and free of parallel edges.
+        :param fingerprint: optional. The fingerprint() of these arrays, if it is already known.
+        """
+        graph = CompactGraph(0)
+        graph.num_nodes = len(offsets) - 1
+        graph._offsets = offsets
+        graph._targets = targets
+        graph._fingerprint = fingerprint
+        return graph
+
+    #---Construction---------------------------------------------------
+    def add_node(self) -> int:
+        """
+        Adds a new node and returns its index.
+        """
+        self.num_nodes += 1
+        self.version += 1
+        return self.num_nodes - 1
+
+    def add_edge(self, source: int, target: int) -> None:
+        if source >= self.num_nodes or target >= self.num_nodes:
+            raise ValueError(f"Edge ({source}, {target}) refers to a node that does not exist.")
+        self._pending_sources.append(source)
+        self._pending_targets.append(target)
+        self._fingerprint = None
+        self.version += 1
+
+    def remove_edges(self, remove_mask: np.ndarray) -> None:
+        """
+        Removes every edge i for which remove_mask[i] is True (edges indexed in CSR order, see edges()).
+        """
+        sources, targets = self.edges()
+        keep = ~np.asarray(remove_mask, dtype=bool)
+        self._set_edges(sources[keep], targets[keep])
+
+    #---Queries---------------------------------------------------
+    @property
+    def offsets(self) -> np.ndarray:
+        self._build()
+        return self._offsets
+
+    @property
+    def targets(self) -> np.ndarray:
+        self._build()
+        return self._targets
+
+    def successors(self, node: int) -> np.ndarray:
+        self._build()
+        return self._targets[self._offsets[node]:self._offsets[node + 1]]
+
+    def number_of_nodes(self) -> int:
+        return self.num_nodes
+
+    def number_of_edges(self) -> int:
+        self._build()
+        return len(self._targets)
+
+    def out_degree(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def in_degree(self) -> np.ndarray:
+        return np.bincount(self.targets, minlength=self.num_nodes)
+
+    def edges(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the (sources, targets) arrays of all edges, in CSR order.
+        """
+        self._build()
+        return self._csr_edges()
+
+    def fingerprint(self) -> str:
+        """
+        Returns a hash of the edge set, so results computed on this graph can be recognised later.
+        """
+        if self._fingerprint is None or len(self._offsets) != self.num_nodes + 1:
+            digest = hashlib.sha256()
+            digest.update(np.int64(self.num_nodes).tobytes())
+            digest.update(np.ascontiguousarray(self.offsets, dtype=np.int64).tobytes())
+            digest.update(np.ascontiguousarray(self.targets, dtype=np.int64).tobytes())
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    def masked(self, keep: np.ndarray) -> 'CompactGraph':
+        """
+        Returns a new graph with only the edges i for which keep[i] is True (edges indexed in CSR order, see edges()).
+        Unlike remove_edges, this leaves this graph alone, and it takes one linear pass without any sorting.
+        """
+        keep = np.asarray(keep, dtype=bool)
+        kept_before = np.zeros(len(keep) + 1, dtype=np.int64)
+        np.cumsum(keep, out=kept_before[1:])
+        offsets = kept_before[self.offsets].astype(index_dtype(int(kept_before[-1])))
+        return CompactGraph.from_csr(offsets, self.targets[keep])
+
+    def subgraph(self, node_ids: np.ndarray) -> 'CompactGraph':
+        """
+        Returns the subgraph induced by the given nodes. They are renumbered 0..k-1 in increasing order of their old ids.
+        """
+        node_ids = np.unique(node_ids)
+        if len(node_ids) == self.num_nodes:
+            return self
+        new_ids = np.full(self.num_nodes, -1, dtype=np.int64)
+        new_ids[node_ids] = np.arange(len(node_ids))
+        sources, targets = self.edges()
+        sources = new_ids[sources]
+        targets = new_ids[targets]
+        keep = (sources >= 0) & (targets >= 0)
+        return CompactGraph.from_edges(len(node_ids), sources[keep], targets[keep])
+
+    def to_networkx(self, nodes=None) -> nx.DiGraph:
+        """
+        Converts the graph into a networkx DiGraph.
+        :param nodes: optional. Sequence of node objects to use instead of the integers 0..n-1.
+        """
+        sources, targets = self.edges()
+        graph = nx.DiGraph()
+        if nodes is None:
+            graph.add_nodes_from(range(self.num_nodes))
+            graph.add_edges_from(zip(sources.tolist(), targets.tolist()))
+        else:
+            nodes = list(nodes)
+            graph.add_nodes_from(nodes)
+            graph.add_edges_from((nodes[u], nodes[v]) for u, v in zip(sources.tolist(), targets.tolist()))
+        return graph
+
+    #---Private Methods---------------------------------------------------
+    def _build(self) -> None:
+        """
+        Merges any buffered edges into the CSR arrays.
+        """
+        if len(self._offsets) != self.num_nodes + 1:
+            #Nodes were added since the last build: they have no followers yet.
+            padding = np.full(self.num_nodes + 1 - len(self._offsets), self._offsets[-1], dtype=self._offsets.dtype)
+            self._offsets = np.concatenate([self._offsets, padding])
+        if not self._pending_sources:
+            return
+        sources, targets = self._csr_edges()
+        sources = np.concatenate([sources, np.asarray(self._pending_sources, dtype=sources.dtype)])
+        targets = np.concatenate([targets, np.asarray(self._pending_targets, dtype=targets.dtype)])
+        self._pending_sources = []
+        self._pending_targets = []
+        self._set_edges(sources, targets)
+
+    def _csr_edges(self) -> Tuple[np.ndarray, np.ndarray]:
+        sources = np.repeat(np.arange(self.num_nodes, dtype=self._targets.dtype), np.diff(self._offsets))
+        return sources, self._targets
+
+    def _set_edges(self, sources: np.ndarray, targets: np.ndarray) -> None:
+        """
+        Replaces all edges with the given ones, sorting them by source and merging duplicates.
+        """
+        keys = sources.astype(np.int64) * max(self.num_nodes, 1) + targets.astype(np.int64)
+        #Sort, then drop repeats (much faster than np.unique for big arrays).
+        keys.sort()
+        keys = keys[np.concatenate([[True], keys[1:] != keys[:-1]])] if len(keys) else keys
+        sources = keys // max(self.num_nodes, 1)
+        counts = np.bincount(sources, minlength=self.num_nodes)
+        offsets = np.zeros(self.num_nodes + 1, dtype=index_dtype(len(keys)))
+        np.cumsum(counts, out=offsets[1:])
+        self._offsets = offsets
+        self._targets = (keys % max(self.num_nodes, 1)).astype(index_dtype(self.num_nodes))
+        self._pending_sources = []
+        self._pending_targets = []
+        self._fingerprint = None
+        self.version += 1
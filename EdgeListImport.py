@@ -0,0 +1,220 @@
+from typing import Iterator
+import gzip
+import os
+import shutil
+import time
+import numpy as np
+
+from CompactGraph import CompactGraph, index_dtype
+from GraphCache import cache_path, load_graph, finish_cache
+
+#Imports huge networks (such as the 41M-node twitter graph) from plain edge lists, e.g. the SNAP format:
+#one "a b" pair of ids per line, lines starting with # are comments, optionally gzip-compressed.
+#The file is streamed in fixed-size chunks and the CSR arrays are written straight to disk, so memory stays bounded:
+#apart from the chunk being processed, only a few arrays with one entry per node are kept in RAM.
+#The result is stored as a graph cache (see GraphCache.py), so the import only happens once.
+
+
+def import_edge_list(path: str, follower_first: bool = True, chunk_bytes: int = 1 << 26,
+                     cache_dir: str = None, verbose: bool = True) -> CompactGraph:
+    """
+    Reads an edge list into a memory-mapped CompactGraph (edges go from a person to their followers).
+    The ids in the file can be arbitrary non-negative integers: they are renumbered 0..n-1 in increasing order.
+    :param path: The edge list file (ending in .gz if it is compressed).
+    :param follower_first: optional. If True, "a b" means a follows b (as in the SNAP twitter data).
+        If False, it means b follows a.
+    :param chunk_bytes: optional. How much of the file is read at a time.
+    :param cache_dir: optional. Where to store the converted graph (default: next to the file, see GraphCache.py).
+    :param verbose: optional. If True, print progress and throughput.
+    """
+    directory = cache_dir or cache_path(path)
+    graph = load_graph(directory, path)
+    if graph is not None:
+        return graph
+
+    #Pass 1: find all ids, so they can be renumbered densely.
+    progress = _Progress("Pass 1/2 (collecting ids)", verbose)
+    ids = _UniqueIds()
+    num_edges = 0
+    for pairs in _read_pairs(path, chunk_bytes):
+        ids.add(pairs)
+        num_edges += len(pairs)
+        progress.update(len(pairs))
+    ids = ids.result()
+    progress.done()
+    num_nodes = len(ids)
+    node_type = index_dtype(num_nodes)
+
+    temporary = directory + ".tmp"
+    shutil.rmtree(temporary, ignore_errors=True)
+    os.makedirs(temporary)
+
+    #Pass 2: renumber the edges, count everyone's followers and spill the edges to disk.
+    progress = _Progress("Pass 2/2 (renumbering edges)", verbose)
+    edges_path = os.path.join(temporary, "edges.tmp")
+    edges = np.lib.format.open_memmap(edges_path, mode="w+", dtype=node_type, shape=(num_edges, 2))
+    num_followers = np.zeros(num_nodes, dtype=np.int64)
+    position = 0
+    for pairs in _read_pairs(path, chunk_bytes):
+        dense = np.searchsorted(ids, pairs).astype(node_type)
+        users, followers = (dense[:, 1], dense[:, 0]) if follower_first else (dense[:, 0], dense[:, 1])
+        num_followers += np.bincount(users, minlength=num_nodes)
+        edges[position:position + len(pairs), 0] = users
+        edges[position:position + len(pairs), 1] = followers
+        position += len(pairs)
+        progress.update(len(pairs))
+    edges.flush()
+    progress.done()
+    del ids
+
+    #Place every follower in its row of the CSR arrays (a counting sort, chunk by chunk).
+    progress = _Progress("Building CSR arrays", verbose)
+    unsorted_path = os.path.join(temporary, "unsorted.tmp")
+    unsorted = np.lib.format.open_memmap(unsorted_path, mode="w+", dtype=node_type, shape=(num_edges,))
+    cursor = np.cumsum(num_followers) - num_followers
+    chunk_edges = max(1, chunk_bytes // 8)
+    for start in range(0, num_edges, chunk_edges):
+        users = np.asarray(edges[start:start + chunk_edges, 0])
+        followers = np.asarray(edges[start:start + chunk_edges, 1])
+        order = np.argsort(users, kind="stable")
+        users = users[order]
+        group_start = np.searchsorted(users, users, side="left")
+        unsorted[cursor[users] + (np.arange(len(users)) - group_start)] = followers[order]
+        cursor += np.bincount(users, minlength=num_nodes)
+        progress.update(len(users))
+    unsorted.flush()
+    progress.done()
+    del edges, cursor
+    os.remove(edges_path)
+
+    #Sort each row and merge parallel edges, like a networkx DiGraph would. Rows are processed in blocks.
+    progress = _Progress("Merging parallel edges", verbose)
+    offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(num_followers, out=offsets[1:])
+    kept_per_node = np.zeros(num_nodes, dtype=np.int64)
+    num_blocks = 0
+    row = 0
+    while row < num_nodes:
+        end_row = max(row + 1, int(np.searchsorted(offsets, offsets[row] + chunk_edges, side="right")) - 1)
+        end_row = min(end_row, num_nodes)
+        rows = np.repeat(np.arange(row, end_row, dtype=np.int64), num_followers[row:end_row])
+        keys = np.unique(rows * num_nodes + unsorted[offsets[row]:offsets[end_row]])
+        kept_per_node[row:end_row] = np.bincount(keys // num_nodes - row, minlength=end_row - row)
+        np.save(os.path.join(temporary, f"block_{num_blocks}.tmp.npy"), (keys % num_nodes).astype(node_type))
+        num_blocks += 1
+        progress.update(int(offsets[end_row] - offsets[row]))
+        row = end_row
+    del unsorted
+    os.remove(unsorted_path)
+
+    final_offsets = np.zeros(num_nodes + 1, dtype=index_dtype(int(kept_per_node.sum())))
+    np.cumsum(kept_per_node, out=final_offsets[1:])
+    np.save(os.path.join(temporary, "offsets.npy"), final_offsets)
+    targets = np.lib.format.open_memmap(os.path.join(temporary, "targets.npy"), mode="w+", dtype=node_type, shape=(int(final_offsets[-1]),))
+    position = 0
+    for block_index in range(num_blocks):
+        block_path = os.path.join(temporary, f"block_{block_index}.tmp.npy")
+        block = np.load(block_path)
+        targets[position:position + len(block)] = block
+        position += len(block)
+        os.remove(block_path)
+    targets.flush()
+    del targets
+    progress.done()
+
+    finish_cache(temporary, directory, path)
+    if verbose:
+        print(f"Imported {num_nodes} nodes and {int(final_offsets[-1])} edges into {directory}")
+    return load_graph(directory)
+
+
+#---Private Methods---------------------------------------------------
+def _read_pairs(path: str, chunk_bytes: int) -> Iterator[np.ndarray]:
+    """
+    Streams the file and yields the edges of each chunk as an array of shape (k, 2).
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        remainder = b""
+        while True:
+            data = f.read(chunk_bytes)
+            if not data:
+                chunk = remainder
+            else:
+                #Only parse up to the last complete line. The rest is part of the next chunk.
+                data = remainder + data
+                last_newline = data.rfind(b"\n")
+                if last_newline < 0:
+                    remainder = data
+                    continue
+                chunk, remainder = data[:last_newline + 1], data[last_newline + 1:]
+            if b"#" in chunk or b"%" in chunk:
+                chunk = b"\n".join(line for line in chunk.split(b"\n") if not line.lstrip().startswith((b"#", b"%")))
+            #(fromstring turns a chunk of only whitespace into a 0, so such chunks are skipped.)
+            tokens = _tokens_per_line(chunk)
+            numbers = np.fromstring(chunk, dtype=np.int64, sep=" ") if len(tokens) else np.zeros(0, dtype=np.int64)
+            if (tokens != 2).any() or len(numbers) != 2 * len(tokens):
+                raise ValueError(f"{path} is not an edge list: every line should be \"<id> <id>\" (exactly two ids). "
+                                 "Extra columns, such as weights or timestamps, are not supported.")
+            if len(numbers) > 0:
+                yield numbers.reshape(-1, 2)
+            if not data:
+                return
+
+
+def _tokens_per_line(chunk: bytes) -> np.ndarray:
+    """
+    Returns the number of whitespace-separated tokens on every line of chunk that contains any.
+    """
+    data = np.frombuffer(chunk, dtype=np.uint8)
+    whitespace = np.isin(data, np.frombuffer(b" \t\r\n", dtype=np.uint8))
+    token_starts = ~whitespace & np.concatenate([[True], whitespace[:-1]])
+    counts = np.bincount(np.cumsum(data == ord("\n"))[token_starts])
+    return counts[counts > 0]
+
+
+#Collects the sorted unique ids of all chunks.
+#Chunks are merged in batches that grow with the result, so the total cost stays O(E log N).
+class _UniqueIds:
+    def __init__(self) -> None:
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.pending = []
+        self.num_pending = 0
+
+    def add(self, pairs: np.ndarray) -> None:
+        chunk_ids = np.unique(pairs)
+        self.pending.append(chunk_ids)
+        self.num_pending += len(chunk_ids)
+        if self.num_pending > len(self.ids):
+            self._merge()
+
+    def result(self) -> np.ndarray:
+        self._merge()
+        return self.ids
+
+    def _merge(self) -> None:
+        self.ids = np.unique(np.concatenate([self.ids] + self.pending))
+        self.pending = []
+        self.num_pending = 0
+
+
+#Prints how far along a pass is, at most once every few seconds.
+class _Progress:
+    def __init__(self, name: str, verbose: bool, interval: float = 5.0) -> None:
+        self.name = name
+        self.verbose = verbose
+        self.interval = interval
+        self.count = 0
+        self.start = self.last_print = time.perf_counter()
+
+    def update(self, num_edges: int) -> None:
+        self.count += num_edges
+        now = time.perf_counter()
+        if self.verbose and now - self.last_print >= self.interval:
+            print(f"{self.name}: {self.count:,} edges ({self.count / (now - self.start):,.0f} edges/s)")
+            self.last_print = now
+
+    def done(self) -> None:
+        if self.verbose:
+            elapsed = time.perf_counter() - self.start
+            print(f"{self.name}: done, {self.count:,} edges in {elapsed:.1f}s ({self.count / max(elapsed, 1e-9):,.0f} edges/s)")
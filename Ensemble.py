@@ -0,0 +1,239 @@
+from typing import List, Tuple
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import os
+import numpy as np
+import matplotlib.pyplot as plt
+
+from CompactGraph import CompactGraph
+from AdoptionKernel import AdoptionKernel
+from CentralityIndex import CentralityIndex
+from SocialNetwork import SocialNetwork
+from Experiments import configure_network, apply_experiment, seed_experiment, run_cascade, HUB_EXPERIMENTS
+from MultiCascade import MultiCascade
+import config
+
+#Runs many independent realisations (replicas) of the same experiment in parallel.
+#The graph is loaded once, its CSR arrays are put in shared memory, and every worker process attaches to them,
+#so no worker has to load (or unpickle) the network itself.
+
+#The config settings a replica depends on. They are sent to the workers explicitly,
+#so changes made to config at runtime (e.g. by a parameter sweep) are respected.
+REPLICA_SETTINGS = ["experiment_type", "num_with_initial_meme", "timesteps", "simulation_engine", "prune_absorbing", "centrality_measure",
+                    "ALPHA", "GAMMA", "OMEGA", "FACT_CHECK_PROBABILITY"]
+
+
+#The believer fraction curves of all replicas, plus summary statistics.
+class EnsembleResult:
+    def __init__(self, fractions: np.ndarray, max_fractions: np.ndarray) -> None:
+        """
+        :param fractions: array of shape (replicas, timesteps) with the fraction of believers after each step.
+        :param max_fractions: the get_max_fraction_believers() of each replica.
+        """
+        self.fractions = fractions
+        self.max_fractions = max_fractions
+        self.timestamps = np.arange(fractions.shape[1])
+
+    def mean(self) -> np.ndarray:
+        return self.fractions.mean(axis=0)
+
+    def quantile(self, q: float) -> np.ndarray:
+        return np.quantile(self.fractions, q, axis=0)
+
+    def confidence_band(self, z: float = 1.96) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the (lower, upper) normal-approximation confidence band of the mean curve (z=1.96 is 95%).
+        """
+        num_replicas = self.fractions.shape[0]
+        std_error = self.fractions.std(axis=0, ddof=1) / np.sqrt(num_replicas) if num_replicas > 1 else np.zeros(len(self.timestamps))
+        return self.mean() - z * std_error, self.mean() + z * std_error
+
+    def summary(self) -> dict:
+        """
+        Returns the distribution of the maximum fraction of believers over the replicas.
+        """
+        return {
+            "replicas": len(self.max_fractions),
+            "max_fraction_mean": float(self.max_fractions.mean()),
+            "max_fraction_std": float(self.max_fractions.std()),
+            "max_fraction_quantiles": {q: float(np.quantile(self.max_fractions, q)) for q in [0.05, 0.25, 0.5, 0.75, 0.95]},
+        }
+
+
+#The CSR arrays of a compact graph, made available to other processes.
+#Arrays that are memory-mapped from a graph cache (see GraphCache.py) are simply reopened by the workers,
+#which shares them through the page cache. Other arrays are copied into shared memory blocks.
+class SharedGraph:
+    def __init__(self, graph: CompactGraph) -> None:
+        self.blocks: List[shared_memory.SharedMemory] = []
+        self.handle = tuple(self._share(array) for array in [graph.offsets, graph.targets])
+
+    def close(self) -> None:
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+    @staticmethod
+    def attach(handle: tuple) -> Tuple[Tuple[np.ndarray, np.ndarray], List[shared_memory.SharedMemory]]:
+        """
+        Opens the arrays described by a SharedGraph handle (in another process).
+        :return: ((offsets, targets), blocks). Keep the blocks alive for as long as the arrays are used.
+        """
+        arrays = []
+        blocks = []
+        for kind, name, shape, dtype in handle:
+            if kind == "file":
+                arrays.append(np.load(name, mmap_mode="r"))
+            else:
+                blocks.append(shared_memory.SharedMemory(name=name))
+                arrays.append(np.ndarray(shape, dtype=dtype, buffer=blocks[-1].buf))
+        return tuple(arrays), blocks
+
+    def _share(self, array: np.ndarray) -> Tuple[str, str, tuple, str]:
+        if isinstance(array, np.memmap) and array.filename is not None and array.filename.endswith(".npy"):
+            return "file", array.filename, array.shape, array.dtype.str
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+        self.blocks.append(block)
+        return "memory", block.name, array.shape, array.dtype.str
+
+
+#Like SharedGraph, but for any arrays (e.g. centrality scores, or the state of the people in Partitioned.py).
+class SharedArrays(SharedGraph):
+    def __init__(self, arrays: List[np.ndarray]) -> None:
+        self.blocks: List[shared_memory.SharedMemory] = []
+        self.handle = tuple(self._share(array) for array in arrays)
+
+
+def run_ensemble(sn: SocialNetwork, num_replicas: int, num_workers: int = 0, seed: int = None,
+                 kernel: AdoptionKernel = None, replicas_per_pass: int = 1) -> EnsembleResult:
+    """
+    Runs num_replicas independent realisations of the configured experiment on the graph of sn.
+    :param sn: A compact network. Only its graph is used, every replica starts with fresh people.
+    :param num_replicas: The number of realisations.
+    :param num_workers: optional. The number of worker processes (0 means one per CPU core, 1 runs everything in this process).
+    :param seed: optional. Seed for the replicas' random streams. The same seed gives the same results.
+    :param kernel: optional. The adoption kernel of every replica (default: the beta function of the config).
+    :param replicas_per_pass: optional. The number of replicas that are simulated together, in lockstep (see MultiCascade.py).
+        This is much faster for small graphs. The results then depend on replicas_per_pass too (but still not on num_workers).
+        The "sparse" experiment always uses 1, so that every replica removes its own random edges.
+    """
+    if sn.backend != "compact":
+        raise ValueError("Ensembles need a compact network (backend=\"compact\").")
+    seeds = np.random.SeedSequence(seed).spawn(num_replicas)
+    settings = {name: getattr(config, name) for name in REPLICA_SETTINGS}
+    if config.experiment_type == "sparse":
+        replicas_per_pass = 1
+    batches = [(first, seeds[first:first + replicas_per_pass]) for first in range(0, num_replicas, replicas_per_pass)]
+    num_workers = min(num_workers or os.cpu_count(), len(batches))
+    #The hub experiments need the centrality scores of the graph, which are computed only once (here) for all replicas.
+    centrality = sn.centrality() if config.experiment_type in HUB_EXPERIMENTS else None
+    scores = [centrality.scores(config.centrality_measure)] if centrality is not None else []
+
+    if num_workers == 1:
+        #No need for shared memory or extra processes.
+        results = [result for first, batch in batches for result in _indexed(first, run_replicas(sn.graph.offsets, sn.graph.targets, batch, kernel, centrality))]
+    else:
+        shared_graph = SharedGraph(sn.graph)
+        shared_scores = SharedArrays(scores)
+        try:
+            with mp.Pool(num_workers, initializer=_init_worker, initargs=(shared_graph.handle, shared_scores.handle, settings, kernel)) as pool:
+                results = sorted(result for batch_results in pool.imap_unordered(_run_replicas, batches) for result in batch_results)
+        finally:
+            shared_graph.close()
+            shared_scores.close()
+
+    #Once a cascade has died out nothing changes anymore, so shorter curves are padded with their last value.
+    length = max(len(curve) for _, curve, _ in results)
+    fractions = np.array([curve + [curve[-1]] * (length - len(curve)) for _, curve, _ in results])
+    max_fractions = np.array([max_fraction for _, _, max_fraction in results])
+    return EnsembleResult(fractions, max_fractions)
+
+
+def save_ensemble_plot(result: EnsembleResult, path: str, title: str) -> None:
+    """
+    Saves a graph of the mean fraction of believers, with its 95% confidence band and the 5%-95% quantile range.
+    """
+    plt.figure(figsize=(10, 6))
+    plt.fill_between(result.timestamps, result.quantile(0.05), result.quantile(0.95), color='blue', alpha=0.15, label='5%-95% of replicas')
+    lower, upper = result.confidence_band()
+    plt.fill_between(result.timestamps, lower, upper, color='blue', alpha=0.35, label='95% confidence band')
+    plt.plot(result.timestamps, result.mean(), marker='o', linestyle='-', color='blue', label='Mean')
+
+    plt.xlabel('Time Step')
+    plt.ylabel('Believer Fraction')
+    plt.title(title)
+    plt.legend()
+
+    plt.grid(True)
+    plt.tight_layout()
+    plt.savefig(path)
+
+
+def run_replica(offsets: np.ndarray, targets: np.ndarray, seed: np.random.SeedSequence, kernel: AdoptionKernel = None,
+                centrality: CentralityIndex = None) -> Tuple[List[float], float]:
+    """
+    Runs one realisation of the configured experiment on the given CSR graph.
+    :param seed: The seed of the replica's network (see RandomPool.py).
+    :param kernel: optional. The adoption kernel to use.
+    :param centrality: optional. The centrality index of the graph, so the replica doesn't have to compute it again.
+    :return: (fraction of believers after each time step, maximum fraction of believers)
+    """
+    #A fresh CompactGraph per replica: interventions such as make_sparse replace its arrays, not the shared ones.
+    sn = SocialNetwork.from_compact_graph(CompactGraph.from_csr(offsets, targets), seed)
+    configure_network(sn, kernel)
+    if centrality is not None:
+        sn.use_centrality(centrality)
+    apply_experiment(sn, config.experiment_type)
+    seed_experiment(sn, config.experiment_type, config.num_with_initial_meme)
+    checkpoints = run_cascade(sn, config.timesteps)
+    return [fraction for _, fraction in checkpoints], sn.get_max_fraction_believers()
+
+
+def run_replicas(offsets: np.ndarray, targets: np.ndarray, seeds: List[np.random.SeedSequence], kernel: AdoptionKernel = None,
+                 centrality: CentralityIndex = None) -> List[Tuple[List[float], float]]:
+    """
+    Runs several realisations of the configured experiment together, in lockstep (see MultiCascade.py).
+    They all draw from the random numbers of the first seed. With a single seed, this is run_replica.
+    :return: the results of run_replica for every replica.
+    """
+    if len(seeds) == 1:
+        return [run_replica(offsets, targets, seeds[0], kernel, centrality)]
+    sn = SocialNetwork.from_compact_graph(CompactGraph.from_csr(offsets, targets), seeds[0])
+    configure_network(sn, kernel)
+    if centrality is not None:
+        sn.use_centrality(centrality)
+    apply_experiment(sn, config.experiment_type)
+    cascades = MultiCascade(sn, len(seeds))
+    #MultiCascade.seed_meme takes the same arguments as SocialNetwork.seed_meme.
+    seed_experiment(cascades, config.experiment_type, config.num_with_initial_meme)
+    fractions = cascades.run(config.timesteps)
+    return [(curve.tolist(), float(max_fraction)) for curve, max_fraction in zip(fractions, cascades.max_fractions_believers)]
+
+
+def _indexed(first: int, results: List[Tuple[List[float], float]]) -> List[Tuple[int, List[float], float]]:
+    return [(first + i, curve, max_fraction) for i, (curve, max_fraction) in enumerate(results)]
+
+
+#---Worker Process---------------------------------------------------
+_worker_csr = None
+_worker_blocks = None
+_worker_kernel = None
+_worker_centrality = None
+
+def _init_worker(handle: tuple, scores_handle: tuple, settings: dict, kernel: AdoptionKernel) -> None:
+    global _worker_csr, _worker_blocks, _worker_kernel, _worker_centrality
+    _worker_csr, _worker_blocks = SharedGraph.attach(handle)
+    _worker_kernel = kernel
+    for name, value in settings.items():
+        setattr(config, name, value)
+    if scores_handle:
+        (scores,), score_blocks = SharedGraph.attach(scores_handle)
+        _worker_blocks += score_blocks
+        _worker_centrality = CentralityIndex(CompactGraph.from_csr(*_worker_csr), scores={config.centrality_measure: scores})
+
+
+def _run_replicas(task: Tuple[int, List[np.random.SeedSequence]]) -> List[Tuple[int, List[float], float]]:
+    first, seeds = task
+    return _indexed(first, run_replicas(*_worker_csr, seeds, _worker_kernel, _worker_centrality))
@@ -0,0 +1,106 @@
+from typing import List, Tuple
+import numpy as np
+
+from SocialNetwork import SocialNetwork
+from Bianconi import BianconiBarabasiModel
+from AdoptionKernel import AdoptionKernel, BetaKernel
+from Interventions import Intervention
+import config
+
+#The building blocks of main(): constructing the network, applying the experiment and running the cascade.
+#They live here so that other runners (e.g. Ensemble.py) do exactly the same thing as main().
+
+#The experiments that pick people by centrality (with config.centrality_measure).
+HUB_EXPERIMENTS = ["central_checkers", "hub_initial_checkers"]
+
+
+def build_network(backend: str = None, seed: int = None) -> SocialNetwork:
+    """
+    Constructs the social network based on the model type in the config.
+    :param backend: optional. Overrides config.graph_backend.
+    :param seed: optional. Seed for generating (or sampling) the graph and for the randomness of the network.
+        Overrides config.random_seed.
+    """
+    backend = backend or config.graph_backend
+    seed = seed if seed is not None else config.random_seed
+    if config.model_type == "random":
+        return SocialNetwork.create_random(config.num_people, (config.num_edges / (config.num_people * (config.num_people - 1))), backend=backend, seed=seed)
+    elif config.model_type == "bianconi":
+        model_seed, network_seed = np.random.SeedSequence(seed).spawn(2)
+        bianconi_model = BianconiBarabasiModel(config.num_people, int(config.num_edges / config.num_people), seed=model_seed)
+        bianconi_model.run()
+        return SocialNetwork.from_bianconi(bianconi_model, backend=backend, seed=network_seed)
+    elif config.model_type == "real":
+        if not config.input_data_path.endswith(".pkl"):
+            return SocialNetwork.import_from_edge_list(config.input_data_path, n_samples=config.num_people, backend=backend, seed=seed)
+        return SocialNetwork.import_from_igraph(config.input_data_path, n_samples=config.num_people, backend=backend, use_cache=config.use_graph_cache, seed=seed)
+    else:
+        raise ValueError(f"Unknown model type: {config.model_type}")
+
+
+def configure_network(sn: SocialNetwork, kernel: AdoptionKernel = None) -> None:
+    """
+    Applies the simulation settings from the config (engine, pruning) to a network.
+    :param kernel: optional. The adoption kernel to use (default: the beta function of the config).
+    """
+    sn.set_engine(config.simulation_engine)
+    sn.prune_absorbing = config.prune_absorbing
+    sn.kernel = kernel or BetaKernel()
+
+
+def apply_experiment(sn: SocialNetwork, experiment_type: str) -> List[Intervention]:
+    """
+    Applies the special rules of an experiment to the network (before seeding).
+    :return: the interventions that were applied. Remove them (sn.remove_intervention) to undo the experiment.
+    """
+    if experiment_type in ["baseline", "nonhub_initial_checkers", "hub_initial_checkers"]:
+        return []
+    elif experiment_type == "sparse":
+        return [sn.make_sparse(0.3)]
+    elif experiment_type == "central_checkers":
+        return [sn.make_hubs_factcheckers(threshold=0.99, measure=config.centrality_measure)]
+    else:
+        raise ValueError(f"Unknown experiment type: {experiment_type}")
+
+
+def seed_experiment(sn: SocialNetwork, experiment_type: str, num_with_initial_meme: int) -> None:
+    """
+    Seeds the initial believers (and disbelievers, for some experiments) in the network.
+    """
+    if experiment_type == "nonhub_initial_checkers":
+        sn.seed_meme(num_with_initial_meme, 0.01, use_hubs=False)
+    elif experiment_type == "hub_initial_checkers":
+        sn.seed_meme(num_with_initial_meme, 0.01, use_hubs=True, hub_measure=config.centrality_measure)
+    else:
+        sn.seed_meme(num_with_initial_meme)
+
+
+def run_experiment(sn: SocialNetwork, experiment_type: str, num_with_initial_meme: int, timesteps: int,
+                   timesteps_per_checkpoint: int = 1) -> List[Tuple[int, float]]:
+    """
+    Runs a whole experiment on a network from scratch, and undoes its interventions afterwards.
+    So several experiments (e.g. baseline, sparse and central_checkers) can run one after the other on one loaded network.
+    :return: the checkpoints of run_cascade.
+    """
+    sn.reset_state()
+    interventions = apply_experiment(sn, experiment_type)
+    seed_experiment(sn, experiment_type, num_with_initial_meme)
+    checkpoints = run_cascade(sn, timesteps, timesteps_per_checkpoint)
+    for intervention in interventions:
+        sn.remove_intervention(intervention)
+    return checkpoints
+
+
+def run_cascade(sn: SocialNetwork, timesteps: int, timesteps_per_checkpoint: int = 1) -> List[Tuple[int, float]]:
+    """
+    Evolves a seeded network until nothing is left to spread (or timesteps is reached).
+    :return: a list of checkpoints (time step, fraction of believers).
+    """
+    checkpoints = []
+    for time_step in range(timesteps):
+        sn.evolve_state()
+        if time_step % timesteps_per_checkpoint == 0:
+            checkpoints.append( (time_step, sn.get_fraction_believers()) )
+        if sn.num_pending_events() == 0:
+            break
+    return checkpoints
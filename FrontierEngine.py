@@ -0,0 +1,149 @@
+from typing import Callable, NamedTuple, Tuple
+import numpy as np
+
+from BetaFunction import beta_function
+from Person import BELIEVER, DISBELIEVER, UNAWARE
+
+#This file contains the vectorised version of SocialNetwork.evolve_state.
+#Instead of popping spreading events one at a time, a whole timestep is processed as a batch of arrays
+#(the "frontier"). The outcome is the same as calling Person.see for each event in queue order:
+# - every event bumps the times_seen counter of its type,
+# - each exposure rolls beta(times seen so far), and a believer event then rolls the check probability,
+# - believers ignore believer events and disbelievers ignore everything,
+# - a person who changes their mind tweets their new attitude to all their followers in the next step.
+
+
+#The changes of mind during one timestep, in the order they happened.
+class Transitions(NamedTuple):
+    nodes: np.ndarray
+    old_attitudes: np.ndarray
+    new_attitudes: np.ndarray
+
+
+def expand_followers(offsets: np.ndarray, targets: np.ndarray, sources: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Looks up the followers of many people at once.
+    :param offsets: CSR offsets of the graph.
+    :param targets: CSR targets of the graph.
+    :param sources: The people whose followers we want.
+    :return: (followers, source_index), where followers[i] follows sources[source_index[i]].
+        Followers are grouped per source, in the same order as sources.
+    """
+    counts = (offsets[sources + 1] - offsets[sources]).astype(np.int64)
+    total = int(counts.sum())
+    group_starts = np.cumsum(counts) - counts
+    edge_index = np.repeat(offsets[sources].astype(np.int64) - group_starts, counts) + np.arange(total)
+    return targets[edge_index], np.repeat(np.arange(len(sources)), counts)
+
+
+def evolve_frontier(offsets: np.ndarray, targets: np.ndarray,
+                    attitudes: np.ndarray, times_seen_meme: np.ndarray, times_seen_factcheck: np.ndarray,
+                    check_probability: np.ndarray,
+                    event_nodes: np.ndarray, event_attitudes: np.ndarray,
+                    beta: Callable = beta_function,
+                    random: Callable = np.random.random) -> Tuple[np.ndarray, np.ndarray, Transitions]:
+    """
+    Processes one timestep worth of spreading events. The state arrays are updated in place.
+    :param offsets, targets: CSR arrays of the graph (edges go from a person to their followers).
+    :param attitudes, times_seen_meme, times_seen_factcheck, check_probability: per-person state.
+    :param event_nodes: The person each event is seen by, in queue order.
+    :param event_attitudes: What each event shows them (BELIEVER or DISBELIEVER).
+    :param beta: optional. The adoption probability as a function of an array of exposure counts
+        (beta_function, or an AdoptionKernel).
+    :param random: optional. Returns an array of the given number of uniform random numbers.
+    :return: (next_event_nodes, next_event_attitudes, transitions): the frontier of the next timestep,
+        and who changed their mind.
+    """
+    transitions = process_events(attitudes, times_seen_meme, times_seen_factcheck, check_probability,
+                                 event_nodes, event_attitudes, beta, random)
+    followers, source_index = expand_followers(offsets, targets, transitions.nodes)
+    return followers, transitions.new_attitudes[source_index], transitions
+
+
+def process_events(attitudes: np.ndarray, times_seen_meme: np.ndarray, times_seen_factcheck: np.ndarray,
+                   check_probability: np.ndarray,
+                   event_nodes: np.ndarray, event_attitudes: np.ndarray,
+                   beta: Callable = beta_function,
+                   random: Callable = np.random.random) -> Transitions:
+    """
+    The first half of evolve_frontier: lets everyone see their events and change their mind, without spreading anything yet.
+    It doesn't need the graph, so the state arrays can also hold the people of several cascades at once (see MultiCascade.py).
+    The parameters are those of evolve_frontier.
+    :return: who changed their mind, in the order of the events that caused it.
+    """
+    num_events = len(event_nodes)
+    if num_events == 0:
+        return Transitions(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int8), np.zeros(0, dtype=np.int8))
+
+    #Group the events per person, keeping queue order within each group.
+    order = _stable_order(event_nodes)
+    nodes = event_nodes[order]
+    is_meme = event_attitudes[order] == BELIEVER
+    group_starts = np.flatnonzero(np.r_[True, nodes[1:] != nodes[:-1]])
+    group_id = np.cumsum(np.r_[False, nodes[1:] != nodes[:-1]])
+    people = nodes[group_starts]
+
+    #The exposure count of each event: what the person had seen before, plus the events of that type before it.
+    meme_seen = np.cumsum(is_meme)
+    factcheck_seen = np.arange(1, num_events + 1) - meme_seen
+    meme_seen -= (meme_seen - is_meme)[group_starts][group_id]
+    factcheck_seen -= (factcheck_seen - ~is_meme)[group_starts][group_id]
+    exposures = np.where(is_meme,
+                         times_seen_meme[nodes] + meme_seen,
+                         times_seen_factcheck[nodes] + factcheck_seen)
+    group_ends = np.r_[group_starts[1:], num_events] - 1
+    times_seen_meme[people] += meme_seen[group_ends]
+    times_seen_factcheck[people] += factcheck_seen[group_ends]
+
+    #Roll every event. Whether a roll counts depends on the person's attitude at that moment (see below).
+    tweets = random(num_events) < beta(exposures)
+    fact_checks = random(num_events) < check_probability[nodes]
+    outcomes = np.where(is_meme & ~fact_checks, BELIEVER, DISBELIEVER).astype(np.int8)
+
+    #Because attitudes only go unaware -> believer -> disbeliever, each person changes their mind at most twice:
+    #first at the first successful event while unaware, then at the first successful fact-check while a believer.
+    initial = attitudes[people]
+    first_change = _first_per_group(group_id, tweets & (initial[group_id] == UNAWARE), len(people))
+    changed_first = first_change >= 0
+    became_believer = np.zeros(len(people), dtype=bool)
+    became_believer[changed_first] = outcomes[first_change[changed_first]] == BELIEVER
+
+    believer_since = np.full(len(people), num_events)
+    believer_since[initial == BELIEVER] = -1
+    believer_since[became_believer] = first_change[became_believer]
+    second_change = _first_per_group(group_id, tweets & ~is_meme & (np.arange(num_events) > believer_since[group_id]), len(people))
+    changed_second = second_change >= 0
+
+    #Each change of mind is a tweet to all followers. Keep them in the order the causing events were queued.
+    change_events = np.concatenate([first_change[changed_first], second_change[changed_second]])
+    old_attitudes = np.concatenate([initial[changed_first], np.full(np.count_nonzero(changed_second), BELIEVER, dtype=np.int8)])
+    chronological = np.argsort(order[change_events]) #(all different, so no need for a stable sort)
+    change_events = change_events[chronological]
+    attitudes[people[changed_first]] = outcomes[first_change[changed_first]]
+    attitudes[people[changed_second]] = DISBELIEVER
+
+    return Transitions(nodes[change_events], old_attitudes[chronological].astype(np.int8), outcomes[change_events])
+
+
+#---Private Methods---------------------------------------------------
+def _stable_order(keys: np.ndarray) -> np.ndarray:
+    """
+    Returns np.argsort(keys, kind="stable"), but several times faster: sorting the values key * n + position
+    (which are all different, so any sort keeps equal keys in order) is much quicker than a stable argsort.
+    """
+    n = len(keys)
+    if (int(keys.max()) + 1) * n >= np.iinfo(np.int64).max:
+        return np.argsort(keys, kind="stable")
+    return np.sort(keys.astype(np.int64) * n + np.arange(n)) % n
+
+
+def _first_per_group(group_id: np.ndarray, mask: np.ndarray, num_groups: int) -> np.ndarray:
+    """
+    Returns, for each group, the index of its first event where mask is True, or -1 if there is none.
+    (group_id has to be sorted.)
+    """
+    first = np.full(num_groups, -1, dtype=np.int64)
+    candidates = np.flatnonzero(mask)
+    groups, first_index = np.unique(group_id[candidates], return_index=True)
+    first[groups] = candidates[first_index]
+    return first
@@ -0,0 +1,114 @@
+from typing import Union
+import json
+import os
+import pickle
+import shutil
+import numpy as np
+
+from CompactGraph import CompactGraph
+
+#Caches graphs on disk as plain NumPy CSR arrays, so they can be memory-mapped instead of unpickled.
+#A cache is a directory next to the source file (e.g. twitter_small_cir.pkl.csr/) containing
+#offsets.npy, targets.npy and meta.json. Opening it is near-instant, and since the arrays are memory-mapped,
+#processes that open the same cache share its memory through the operating system's page cache.
+#The cache remembers the size and modification time of its source file, and is rebuilt when the source changes.
+
+CACHE_VERSION = 1
+
+
+def cache_path(source_path: str) -> str:
+    """
+    Returns the directory where the cache of a source file is stored.
+    """
+    return source_path + ".csr"
+
+
+def load_igraph_cached(ig_net_path: str, verify: bool = False) -> CompactGraph:
+    """
+    Loads a pickled igraph network as a (memory-mapped) CompactGraph, converting it on the first call.
+    Edges go from a person to their followers (igraph edges go from follower to user, so they are reversed).
+    :param ig_net_path: path to the igraph file stored as pickle.
+    :param verify: optional. If True, recompute the checksum of the cached arrays and rebuild them if it doesn't match.
+    """
+    graph = load_graph(cache_path(ig_net_path), ig_net_path, verify)
+    if graph is None:
+        with open(ig_net_path, "rb") as f:
+            i_graph = pickle.load(f)
+        edges = np.array(i_graph.get_edgelist(), dtype=np.int64).reshape(-1, 2)
+        graph = CompactGraph.from_edges(i_graph.vcount(), edges[:, 1], edges[:, 0])
+        save_graph(graph.offsets, graph.targets, cache_path(ig_net_path), ig_net_path)
+        graph = load_graph(cache_path(ig_net_path), ig_net_path)
+    return graph
+
+
+def load_graph(directory: str, source_path: str = None, verify: bool = False) -> Union[CompactGraph, None]:
+    """
+    Opens a cached graph with memory-mapped arrays.
+    :param directory: The cache directory.
+    :param source_path: optional. The file the cache was made from. If it changed since, the cache is stale.
+    :param verify: optional. If True, also check the arrays against the stored checksum.
+    :return: the graph, or None if there is no valid (up to date) cache.
+    """
+    meta_path = os.path.join(directory, "meta.json")
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path) as f:
+        meta = json.load(f)
+    if meta.get("version") != CACHE_VERSION:
+        return None
+    if source_path is not None and meta.get("source") != _describe_source(source_path):
+        return None
+
+    offsets = np.load(os.path.join(directory, "offsets.npy"), mmap_mode="r")
+    targets = np.load(os.path.join(directory, "targets.npy"), mmap_mode="r")
+    if len(offsets) != meta["num_nodes"] + 1 or len(targets) != meta["num_edges"]:
+        return None
+    graph = CompactGraph.from_csr(offsets, targets, fingerprint=None if verify else meta["checksum"])
+    if verify and graph.fingerprint() != meta["checksum"]:
+        return None
+    return graph
+
+
+def save_graph(offsets: np.ndarray, targets: np.ndarray, directory: str, source_path: str = None) -> None:
+    """
+    Writes CSR arrays to a cache directory. The directory is replaced atomically,
+    so other processes never see a half-written cache.
+    """
+    temporary = directory + ".tmp"
+    shutil.rmtree(temporary, ignore_errors=True)
+    os.makedirs(temporary)
+    np.save(os.path.join(temporary, "offsets.npy"), offsets)
+    np.save(os.path.join(temporary, "targets.npy"), targets)
+    finish_cache(temporary, directory, source_path)
+
+
+def finish_cache(temporary: str, directory: str, source_path: str = None) -> None:
+    """
+    Completes a cache whose arrays were written into the directory temporary: adds meta.json and moves it into place.
+    (Used directly by importers that write the arrays themselves, see EdgeListImport.py.)
+    """
+    offsets = np.load(os.path.join(temporary, "offsets.npy"), mmap_mode="r")
+    targets = np.load(os.path.join(temporary, "targets.npy"), mmap_mode="r")
+    meta = {
+        "version": CACHE_VERSION,
+        "num_nodes": len(offsets) - 1,
+        "num_edges": len(targets),
+        "checksum": CompactGraph.from_csr(offsets, targets).fingerprint(),
+        "source": _describe_source(source_path) if source_path is not None else None,
+    }
+    with open(os.path.join(temporary, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    del offsets, targets
+
+    old = directory + ".old"
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(directory):
+        os.rename(directory, old)
+    os.rename(temporary, directory)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+#---Private Methods---------------------------------------------------
+def _describe_source(source_path: str) -> list:
+    stat = os.stat(source_path)
+    return [os.path.basename(source_path), stat.st_size, stat.st_mtime_ns]
@@ -0,0 +1,228 @@
+from typing import Callable, Dict, List, NamedTuple, Union
+import contextlib
+import csv
+import json
+import os
+import sys
+import time
+
+#Instrumentation: where does the time of a run go?
+#A Profiler adds up the time spent in each phase of a run (building the network, seeding, the steps, the checkpoints...)
+#and records statistics of every step: events processed, events per second, queue length and its high-water mark,
+#new believers/disbelievers and the memory use of the process. Export them with to_json() or to_csv().
+#
+#Every SocialNetwork has a profiler (sn.profiler). By default that is NULL_PROFILER, which does nothing at all,
+#so a run without profiling costs (next to) nothing extra. To profile a run, set sn.profiler = Profiler()
+#(or set profile_path in the config).
+#
+#Hooks: external tools can attach to a profiler with add_hook(hook). The hook is called as hook(event, name, data), with
+#event "phase_start" or "phase_end" (name is the phase, data has the seconds at the end), or "step" (data is the step's statistics).
+#For example, a hook can start and stop cProfile around the "evolve" phase.
+
+#The phases of one evolve_state call have these names:
+# - "kernel_update", "apply_pruned", and "events" (the python engine), or "frontier" (the vectorized engine),
+#   within which "rng" and "kernel" time the random numbers and adoption probabilities (in both engines; the python engine
+#   times every single call, so profiling adds some overhead to its "events" phase),
+# - "pruning" (only with prune_absorbing) and "attitude_counts" (only the vectorized engine).
+#Main.py adds the phases of the whole run, such as "build_network", "seed", "evolve" and "checkpoints".
+#The phases are nested, so e.g. "evolve" includes all of the above.
+
+
+class StepStats(NamedTuple):
+    step: int
+    seconds: float
+    events_processed: int
+    events_per_second: float
+    queue_length: int #The number of events left for the next step.
+    queue_high_water: int #The most events pending at once so far.
+    new_believers: int
+    new_disbelievers: int
+    rss_bytes: int #The memory used by the process at the end of the step.
+
+
+#Counts the time spent in one phase. (Use Profiler.phase.)
+class _Phase:
+    def __init__(self, profiler: 'Profiler', name: str) -> None:
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self) -> None:
+        self.profiler._call_hooks("phase_start", self.name, {})
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exception) -> None:
+        self.profiler._add_time(self.name, time.perf_counter() - self.start)
+
+
+class Profiler:
+    def __init__(self, record_rss: bool = True) -> None:
+        """
+        :param record_rss: optional. If False, the memory use is not measured after each step (it is then 0).
+        """
+        self.record_rss = record_rss
+        self.phase_seconds: Dict[str, float] = {}
+        self.phase_calls: Dict[str, int] = {}
+        self.steps: List[StepStats] = []
+        self.hooks: List[Callable[[str, str, dict], None]] = []
+        self._step_start = None
+        self._queue_high_water = 0
+
+    def phase(self, name: str) -> _Phase:
+        """
+        Times a phase: use as "with profiler.phase(name): ...". A phase can be entered many times; the times are added up.
+        """
+        return _Phase(self, name)
+
+    def timed(self, name: str, function: Callable) -> Callable:
+        """
+        Returns a version of function whose calls are timed as the phase name.
+        """
+        def timed_function(*args, **kwargs):
+            with self.phase(name):
+                return function(*args, **kwargs)
+        return timed_function
+
+    def timed_kernel(self, kernel) -> '_TimedKernel':
+        """
+        Returns a version of an adoption kernel whose single lookups (kernel.probability, as in Person.see) are timed as "kernel".
+        """
+        return _TimedKernel(self, kernel)
+
+    def begin_step(self) -> None:
+        """
+        Called by evolve_state when a step starts.
+        """
+        self._step_start = time.perf_counter()
+
+    def end_step(self, record: NamedTuple) -> None:
+        """
+        Called by evolve_state when a step is done.
+        :param record: the StepRecord of the step (see SocialNetwork.py).
+        """
+        seconds = time.perf_counter() - self._step_start if self._step_start is not None else 0.0
+        self._step_start = None
+        self._queue_high_water = max(self._queue_high_water, record.events_processed, record.queue_length)
+        stats = StepStats(
+            step=len(self.steps),
+            seconds=seconds,
+            events_processed=record.events_processed,
+            events_per_second=record.events_processed / seconds if seconds > 0 else 0.0,
+            queue_length=record.queue_length,
+            queue_high_water=self._queue_high_water,
+            new_believers=record.new_believers,
+            new_disbelievers=record.new_disbelievers,
+            rss_bytes=current_rss() if self.record_rss else 0,
+        )
+        self.steps.append(stats)
+        self._call_hooks("step", "evolve_state", stats._asdict())
+
+    def add_hook(self, hook: Callable[[str, str, dict], None]) -> None:
+        """
+        Calls hook(event, name, data) at the start and end of every phase and after every step (see the top of this file).
+        """
+        self.hooks.append(hook)
+
+    def remove_hook(self, hook: Callable[[str, str, dict], None]) -> None:
+        self.hooks.remove(hook)
+
+    def summary(self) -> dict:
+        """
+        Returns the totals of the run: the time and number of calls of every phase, and the totals of the steps.
+        """
+        step_seconds = sum(stats.seconds for stats in self.steps)
+        events = sum(stats.events_processed for stats in self.steps)
+        return {
+            "phases": {name: {"seconds": seconds, "calls": self.phase_calls[name]} for name, seconds in self.phase_seconds.items()},
+            "steps": len(self.steps),
+            "step_seconds": step_seconds,
+            "events_processed": events,
+            "events_per_second": events / step_seconds if step_seconds > 0 else 0.0,
+            "queue_high_water": self._queue_high_water,
+            "peak_rss_bytes": max((stats.rss_bytes for stats in self.steps), default=0),
+        }
+
+    def to_json(self, path: str) -> None:
+        """
+        Writes the summary and the statistics of every step to a JSON file.
+        """
+        with open(path, "w") as file:
+            json.dump({"summary": self.summary(), "steps": [stats._asdict() for stats in self.steps]}, file, indent=1)
+
+    def to_csv(self, path: str) -> None:
+        """
+        Writes the statistics of every step to a CSV file (one row per step).
+        """
+        with open(path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(StepStats._fields)
+            writer.writerows(self.steps)
+
+    def save(self, path: str) -> None:
+        """
+        Writes a CSV file if path ends in ".csv", a JSON file otherwise.
+        """
+        if path.endswith(".csv"):
+            self.to_csv(path)
+        else:
+            self.to_json(path)
+
+    def _add_time(self, name: str, seconds: float) -> None:
+        self.phase_seconds[name] = self.phase_seconds.get(name, 0.0) + seconds
+        self.phase_calls[name] = self.phase_calls.get(name, 0) + 1
+        self._call_hooks("phase_end", name, {"seconds": seconds})
+
+    def _call_hooks(self, event: str, name: str, data: dict) -> None:
+        for hook in self.hooks:
+            hook(event, name, data)
+
+
+#An adoption kernel whose single lookups are timed. (Use Profiler.timed_kernel.)
+class _TimedKernel:
+    def __init__(self, profiler: Profiler, kernel) -> None:
+        self.probability = profiler.timed("kernel", kernel.probability)
+
+
+#A profiler that does nothing. Its phases are one shared empty context, and timed() returns the function itself.
+class NullProfiler:
+    def __init__(self) -> None:
+        self._null_phase = contextlib.nullcontext()
+
+    def phase(self, name: str) -> contextlib.nullcontext:
+        return self._null_phase
+
+    def timed(self, name: str, function: Callable) -> Callable:
+        return function
+
+    def timed_kernel(self, kernel):
+        return kernel
+
+    def begin_step(self) -> None:
+        pass
+
+    def end_step(self, record: NamedTuple) -> None:
+        pass
+
+
+NULL_PROFILER = NullProfiler()
+
+AnyProfiler = Union[Profiler, NullProfiler]
+
+
+def current_rss() -> int:
+    """
+    Returns the memory used by this process (its resident set size) in bytes.
+    Where that is not available, returns the peak memory use instead (or 0 if that isn't available either).
+    """
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    #Bytes on macOS, kilobytes elsewhere.
+    return peak if sys.platform == "darwin" else peak * 1024
@@ -0,0 +1,27 @@
+from typing import Union
+import numpy as np
+
+#Interventions change the network for an experiment, without destroying the original.
+#They are applied in layers on top of the base network (see SocialNetwork.apply_intervention):
+# - an EdgeMask hides edges: the network uses the edges that every applied mask keeps,
+# - a CheckProbabilityOverride gives some people a different fact-check probability (later layers win).
+#Removing an intervention brings back the network as it was without it, so one loaded graph can be reused
+#for many experiments (e.g. baseline, then sparse, then central_checkers) without being reloaded or copied.
+
+
+#Keeps only the edges i for which keep[i] is True.
+#Edges are numbered as in the base network: in CSR order for compact networks (see CompactGraph.edges()),
+#in the order of graph.edges() for networkx networks.
+class EdgeMask:
+    def __init__(self, keep: np.ndarray) -> None:
+        self.keep = np.asarray(keep, dtype=bool)
+
+
+#Sets the check_probability of the given people (by index in network.people) to probability.
+class CheckProbabilityOverride:
+    def __init__(self, people: np.ndarray, probability: float) -> None:
+        self.people = np.asarray(people, dtype=np.int64)
+        self.probability = probability
+
+
+Intervention = Union[EdgeMask, CheckProbabilityOverride]
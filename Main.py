@@ -1,10 +1,12 @@
-import os
-import imageio
 import time
 import matplotlib.pyplot as plt
 #import betaconfig
-from SocialNetwork import SocialNetwork
-from Bianconi import BianconiBarabasiModel
+from Experiments import build_network, configure_network, apply_experiment, seed_experiment
+from Ensemble import run_ensemble, save_ensemble_plot
+from Renderer import NetworkRenderer
+from Instrumentation import Profiler, NULL_PROFILER
+from TrajectoryRecorder import TrajectoryRecorder
+from Partitioned import PartitionedNetwork
 import config
 
 def main():
@@ -16,91 +18,107 @@ def main():
     #Note: this function looks really long, but it is mostly case distinctions.
     #That way, you don't have to modify the code to run different experiments.
 
-    #We need this for the visualisation.
-    if config.visualise_network:
-        frames_dir = "evolution_frames"
-        os.makedirs(frames_dir, exist_ok=True) 
-        image_filenames = []
-    
+    #Times the phases of the run, if asked for (see Instrumentation.py).
+    profiler = Profiler() if config.profile_path else NULL_PROFILER
+
     #Construct the social network based on the specified model type.
-    sn = None
-    if config.model_type == "random":
-        sn = SocialNetwork.create_random(config.num_people, (config.num_edges / (config.num_people * (config.num_people - 1))))
-    elif config.model_type == "bianconi":
-        bianconi_model = BianconiBarabasiModel(config.num_people, int(config.num_edges / config.num_people))
-        bianconi_model.run()
-        sn = SocialNetwork.from_bianconi(bianconi_model)
-    elif config.model_type == "real":
-        sn = SocialNetwork.import_from_igraph(config.input_data_path, n_samples=config.num_people)
-    else:
-        raise ValueError(f"Unknown model type: {config.model_type}")
+    with profiler.phase("build_network"):
+        sn = build_network(backend="compact" if config.num_replicas > 1 or config.num_partitions > 1 else None)
+        configure_network(sn)
+    sn.profiler = profiler
 
     print("Number of edges in the network:", sn.graph.number_of_edges())
     print("Number of nodes in the network:", sn.graph.number_of_nodes())
 
-    #Apply the special rules of the current experiment.
-    if config.experiment_type in ["baseline", "nonhub_initial_checkers", "hub_initial_checkers"]:
-        pass
-    elif config.experiment_type == "sparse":
-        sn.make_sparse(0.3)
-    elif config.experiment_type == "central_checkers":
-        sn.make_hubs_factcheckers(threshold=0.99)
-    else:
-        raise ValueError(f"Unknown experiment type: {config.experiment_type}")
+    if config.num_replicas > 1:
+        #Ensemble mode: run many realisations in parallel on this graph and plot their statistics.
+        with profiler.phase("ensemble"):
+            result = run_ensemble(sn, config.num_replicas, config.num_workers, config.random_seed, replicas_per_pass=config.replicas_per_pass)
+        save_ensemble_plot(result, config.save_plot_path, f"Fraction of Believers Over Time ({config.model_type}, {config.num_replicas} runs)")
+        summary = result.summary()
+        print(f"Over {summary['replicas']} runs, at most {summary['max_fraction_mean']:.2%} (std {summary['max_fraction_std']:.2%}) of the network have believed in the meme on average.")
+        print(f"Median final fraction of believers: {result.quantile(0.5)[-1]:.2%}")
+        save_profile(profiler)
+        return
 
-    #Seed the initial believers in the network.
-    if config.experiment_type == "nonhub_initial_checkers":
-        sn.seed_meme(config.num_with_initial_meme, 0.01, use_hubs=False)
-    elif config.experiment_type == "hub_initial_checkers":
-        sn.seed_meme(config.num_with_initial_meme, 0.01, use_hubs=True)
-    else:
-        sn.seed_meme(config.num_with_initial_meme)
+    #Apply the special rules of the current experiment, then seed the initial believers in the network.
+    with profiler.phase("apply_experiment"):
+        interventions = apply_experiment(sn, config.experiment_type)
+    if config.experiment_type == "central_checkers":
+        print(f"Found {len(interventions[0].people)} hubs..")
+    with profiler.phase("seed"):
+        seed_experiment(sn, config.experiment_type, config.num_with_initial_meme)
+
+    #The animation is written frame by frame while the simulation runs.
+    renderer = None
+    if config.visualise_network:
+        with profiler.phase("render"):
+            renderer = NetworkRenderer(sn, config.save_network_visualisation_path, fps=2, max_nodes=config.visualise_max_nodes, seed=config.random_seed)
+
+    #Everyone's attitude at every step is streamed to disk, if asked for.
+    recorder = TrajectoryRecorder(sn, config.trajectory_path) if config.trajectory_path else None
+
+    #With num_partitions > 1, the cascade is simulated by several worker processes (see Partitioned.py).
+    #sim.sync() copies their state back to sn, for everything that reads it.
+    sim = sn
+    if config.num_partitions > 1:
+        with profiler.phase("partition"):
+            sim = PartitionedNetwork(sn, config.num_partitions)
 
     # Loop through time steps to generate frames
     checkpoints = []
     for time_step in range(config.timesteps):
-        if config.visualise_network:
-            frame_filename = os.path.join(frames_dir, f"frame_{time_step:03d}.png")
-            sn.visualise(save_path=frame_filename) 
-            image_filenames.append(frame_filename)
-
-        sn.evolve_state()
-        if time_step % config.timesteps_per_checkpoint == 0:
-            checkpoints.append( (time_step, sn.get_fraction_believers()) )
-        if len(sn.spreading_event_queue) == 0:
+        if renderer is not None:
+            with profiler.phase("render"):
+                renderer.add_frame()
+
+        with profiler.phase("evolve"):
+            sim.evolve_state()
+        if sim is not sn and renderer is not None:
+            sim.sync()
+        elif sim is not sn and recorder is not None:
+            sim.sync_changes()
+        if recorder is not None:
+            with profiler.phase("trajectory"):
+                recorder.record(time_step)
+        with profiler.phase("checkpoints"):
+            if time_step % config.timesteps_per_checkpoint == 0:
+                checkpoints.append( (time_step, sim.get_fraction_believers()) )
+        if sim.num_pending_events() == 0:
             print(f"No more spreading left to simulate at time step {time_step}.")
             break
+    if sim is not sn:
+        sim.sync()
+        sim.close()
+    if recorder is not None:
+        recorder.close()
+        print(f"Trajectory saved to {config.trajectory_path}")
     timestamps, fractions_believers = zip(*checkpoints)
     #Always save the plot.
-    sn.save_fractions_believer_plot(timestamps, fractions_believers, config.save_plot_path, f"Fraction of Believers Over Time ({config.model_type})")
+    with profiler.phase("plot"):
+        sn.save_fractions_believer_plot(timestamps, fractions_believers, config.save_plot_path, f"Fraction of Believers Over Time ({config.model_type})")
 
     #Print final statistics.
     print(f"At most {sn.get_max_fraction_believers():.2%} of the network have believed in the meme.")
     print(f"Currently, {sn.get_fraction_believers():.2%} of the network believe in the meme.")
 
-    # # Create GIF from the collected frames
-    if not config.visualise_network:
+    if renderer is None:
         print("Network visualisation is disabled. Skipping GIF creation.")
-        return
+    else:
+        with profiler.phase("render"):
+            renderer.add_frame()
+            renderer.close()
+        print(f"GIF saved to {config.save_network_visualisation_path}")
+
+    save_profile(profiler)
 
-    images_data = []
-    for filename in image_filenames:
-        images_data.append(imageio.imread(filename))
-    imageio.mimsave(config.save_network_visualisation_path, images_data, fps=2, loop=0)
-    print(f"GIF saved to {config.save_network_visualisation_path}")
-
-    # Clean up by removing individual frame images and the directory
-    for filename in image_filenames:
-        try:
-            os.remove(filename)
-        except OSError as e:
-            print(f"Error removing file {filename}: {e}")
-    try:
-        os.rmdir(frames_dir)
-        print(f"Removed temporary directory: {frames_dir}")
-    except OSError as e:
-        # Directory might not be empty if a file removal failed
-        print(f"Error removing directory {frames_dir}: {e}")
+def save_profile(profiler: Profiler) -> None:
+    """
+    Saves the profile of the run to config.profile_path (if it is set).
+    """
+    if config.profile_path:
+        profiler.save(config.profile_path)
+        print(f"Profile saved to {config.profile_path}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,349 @@
+from typing import Dict, List, NamedTuple, Union
+import time
+import numpy as np
+
+from CompactGraph import CompactGraph
+from AdoptionKernel import AdoptionKernel, BetaKernel
+from SocialNetwork import SocialNetwork
+from Ensemble import run_ensemble
+from Experiments import build_network, configure_network, apply_experiment
+from Sweep import expand_grid, config_overrides
+import config
+
+#A fast, approximate alternative to simulating a cascade: a degree-based mean-field model of the same dynamics
+#(Person.see with the adoption kernel), which gives the expected fraction of believers over time in a fraction of a second.
+#Use it to screen large parameter grids, and simulate only the interesting regions.
+#
+#People are grouped into classes by the number of people they follow (their in-degree: how many posts they can see).
+#Within a class, everyone is treated alike: the model tracks, per class, the fraction of people who are unaware
+#or believers with every number of memes seen, and with every number of fact-checks seen (assuming these two are independent).
+#Everyone who changes their mind posts to their followers, so in the next step every edge carries a meme (or fact-check)
+#with the probability that its source has just become a believer (or disbeliever). The model counts the edges between
+#every pair of classes, so it knows e.g. whether hubs follow hubs. Everyone then sees a Poisson number of memes with the
+#expected number for their class, and the same for fact-checks, and reacts to each of them as in Person.see
+#(first the memes of a step, then the fact-checks).
+#
+#What the model leaves out: which people follow whom beyond their classes (clustering, communities),
+#and the randomness of a single run (it gives the mean, not the spread).
+#Seeds are spread uniformly, so experiments that pick hubs, or change the graph ("sparse"), are only approximated.
+#Use validate() to see how far off the model is for a network.
+
+#The config settings screen() can vary. (Everything else would need a simulation.)
+SCREEN_SETTINGS = ["num_with_initial_meme", "timesteps", "ALPHA", "GAMMA", "OMEGA", "FACT_CHECK_PROBABILITY"]
+
+
+class MeanFieldResult(NamedTuple):
+    fractions_believers: np.ndarray #After each time step.
+    fractions_disbelievers: np.ndarray
+    max_fraction_believers: float #Including the initial believers, like SocialNetwork.get_max_fraction_believers.
+    peak_step: int #The time step after which the fraction of believers is highest (-1 if that is before the first step).
+
+
+class MeanField:
+    def __init__(self, graph: CompactGraph, check_probability: Union[np.ndarray, float, None] = None,
+                 num_classes: int = 64, max_exposures: int = 64) -> None:
+        """
+        :param graph: The network's graph (edges go from a user to a follower).
+        :param check_probability: optional. Everyone's fact-check probability (by person), or one for everyone.
+            By default, config.FACT_CHECK_PROBABILITY when estimate() is called.
+        :param num_classes: optional. The maximum number of degree classes. Small in-degrees each get their own class,
+            larger ones share logarithmically spaced classes.
+        :param max_exposures: optional. Memes (or fact-checks) seen beyond this many are counted as this many.
+        """
+        self.max_exposures = max_exposures
+        self.num_people = graph.number_of_nodes()
+        sources, targets = graph.edges()
+        classes = _degree_classes(np.bincount(targets, minlength=self.num_people), num_classes)
+        #Drop the classes nobody is in.
+        self.class_sizes = np.bincount(classes).astype(np.float64)
+        used = self.class_sizes > 0
+        self.class_sizes = self.class_sizes[used]
+        classes = (np.cumsum(used) - 1)[classes]
+        num_used = len(self.class_sizes)
+        #class_edges[a, b]: the number of edges from someone in class a to someone in class b.
+        #(So the model knows whom the people of a class follow, and not just how many.)
+        self.class_edges = np.bincount(classes[sources] * num_used + classes[targets], minlength=num_used * num_used).reshape(num_used, num_used).astype(np.float64)
+        self.class_check_probability = None
+        if check_probability is not None:
+            check_probability = np.broadcast_to(np.asarray(check_probability, dtype=np.float64), (self.num_people,))
+            self.class_check_probability = np.bincount(classes, weights=check_probability) / self.class_sizes
+
+    @staticmethod
+    def from_network(sn: SocialNetwork, **kwargs) -> 'MeanField':
+        """
+        Makes a model of the network's graph, with its people's fact-check probabilities (so interventions like
+        make_hubs_factcheckers are included).
+        """
+        if sn.backend == "compact":
+            check_probability = sn.people.check_probability
+        else:
+            check_probability = np.array([person.check_probability for person in sn.people], dtype=np.float64)
+        return MeanField(sn._as_compact_graph(), check_probability, **kwargs)
+
+    def estimate(self, num_initial_believers: int = None, timesteps: int = None, kernel: AdoptionKernel = None,
+                 fraction_disbelievers: float = 0.0) -> MeanFieldResult:
+        """
+        Estimates the expected course of a cascade seeded like SocialNetwork.seed_meme (with random people).
+        :param num_initial_believers: optional. The number of seeds (default: config.num_with_initial_meme).
+            A fraction_disbelievers of them are initial disbelievers instead.
+        :param timesteps: optional. The number of time steps (default: config.timesteps).
+        :param kernel: optional. The adoption kernel (default: the beta function of the config).
+        """
+        num_initial_believers = config.num_with_initial_meme if num_initial_believers is None else num_initial_believers
+        timesteps = config.timesteps if timesteps is None else timesteps
+        kernel = kernel if kernel is not None else BetaKernel()
+        kernel.update()
+        table = kernel(np.arange(self.max_exposures + 1))
+        check = self.class_check_probability if self.class_check_probability is not None else np.full(len(self.class_sizes), config.FACT_CHECK_PROBABILITY)
+
+        num_classes, size = len(self.class_sizes), self.max_exposures + 1
+        believers = num_initial_believers * (1 - fraction_disbelievers) / max(self.num_people, 1)
+        disbelievers = num_initial_believers * fraction_disbelievers / max(self.num_people, 1)
+        #The state of every class: the fraction of people per number of memes seen (index 0: unaware, 1: believers),
+        #and per number of fact-checks seen. Disbelievers are the rest.
+        memes = np.zeros((2, num_classes, size))
+        memes[0, :, 0] = 1 - believers - disbelievers
+        memes[1, :, 0] = believers
+        factchecks = memes.copy()
+        #The fraction of every class that has just become a believer (or disbeliever), and so posts in the next step.
+        new_believers = np.full(num_classes, believers)
+        new_disbelievers = np.full(num_classes, disbelievers)
+
+        fractions_believers = np.zeros(timesteps)
+        fractions_disbelievers = np.zeros(timesteps)
+        for step in range(timesteps):
+            #The expected number of memes (and fact-checks) that someone in each class sees.
+            meme_posts = new_believers @ self.class_edges / self.class_sizes
+            factcheck_posts = new_disbelievers @ self.class_edges / self.class_sizes
+            memes, factchecks, new_believers, new_disbelievers = _see(memes, factchecks, meme_posts, table, check, meme=True)
+            factchecks, memes, _, more_disbelievers = _see(factchecks, memes, factcheck_posts, table, check, meme=False)
+            new_disbelievers += more_disbelievers
+            unaware, believing = memes.sum(axis=2) @ self.class_sizes / max(self.num_people, 1)
+            fractions_believers[step] = believing
+            fractions_disbelievers[step] = 1 - unaware - believing
+            if new_believers @ self.class_sizes + new_disbelievers @ self.class_sizes < 1e-9 * self.num_people:
+                #Nothing is spreading anymore.
+                fractions_believers[step:] = believing
+                fractions_disbelievers[step:] = fractions_disbelievers[step]
+                break
+
+        peak_step = int(np.argmax(fractions_believers)) if timesteps else -1
+        if timesteps == 0 or believers >= fractions_believers[peak_step]:
+            peak_step = -1
+        max_fraction = max(believers, float(fractions_believers.max(initial=0.0)))
+        return MeanFieldResult(fractions_believers, fractions_disbelievers, max_fraction, peak_step)
+
+
+def screen(sn: SocialNetwork, points: Union[Dict[str, list], List[dict]], **kwargs) -> List[dict]:
+    """
+    Estimates the cascade for every parameter setting ("point"), like Sweep.run_sweep but with the mean-field model.
+    :param points: A grid (see Sweep.expand_grid) or a list of dicts, each mapping settings of SCREEN_SETTINGS to values.
+    :param kwargs: optional. Passed on to MeanField.
+    :return: a list of dicts with the settings of each point, its estimated fraction of believers after each step,
+        and its estimated maximum fraction of believers.
+    """
+    if isinstance(points, dict):
+        points = expand_grid(points)
+    for point in points:
+        unknown = set(point) - set(SCREEN_SETTINGS)
+        if unknown:
+            raise ValueError(f"Cannot screen {sorted(unknown)} with the mean-field model. Choose from {SCREEN_SETTINGS}.")
+    graph = sn._as_compact_graph()
+    model = MeanField(graph, **kwargs)
+    results = []
+    for point in points:
+        with config_overrides(point):
+            result = model.estimate()
+            results.append({
+                "settings": {name: getattr(config, name) for name in SCREEN_SETTINGS},
+                "fractions_believers": result.fractions_believers.tolist(),
+                "max_fraction_believers": result.max_fraction_believers,
+            })
+    return results
+
+
+def validate(sn: SocialNetwork, num_replicas: int = 20, num_workers: int = 0, seed: int = 0, model: MeanField = None) -> dict:
+    """
+    Compares the estimate with the mean of num_replicas simulations of the configured experiment (see Ensemble.run_ensemble),
+    to see how far off the mean-field model is for this network and these parameters.
+    :param sn: A compact network, without interventions (the experiment is applied here, and removed again afterwards).
+    :param model: optional. The model to check (default: MeanField.from_network of the network with the experiment applied).
+    :return: the errors (estimate - simulation): of the maximum fraction of believers, of the time step of the peak,
+        and the largest and mean absolute errors of the fraction of believers over time. Also the values themselves,
+        the time both methods took, and whether the experiment seeds hubs (which the model approximates by random seeds).
+    """
+    experiment_type = config.experiment_type
+    start = time.perf_counter()
+    if model is None:
+        interventions = apply_experiment(sn, experiment_type)
+        try:
+            model = MeanField.from_network(sn)
+        finally:
+            for intervention in interventions:
+                sn.remove_intervention(intervention)
+    #The *_initial_checkers experiments seed 1% of the initial people as disbelievers (see Experiments.seed_experiment).
+    fraction_disbelievers = 0.01 if experiment_type in ["nonhub_initial_checkers", "hub_initial_checkers"] else 0.0
+    estimate = model.estimate(fraction_disbelievers=fraction_disbelievers)
+    estimate_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    simulation = run_ensemble(sn, num_replicas, num_workers, seed)
+    simulation_seconds = time.perf_counter() - start
+
+    simulated = simulation.mean()
+    #Simulated curves stop when nothing is left to spread; the fractions don't change after that.
+    simulated = np.concatenate([simulated, np.full(len(estimate.fractions_believers) - len(simulated), simulated[-1])])
+    errors = estimate.fractions_believers - simulated
+    #Like estimate.peak_step, the simulated peak counts from -1 (the initial believers, before the first step).
+    initial_believers = int(config.num_with_initial_meme * (1 - fraction_disbelievers)) / max(len(sn.people), 1)
+    simulated_peak_step = int(np.argmax(np.concatenate([[initial_believers], simulated]))) - 1
+    return {
+        "estimated_max_fraction": estimate.max_fraction_believers,
+        "simulated_max_fraction": float(simulation.max_fractions.mean()),
+        "max_fraction_error": estimate.max_fraction_believers - float(simulation.max_fractions.mean()),
+        "peak_step_error": estimate.peak_step - simulated_peak_step,
+        "max_curve_error": float(np.abs(errors).max(initial=0.0)),
+        "mean_curve_error": float(np.abs(errors).mean()) if len(errors) else 0.0,
+        "estimate_seconds": estimate_seconds,
+        "simulation_seconds": simulation_seconds,
+        "hub_seeding_approximated": experiment_type == "hub_initial_checkers",
+    }
+
+
+#---Private Methods---------------------------------------------------
+def _degree_classes(degrees: np.ndarray, num_classes: int) -> np.ndarray:
+    """
+    Returns the class of everyone: one class per degree for small degrees, logarithmically spaced classes for larger ones.
+    """
+    max_degree = int(degrees.max(initial=0))
+    if max_degree < num_classes:
+        return degrees.astype(np.int64)
+    small = num_classes // 2
+    bounds = np.unique(np.geomspace(small, max_degree + 1, num_classes - small + 1).astype(np.int64))
+    bounds = np.concatenate([np.arange(small), bounds[bounds > small - 1]])
+    return np.searchsorted(bounds, degrees, side="right") - 1
+
+
+def _see(seen: np.ndarray, other: np.ndarray, expected: np.ndarray, table: np.ndarray, check: np.ndarray, meme: bool):
+    """
+    Lets everyone see a Poisson(expected) number of memes (if meme) or fact-checks, and react to each of them as in Person.see.
+    :param seen: The fractions per class by number of these posts seen (shape (2, classes, max_exposures + 1), see estimate).
+    :param other: The fractions per class by number of the other kind of posts seen. Only rescaled as people change their mind.
+    :param expected: The expected number of posts seen, per class.
+    :return: (seen, other, new believers, new disbelievers) after the step, the latter two as fractions of every class.
+    """
+    size = seen.shape[2]
+    if not expected.any():
+        return seen, other, np.zeros(len(expected)), np.zeros(len(expected))
+    #The Poisson probabilities of seeing 0, 1, 2... posts, up to where the rest is negligible for every class.
+    most = float(expected.max())
+    num_posts = int(np.ceil(most + 10 * np.sqrt(most) + 10))
+    counts = np.arange(num_posts)
+    log_factorials = np.concatenate([[0.0], np.cumsum(np.log(np.arange(1, num_posts)))])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        weights = np.exp(counts * np.log(expected)[:, None] - expected[:, None] - log_factorials)
+    weights[expected == 0] = (counts == 0)
+
+    #Posts are worked out one by one, for the classes that may still see more of them.
+    #Once more posts are negligible for a class (or after size posts, see below), its mean is complete.
+    #The classes are sorted by the number of posts they need, so the ones still going are always the first ones.
+    remaining = 1 - weights.cumsum(axis=1)
+    needed = np.minimum(np.argmax(np.hstack([remaining, np.zeros((len(expected), 1))]) < 1e-12, axis=1), size)
+    order = np.argsort(-needed, kind="stable")
+    weights, remaining, needed, check = weights[order], remaining[order], needed[order], check[order]
+    state_seen, state_other = seen[:, order], other[:, order]
+    new_believers = np.zeros(len(expected))
+    new_disbelievers = np.zeros(len(expected))
+    mean_seen = np.zeros_like(seen)
+    mean_other = np.zeros_like(other)
+    mean_believers = np.zeros(len(expected))
+    mean_disbelievers = np.zeros(len(expected))
+    num_active = len(expected)
+    for posts in range(int(needed[0]) + 1):
+        still_active = int(np.count_nonzero(needed > posts))
+        if still_active < num_active:
+            done = slice(still_active, num_active)
+            rest = np.clip(remaining[done, posts - 1], 0.0, 1.0) if posts else np.ones(num_active - still_active)
+            done_seen, done_other = state_seen[:, done], state_other[:, done]
+            done_believers, done_disbelievers = new_believers[done], new_disbelievers[done]
+            if posts == size and weights.shape[1] > size:
+                #After size posts, everyone is at the last count, where the kernel doesn't change anymore: the chance to
+                #still not have reacted after m more posts is (1 - table[-1]) ^ m, so all further posts can be handled at once.
+                not_reacting = weights[done, size:] @ (1 - table[-1]) ** np.arange(weights.shape[1] - size)
+                bulk_table = np.zeros((len(rest), size))
+                bulk_table[:, -1] = np.divide(rest - not_reacting, rest, out=np.zeros(len(rest)), where=rest > 0)
+                done_seen, done_other, believers, disbelievers = _see_one(done_seen, done_other, bulk_table, check[done], meme)
+                done_believers = done_believers + believers
+                done_disbelievers = done_disbelievers + disbelievers
+            mean_seen[:, done] += rest[:, None] * done_seen
+            mean_other[:, done] += rest[:, None] * done_other
+            mean_believers[done] += rest * done_believers
+            mean_disbelievers[done] += rest * done_disbelievers
+            num_active = still_active
+            if num_active == 0:
+                break
+        active = slice(0, num_active)
+        weight = weights[active, posts]
+        state_seen, state_other = state_seen[:, active], state_other[:, active]
+        mean_seen[:, active] += weight[:, None] * state_seen
+        mean_other[:, active] += weight[:, None] * state_other
+        mean_believers[active] += weight * new_believers[active]
+        mean_disbelievers[active] += weight * new_disbelievers[active]
+        state_seen, state_other, believers, disbelievers = _see_one(state_seen, state_other, table, check[active], meme)
+        new_believers = new_believers[active] + believers
+        new_disbelievers = new_disbelievers[active] + disbelievers
+
+    #Back to the original order of the classes.
+    unsorted = np.argsort(order)
+    return mean_seen[:, unsorted], mean_other[:, unsorted], mean_believers[unsorted], mean_disbelievers[unsorted]
+
+
+def _see_one(seen: np.ndarray, other: np.ndarray, table: np.ndarray, check: np.ndarray, meme: bool):
+    """
+    Lets everyone see one more meme (if meme) or fact-check. See _see.
+    :param table: The probability to react, by count (and optionally by class: shape (classes, counts)).
+    """
+    before = seen.sum(axis=2)
+    #Everyone counts the post (beyond the last count, everyone stays at the last count).
+    shifted = np.zeros_like(seen)
+    shifted[:, :, 1:] = seen[:, :, :-1]
+    shifted[:, :, -1] += seen[:, :, -1]
+    #The unaware react with the kernel's probability; they believe, or fact-check and become disbelievers.
+    #Believers ignore memes, but react to fact-checks by becoming disbelievers.
+    reacting = shifted * table
+    if meme:
+        reacting[1] = 0.0
+    react = reacting.sum(axis=2)
+    shifted -= reacting
+    new_believers = np.zeros(seen.shape[1])
+    if meme:
+        new_believers = react[0] * (1 - check)
+        shifted[1] += reacting[0] * (1 - check)[:, None]
+    new_disbelievers = react.sum(axis=0) - new_believers
+
+    #The other counts are spread as before within every attitude (they are assumed to be independent of these counts).
+    shape = np.divide(other, before[:, :, None], out=np.zeros_like(other), where=before[:, :, None] > 0)
+    after = shifted.sum(axis=2)
+    other = shape * after[:, :, None]
+    if meme:
+        #New believers were unaware, so their other counts are distributed like those of the unaware.
+        other[1] = shape[1] * (before[1] - react[1])[:, None] + shape[0] * new_believers[:, None]
+    return shifted, other, new_believers, new_disbelievers
+
+
+if __name__ == "__main__":
+    network = build_network(backend="compact", seed=config.random_seed)
+    configure_network(network)
+    print(f"Mean-field model of the {config.model_type} network ({network.graph.number_of_nodes()} people):")
+    report = validate(network, num_replicas=max(config.num_replicas, 20), num_workers=config.num_workers, seed=config.random_seed or 0)
+    print(f"Maximum fraction of believers: estimated {report['estimated_max_fraction']:.2%}, "
+          f"simulated {report['simulated_max_fraction']:.2%} (error {report['max_fraction_error']:+.2%}).")
+    print(f"Fraction of believers over time: largest error {report['max_curve_error']:.2%}, mean error {report['mean_curve_error']:.2%}.")
+    print(f"Time: {report['estimate_seconds'] * 1000:.1f} ms for the estimate, {report['simulation_seconds']:.1f} s for the simulations.")
+    if report["hub_seeding_approximated"]:
+        print("Note: the model seeds the initial disbelievers at random, while this experiment seeds them among the hubs.")
+    grid = {name: values for name, values in config.sweep_grid.items() if name in SCREEN_SETTINGS}
+    if grid:
+        for result in screen(network, grid):
+            point = {name: result["settings"][name] for name in grid}
+            print(f"{point}: at most {result['max_fraction_believers']:.2%} believers")
@@ -0,0 +1,161 @@
+from typing import List, Sequence, Union
+import numpy as np
+
+from SocialNetwork import SocialNetwork
+from FrontierEngine import process_events, expand_followers
+from Person import UNAWARE, BELIEVER, DISBELIEVER
+
+#Runs many cascades (replicas) on one graph at the same time, in lockstep.
+#The state of replica r, person u lives at index r * num_people + u of long arrays, so one call of the vectorised engine
+#(FrontierEngine.process_events) processes the events of all replicas, and the followers of everyone who changed their mind
+#in any replica are looked up in the graph in one go. Compared with running the replicas one after the other, every step
+#costs a handful of big array operations instead of many small ones. That is much faster for small graphs, where the
+#per-step overhead dominates (about twice as fast for 1000 people). For big graphs (100k+ people), the arrays are
+#already big for a single replica, and running the replicas one by one is just as fast.
+#
+#The replicas share the graph, the adoption kernel and the random numbers of the network (sn.kernel and sn.rng),
+#but can start from different seed sets and use different fact-check probabilities. The network's own state is not touched.
+#Each replica follows exactly the rules of the vectorised engine; with one replica, a MultiCascade gives the same
+#cascade as the network itself (with the same seed).
+
+
+class MultiCascade:
+    def __init__(self, sn: SocialNetwork, num_replicas: int, check_probability: Union[np.ndarray, Sequence[float], None] = None) -> None:
+        """
+        :param sn: A network with graph_backend "compact". Interventions applied to it apply to all replicas.
+        :param num_replicas: The number of cascades.
+        :param check_probability: optional. The fact-check probabilities: one per replica (everyone in that replica gets it,
+            like FACT_CHECK_PROBABILITY), or an array of shape (num_replicas, num_people). By default, every replica uses
+            the network's check probabilities (including interventions such as make_hubs_factcheckers).
+        """
+        if sn.backend != "compact":
+            raise ValueError("MultiCascade needs a network with graph_backend = \"compact\"")
+        self.sn = sn
+        self.num_replicas = num_replicas
+        self.num_people = len(sn.people)
+        size = num_replicas * self.num_people
+        self.attitudes = np.full(size, UNAWARE, dtype=np.int8)
+        self.times_seen_meme = np.zeros(size, dtype=np.int32)
+        self.times_seen_factcheck = np.zeros(size, dtype=np.int32)
+        if check_probability is None:
+            self.check_probability = np.tile(sn.people.check_probability, num_replicas)
+        else:
+            check_probability = np.asarray(check_probability, dtype=np.float64)
+            if check_probability.ndim == 1:
+                check_probability = np.repeat(check_probability[:, None], self.num_people, axis=1)
+            if check_probability.shape != (num_replicas, self.num_people):
+                raise ValueError(f"check_probability should have {num_replicas} values, or shape ({num_replicas}, {self.num_people})")
+            self.check_probability = check_probability.reshape(-1).copy()
+        #Pending events, as indices into the state arrays (see the top of this file).
+        self.frontier_nodes = np.zeros(0, dtype=np.int64)
+        self.frontier_attitudes = np.zeros(0, dtype=np.int8)
+        self._pruned_nodes = np.zeros(0, dtype=np.int64)
+        self._pruned_attitudes = np.zeros(0, dtype=np.int8)
+        #The number of people with each attitude, per replica (shape (num_replicas, 3)).
+        self.attitude_counts = np.zeros((num_replicas, 3), dtype=np.int64)
+        self.attitude_counts[:, UNAWARE] = self.num_people
+        self.max_fractions_believers = np.zeros(num_replicas)
+        #The fraction of believers of every replica after every step.
+        self.history: List[np.ndarray] = []
+
+    def seed_meme(self, num_initial_believers: int, fraction_disbelievers: float = 0.0, use_hubs: bool = False, hub_measure: str = "degree") -> None:
+        """
+        Seeds every replica with its own random initial believers (and disbelievers), like SocialNetwork.seed_meme.
+        """
+        if num_initial_believers > self.num_people:
+            raise ValueError(f"Number of initial believers ({num_initial_believers}) exceeds the number of people ({self.num_people}) in the network.")
+        generator = self.sn.rng.generator
+        hubs = None
+        if fraction_disbelievers > 0.0 and use_hubs:
+            hubs = np.array([person.id for person, _ in self.sn.identify_hub_nodes(threshold=0.95, measure=hub_measure)], dtype=np.int64)
+        for replica in range(self.num_replicas):
+            #The same draws as SocialNetwork.seed_meme, so that a single replica matches the network exactly.
+            believers = generator.choice(self.num_people, int(num_initial_believers * (1 - fraction_disbelievers)), replace=False)
+            disbelievers = np.zeros(0, dtype=np.int64)
+            if fraction_disbelievers > 0.0:
+                candidates = hubs if use_hubs else np.setdiff1d(np.arange(self.num_people), believers)
+                disbelievers = candidates[generator.choice(len(candidates), int(num_initial_believers * fraction_disbelievers), replace=False)]
+            self.seed_people(replica, believers, disbelievers)
+
+    def seed_people(self, replica: int, believers: Sequence[int], disbelievers: Sequence[int] = ()) -> None:
+        """
+        Makes the given people (by index in network.people) initial believers and disbelievers of one replica.
+        """
+        offset = replica * self.num_people
+        for people, attitude in [(np.asarray(believers, dtype=np.int64), BELIEVER), (np.asarray(disbelievers, dtype=np.int64), DISBELIEVER)]:
+            if len(people) == 0:
+                continue
+            np.add.at(self.attitude_counts[replica], self.attitudes[offset + people], -1)
+            self.attitudes[offset + people] = attitude
+            self.attitude_counts[replica, attitude] += len(people)
+            followers, _ = expand_followers(self.sn.graph.offsets, self.sn.graph.targets, people)
+            self.frontier_nodes = np.concatenate([self.frontier_nodes, followers + offset])
+            self.frontier_attitudes = np.concatenate([self.frontier_attitudes, np.full(len(followers), attitude, dtype=np.int8)])
+            if attitude == BELIEVER:
+                self.max_fractions_believers[replica] = max(self.max_fractions_believers[replica], self.get_fractions_believers()[replica])
+
+    def evolve_state(self) -> None:
+        """
+        Advances every replica by one time step.
+        """
+        self.sn.kernel.update()
+        self._apply_pruned()
+        transitions = process_events(self.attitudes, self.times_seen_meme, self.times_seen_factcheck, self.check_probability,
+                                     self.frontier_nodes, self.frontier_attitudes,
+                                     beta=self.sn.kernel, random=self.sn.rng.random_array)
+        replicas, people = np.divmod(transitions.nodes, self.num_people)
+        followers, source_index = expand_followers(self.sn.graph.offsets, self.sn.graph.targets, people)
+        self.frontier_nodes = followers + replicas[source_index] * self.num_people
+        self.frontier_attitudes = transitions.new_attitudes[source_index]
+        if self.sn.prune_absorbing:
+            #As in SocialNetwork._evolve_frontier: events that can't change anyone's mind are only counted.
+            targets = self.attitudes[self.frontier_nodes]
+            dead = (targets == DISBELIEVER) | (targets == self.frontier_attitudes)
+            self._pruned_nodes = self.frontier_nodes[dead]
+            self._pruned_attitudes = self.frontier_attitudes[dead]
+            self.frontier_nodes = self.frontier_nodes[~dead]
+            self.frontier_attitudes = self.frontier_attitudes[~dead]
+            if len(self.frontier_nodes) == 0:
+                self._apply_pruned()
+        np.add.at(self.attitude_counts, (replicas, transitions.new_attitudes), 1)
+        np.add.at(self.attitude_counts, (replicas, transitions.old_attitudes), -1)
+        fractions = self.get_fractions_believers()
+        self.max_fractions_believers = np.maximum(self.max_fractions_believers, fractions)
+        self.history.append(fractions)
+
+    def run(self, timesteps: int) -> np.ndarray:
+        """
+        Evolves all replicas until nothing is left to spread (or timesteps is reached).
+        :return: the fraction of believers of every replica after every step, an array of shape (num_replicas, steps).
+        """
+        for _ in range(timesteps):
+            self.evolve_state()
+            if self.num_pending_events() == 0:
+                break
+        return np.array(self.history).reshape(-1, self.num_replicas).T
+
+    def num_pending_events(self) -> int:
+        return len(self.frontier_nodes)
+
+    def pending_events_per_replica(self) -> np.ndarray:
+        return np.bincount(self.frontier_nodes // self.num_people, minlength=self.num_replicas)
+
+    def get_fractions_believers(self) -> np.ndarray:
+        """
+        Returns the fraction of believers of every replica.
+        """
+        return self.attitude_counts[:, BELIEVER] / self.num_people
+
+    def replica_attitudes(self, replica: int) -> np.ndarray:
+        """
+        Returns everyone's attitude in one replica (a view, by index in network.people).
+        """
+        return self.attitudes[replica * self.num_people:(replica + 1) * self.num_people]
+
+    def _apply_pruned(self) -> None:
+        if len(self._pruned_nodes):
+            is_meme = self._pruned_attitudes == BELIEVER
+            np.add.at(self.times_seen_meme, self._pruned_nodes[is_meme], 1)
+            np.add.at(self.times_seen_factcheck, self._pruned_nodes[~is_meme], 1)
+            self._pruned_nodes = np.zeros(0, dtype=np.int64)
+            self._pruned_attitudes = np.zeros(0, dtype=np.int8)
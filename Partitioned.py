@@ -0,0 +1,430 @@
+from typing import List, Tuple
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import traceback
+import numpy as np
+
+from CompactGraph import CompactGraph
+from AdoptionKernel import AdoptionKernel
+from SocialNetwork import SocialNetwork, StepRecord
+from FrontierEngine import process_events, expand_followers
+from RandomPool import RandomPool
+from Ensemble import SharedGraph, SharedArrays, REPLICA_SETTINGS
+from Person import BELIEVER, DISBELIEVER
+import config
+
+#Runs one cascade on several cores, for networks that are too big for one.
+#The graph is split into partitions with few edges between them (partition_graph), and every partition is simulated
+#by its own worker process, which owns the state of its people. Every evolve_state is a bulk-synchronous superstep:
+# 1. every worker processes the events of its people (with the vectorised engine, FrontierEngine.process_events),
+# 2. it keeps the resulting events for its own people, and writes the events for other partitions to a shared-memory outbox,
+# 3. the main process adds up the statistics of all workers (fraction of believers, pending events), and tells every
+#    worker where its events for the next step are in the other workers' outboxes.
+#With prune_absorbing, the main process then also has every worker pick up its events for the next step and prune them
+#like the vectorized engine does (once every worker has finished the step, so everyone's attitude is final),
+#so only the events that can change someone's mind are processed and counted as pending.
+#The people are renumbered so that every partition owns a contiguous range, and the state of everyone lives in shared
+#memory, so the main process can read (and sync()) it without asking the workers.
+#Every worker draws its own random numbers (seeded from the network's seed), so the results are statistically the same as
+#those of the vectorized engine, and the same for the same seed and partitioning, but not identical to a single-process run.
+
+
+class PartitionedNetwork:
+    def __init__(self, sn: SocialNetwork, num_parts: int, parts: np.ndarray = None) -> None:
+        """
+        Takes over the cascade of a (seeded) network, and starts one worker process per partition.
+        Use evolve_state(), num_pending_events() and get_fraction_believers() as for the network itself,
+        then sync() to copy the results back to the network, and close() to stop the workers.
+        :param sn: A network with graph_backend "compact". The cascade continues from its current state.
+        :param num_parts: The number of partitions (and worker processes).
+        :param parts: optional. The partition of every person (by index in network.people), e.g. a saved result of partition_graph.
+        """
+        if sn.backend != "compact":
+            raise ValueError("Partitioned runs need a compact network (backend=\"compact\").")
+        self.sn = sn
+        self.num_parts = num_parts
+        self.prune_absorbing = sn.prune_absorbing
+        num_people = len(sn.people)
+        worker_seeds = sn.rng.seed_sequence.spawn(num_parts + 1)
+        self.parts = parts if parts is not None else partition_graph(sn.graph, num_parts, seed=worker_seeds[-1])
+
+        #Renumber the people so that partition p owns new ids starts[p]..starts[p + 1] - 1.
+        self.order = np.argsort(self.parts, kind="stable")
+        self.new_id = np.empty(num_people, dtype=np.int64)
+        self.new_id[self.order] = np.arange(num_people)
+        self.starts = np.concatenate([[0], np.cumsum(np.bincount(self.parts, minlength=num_parts))])
+        sources, targets = sn.graph.edges()
+        graph = CompactGraph.from_edges(num_people, self.new_id[sources], self.new_id[targets])
+        self._shared_graph = SharedGraph(graph)
+
+        sn._apply_pruned()
+        self._shared_state = SharedArrays([sn.people.attitudes[self.order], sn.people.times_seen_meme[self.order],
+                                           sn.people.times_seen_factcheck[self.order], sn.people.check_probability[self.order]])
+        (self.attitudes, self.times_seen_meme, self.times_seen_factcheck, _), self._state_blocks = SharedGraph.attach(self._shared_state.handle)
+
+        event_nodes, event_attitudes = self._take_pending_events()
+        owners = np.searchsorted(self.starts, event_nodes, side="right") - 1
+        settings = {name: getattr(config, name) for name in REPLICA_SETTINGS}
+        self._connections = []
+        self._workers = []
+        self._closed = False
+        for part in range(num_parts):
+            connection, worker_connection = mp.Pipe()
+            mine = owners == part
+            worker = mp.Process(target=_run_worker, daemon=True, args=(
+                worker_connection, self._shared_graph.handle, self._shared_state.handle, part, self.starts,
+                event_nodes[mine] - self.starts[part], event_attitudes[mine], sn.kernel, worker_seeds[part], settings))
+            worker.start()
+            self._connections.append(connection)
+            self._workers.append(worker)
+        #Where the events of the next step are: (outbox name, offset, count) for every (sender, receiver) pair.
+        self._incoming: List[List[Tuple[str, int, int]]] = [[] for _ in range(num_parts)]
+        self._pending = len(event_nodes)
+        self.attitude_counts = list(sn.attitude_counts)
+        self.max_fraction_believers = sn.max_fraction_believers
+        self.step_history: List[StepRecord] = []
+        #Who changed their mind since the last sync (by index in network.people), if the network tracks changes.
+        self._changes: List[np.ndarray] = []
+
+    def evolve_state(self) -> None:
+        """
+        Runs one superstep: every partition processes its events, then the events between partitions are exchanged.
+        """
+        for connection, incoming in zip(self._connections, self._incoming):
+            connection.send(("step", incoming))
+        replies = [self._receive(connection) for connection in self._connections]
+
+        self._incoming = [[] for _ in range(self.num_parts)]
+        new_attitudes = np.zeros(3, dtype=np.int64)
+        events_processed = 0
+        self._pending = 0
+        for outbox, counts, changes, new, processed, kept, changed in replies:
+            if self.sn.track_changes:
+                self._changes.append(self.order[changed])
+            offsets = np.cumsum(counts) - counts
+            for receiver in np.flatnonzero(counts).tolist():
+                self._incoming[receiver].append((outbox, int(offsets[receiver]), int(counts[receiver])))
+            for attitude in range(3):
+                self.attitude_counts[attitude] += int(changes[attitude])
+            new_attitudes += new
+            events_processed += processed
+            self._pending += int(counts.sum()) + kept
+        if self.prune_absorbing:
+            self._prune()
+        self.step_history.append(StepRecord(int(new_attitudes[BELIEVER]), int(new_attitudes[DISBELIEVER]), events_processed, self._pending))
+        self.max_fraction_believers = max(self.max_fraction_believers, self.get_fraction_believers())
+
+    def num_pending_events(self) -> int:
+        return self._pending
+
+    def get_fraction_believers(self) -> float:
+        return self.attitude_counts[BELIEVER] / len(self.attitudes)
+
+    def get_max_fraction_believers(self) -> float:
+        return self.max_fraction_believers
+
+    def sync(self) -> None:
+        """
+        Copies the state of the cascade back to the network (attitudes, counters, pending events and statistics),
+        so everything that works on the network (plots, snapshots, the renderer...) sees the current state.
+        """
+        sn = self.sn
+        sn.people.attitudes[:] = self.attitudes[self.new_id]
+        sn.people.times_seen_meme[:] = self.times_seen_meme[self.new_id]
+        sn.people.times_seen_factcheck[:] = self.times_seen_factcheck[self.new_id]
+        for connection, incoming in zip(self._connections, self._incoming):
+            connection.send(("collect", incoming))
+        self._incoming = [[] for _ in range(self.num_parts)]
+        pending = [self._receive(connection) for connection in self._connections]
+        nodes = self.order[np.concatenate([part_nodes for part_nodes, _, _, _ in pending])]
+        attitudes = np.concatenate([part_attitudes for _, part_attitudes, _, _ in pending])
+        sn._pruned_nodes = self.order[np.concatenate([pruned_nodes for _, _, pruned_nodes, _ in pending])]
+        sn._pruned_attitudes = np.concatenate([pruned_attitudes for _, _, _, pruned_attitudes in pending])
+        sn.spreading_event_queue.clear()
+        if sn.engine == "vectorized":
+            sn.frontier_nodes, sn.frontier_attitudes = nodes, attitudes
+        else:
+            sn.frontier_nodes, sn.frontier_attitudes = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int8)
+            sn.spreading_event_queue.extend(zip(sn.people.views(nodes), attitudes.tolist()))
+        sn.attitude_counts = list(self.attitude_counts)
+        sn.max_fraction_believers = self.max_fraction_believers
+        sn.step_history.extend(self.step_history)
+        self.step_history = []
+        sn._changes.extend(self._changes)
+        self._changes = []
+
+    def sync_changes(self) -> None:
+        """
+        Copies only the attitudes of the people who changed their mind since the last sync back to the network,
+        and hands them to the network's take_changes(). That is all a TrajectoryRecorder needs, and much cheaper than sync().
+        """
+        if self._changes:
+            changed = np.concatenate(self._changes)
+            self.sn.people.attitudes[changed] = self.attitudes[self.new_id[changed]]
+        self.sn._changes.extend(self._changes)
+        self._changes = []
+
+    def close(self) -> None:
+        """
+        Stops the workers and frees the shared memory. Call sync() first to keep the results.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        for connection, worker in zip(self._connections, self._workers):
+            try:
+                connection.send(("stop", None))
+            except (BrokenPipeError, OSError):
+                pass
+        for worker in self._workers:
+            worker.join()
+        del self.attitudes, self.times_seen_meme, self.times_seen_factcheck
+        for block in self._state_blocks:
+            block.close()
+        self._shared_state.close()
+        self._shared_graph.close()
+
+    def __enter__(self) -> 'PartitionedNetwork':
+        return self
+
+    def __exit__(self, *exception) -> None:
+        self.close()
+
+    def edge_cut(self) -> float:
+        """
+        Returns the fraction of edges between different partitions (the events along them go through shared memory).
+        """
+        sources, targets = self.sn.graph.edges()
+        return float(np.mean(self.parts[sources] != self.parts[targets])) if len(sources) else 0.0
+
+    def _prune(self) -> None:
+        """
+        Has every worker take its events for the next step and prune the ones that cannot change anyone's mind.
+        If nothing is left, the pruned events are counted right away, so the counters are final when the simulation stops.
+        """
+        for connection, incoming in zip(self._connections, self._incoming):
+            connection.send(("prune", incoming))
+        self._incoming = [[] for _ in range(self.num_parts)]
+        self._pending = sum(self._receive(connection) for connection in self._connections)
+        if self._pending == 0:
+            for connection in self._connections:
+                connection.send(("apply_pruned", []))
+            for connection in self._connections:
+                self._receive(connection)
+
+    def _take_pending_events(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the pending events of the network (in the new numbering).
+        """
+        sn = self.sn
+        queued_nodes = np.fromiter((person.id for person, _ in sn.spreading_event_queue), dtype=np.int64)
+        queued_attitudes = np.fromiter((attitude for _, attitude in sn.spreading_event_queue), dtype=np.int8)
+        nodes = np.concatenate([sn.frontier_nodes.astype(np.int64), queued_nodes])
+        attitudes = np.concatenate([sn.frontier_attitudes, queued_attitudes])
+        return self.new_id[nodes], attitudes
+
+    def _receive(self, connection):
+        status, reply = connection.recv()
+        if status == "error":
+            self.close()
+            raise RuntimeError(f"A partition worker failed:\n{reply}")
+        return reply
+
+
+def partition_graph(graph: CompactGraph, num_parts: int, iterations: int = 30, imbalance: float = 0.05,
+                    seed=None, chunk_size: int = 1 << 22) -> np.ndarray:
+    """
+    Splits the people into num_parts partitions of (about) equal size, with few edges between them.
+    Starts from contiguous ranges of ids (which already group related people in many data sets), then improves them with
+    balanced label propagation: people move to the partition most of their neighbours (followers and followees) are in,
+    as long as no partition grows beyond (1 + imbalance) times the average size.
+    This is a fast, simple alternative to METIS-style multilevel partitioning, which would need an extra dependency.
+    :param seed: optional. Seed for the order of the moves.
+    :param chunk_size: optional. Edges are counted in chunks of about this many, to bound the memory use.
+    :return: the partition of every person.
+    """
+    num_nodes = graph.number_of_nodes()
+    parts = (np.arange(num_nodes, dtype=np.int64) * num_parts // max(num_nodes, 1)).astype(np.int32)
+    if num_parts <= 1 or num_nodes == 0:
+        return parts
+    rng = np.random.default_rng(seed)
+    capacity = int(np.ceil(num_nodes / num_parts * (1 + imbalance)))
+    sources, targets = graph.edges()
+    neighbours = CompactGraph.from_edges(num_nodes, np.concatenate([sources, targets]), np.concatenate([targets, sources]))
+    del sources, targets
+    for _ in range(iterations):
+        best = np.empty(num_nodes, dtype=np.int32)
+        gain = np.empty(num_nodes, dtype=np.int64)
+        for first, last in _node_chunks(neighbours.offsets, chunk_size):
+            start, end = int(neighbours.offsets[first]), int(neighbours.offsets[last])
+            rows = np.repeat(np.arange(last - first), np.diff(neighbours.offsets[first:last + 1]).astype(np.int64))
+            counts = np.bincount(rows * num_parts + parts[neighbours.targets[start:end]],
+                                 minlength=(last - first) * num_parts).reshape(-1, num_parts)
+            best[first:last] = counts.argmax(axis=1)
+            gain[first:last] = counts[np.arange(last - first), best[first:last]] - counts[np.arange(last - first), parts[first:last]]
+        #Only half of the people may move per round, so that neighbours don't keep swapping places.
+        movers = np.flatnonzero((gain > 0) & (rng.random(num_nodes) < 0.5))
+        if len(movers) == 0:
+            break
+        #The biggest gains first, as long as the partition they move to has room.
+        movers = movers[np.lexsort((-gain[movers], best[movers]))]
+        room = capacity - np.bincount(parts, minlength=num_parts)
+        group_starts = np.searchsorted(best[movers], np.arange(num_parts))
+        rank = np.arange(len(movers)) - group_starts[best[movers]]
+        movers = movers[rank < room[best[movers]]]
+        parts[movers] = best[movers]
+        #Stop when a round hardly improves the cut any more (as in graphs without any structure).
+        if gain[movers].sum() < 0.001 * len(neighbours.targets):
+            break
+    return parts
+
+
+#---Private Methods---------------------------------------------------
+def _node_chunks(offsets: np.ndarray, chunk_size: int) -> List[Tuple[int, int]]:
+    """
+    Splits the nodes into ranges (first, last) with about chunk_size edges each.
+    """
+    num_nodes = len(offsets) - 1
+    boundaries = np.searchsorted(offsets, np.arange(0, int(offsets[-1]), chunk_size), side="right") - 1
+    boundaries = np.unique(np.concatenate([[0], boundaries, [num_nodes]]))
+    return list(zip(boundaries[:-1].tolist(), boundaries[1:].tolist()))
+
+
+#---Worker Process---------------------------------------------------
+def _run_worker(connection, graph_handle: tuple, state_handle: tuple, part: int, starts: np.ndarray,
+                event_nodes: np.ndarray, event_attitudes: np.ndarray, kernel: AdoptionKernel,
+                seed: np.random.SeedSequence, settings: dict) -> None:
+    try:
+        for name, value in settings.items():
+            setattr(config, name, value)
+        _Partition(graph_handle, state_handle, part, starts, event_nodes, event_attitudes, kernel, seed).serve(connection)
+    except Exception:
+        connection.send(("error", traceback.format_exc()))
+
+
+#The state of one partition, in its worker process. People are numbered locally (new id - start).
+class _Partition:
+    def __init__(self, graph_handle: tuple, state_handle: tuple, part: int, starts: np.ndarray,
+                 event_nodes: np.ndarray, event_attitudes: np.ndarray, kernel: AdoptionKernel, seed: np.random.SeedSequence) -> None:
+        (self.offsets, self.targets), self._graph_blocks = SharedGraph.attach(graph_handle)
+        state, self._state_blocks = SharedGraph.attach(state_handle)
+        self.part = part
+        self.starts = starts
+        self.start, self.end = int(starts[part]), int(starts[part + 1])
+        self.attitudes, self.times_seen_meme, self.times_seen_factcheck, self.check_probability = (array[self.start:self.end] for array in state)
+        self.frontier_nodes = event_nodes
+        self.frontier_attitudes = event_attitudes
+        self.pruned_nodes = np.zeros(0, dtype=np.int64)
+        self.pruned_attitudes = np.zeros(0, dtype=np.int8)
+        self.kernel = kernel
+        self.rng = RandomPool(seed)
+        #Two outboxes, used in turn: while the others read the events of the last step from one, the next step is written to the other.
+        self._outboxes: List[shared_memory.SharedMemory] = [None, None]
+        self._inboxes = {}
+        self._step = 0
+
+    def serve(self, connection) -> None:
+        try:
+            while True:
+                command, incoming = connection.recv()
+                if command == "stop":
+                    return
+                self._receive_events(incoming)
+                if command == "collect":
+                    connection.send(("ok", (self.frontier_nodes + self.start, self.frontier_attitudes,
+                                            self.pruned_nodes + self.start, self.pruned_attitudes)))
+                elif command == "prune":
+                    connection.send(("ok", self.prune()))
+                elif command == "apply_pruned":
+                    self.apply_pruned()
+                    connection.send(("ok", None))
+                else:
+                    connection.send(("ok", self.evolve_state()))
+        finally:
+            for block in self._inboxes.values():
+                block.close()
+            for block in self._outboxes:
+                if block is not None:
+                    block.close()
+                    block.unlink()
+
+    def evolve_state(self) -> tuple:
+        #Pruned events count as processed in this step, like in SocialNetwork._evolve_frontier.
+        events_processed = len(self.frontier_nodes) + len(self.pruned_nodes)
+        self.apply_pruned()
+        self.kernel.update()
+        transitions = process_events(self.attitudes, self.times_seen_meme, self.times_seen_factcheck, self.check_probability,
+                                     self.frontier_nodes, self.frontier_attitudes,
+                                     beta=self.kernel, random=self.rng.random_array)
+        followers, source_index = expand_followers(self.offsets, self.targets, transitions.nodes + self.start)
+        attitudes = transitions.new_attitudes[source_index]
+        owners = np.searchsorted(self.starts, followers, side="right") - 1
+        mine = owners == self.part
+        self.frontier_nodes = followers[mine] - self.start
+        self.frontier_attitudes = attitudes[mine]
+
+        #Events for other partitions go to the outbox, grouped by receiver. An event is stored as one number: node * 2 + is_factcheck.
+        outgoing = np.flatnonzero(~mine)
+        outgoing = outgoing[np.argsort(owners[outgoing], kind="stable")]
+        codes = followers[outgoing].astype(np.int64) * 2 + (attitudes[outgoing] == DISBELIEVER)
+        counts = np.bincount(owners[outgoing], minlength=len(self.starts) - 1)
+        outbox = self._outbox(self._step % 2, len(codes))
+        np.ndarray(len(codes), dtype=np.int64, buffer=outbox.buf)[:] = codes
+        self._step += 1
+
+        changes = np.bincount(transitions.new_attitudes, minlength=3) - np.bincount(transitions.old_attitudes, minlength=3)
+        new_attitudes = np.bincount(transitions.new_attitudes, minlength=3)
+        return outbox.name, counts, changes, new_attitudes, events_processed, len(self.frontier_nodes), transitions.nodes + self.start
+
+    def prune(self) -> int:
+        """
+        Like the pruning of SocialNetwork._evolve_frontier: keeps only the events that can change someone's mind.
+        :return: the number of events left.
+        """
+        targets = self.attitudes[self.frontier_nodes]
+        dead = (targets == DISBELIEVER) | (targets == self.frontier_attitudes)
+        self.pruned_nodes = np.concatenate([self.pruned_nodes, self.frontier_nodes[dead]])
+        self.pruned_attitudes = np.concatenate([self.pruned_attitudes, self.frontier_attitudes[dead]])
+        self.frontier_nodes = self.frontier_nodes[~dead]
+        self.frontier_attitudes = self.frontier_attitudes[~dead]
+        return len(self.frontier_nodes)
+
+    def apply_pruned(self) -> None:
+        """
+        Like SocialNetwork._apply_pruned: counts the pruned events.
+        """
+        if len(self.pruned_nodes):
+            is_meme = self.pruned_attitudes == BELIEVER
+            np.add.at(self.times_seen_meme, self.pruned_nodes[is_meme], 1)
+            np.add.at(self.times_seen_factcheck, self.pruned_nodes[~is_meme], 1)
+            self.pruned_nodes = np.zeros(0, dtype=np.int64)
+            self.pruned_attitudes = np.zeros(0, dtype=np.int8)
+
+    def _receive_events(self, incoming: List[Tuple[str, int, int]]) -> None:
+        nodes = [self.frontier_nodes]
+        attitudes = [self.frontier_attitudes]
+        for name, offset, count in incoming:
+            if name not in self._inboxes:
+                self._inboxes[name] = shared_memory.SharedMemory(name=name)
+            codes = np.ndarray(offset + count, dtype=np.int64, buffer=self._inboxes[name].buf)[offset:]
+            nodes.append((codes >> 1) - self.start)
+            attitudes.append(np.where(codes & 1, DISBELIEVER, BELIEVER).astype(np.int8))
+        self.frontier_nodes = np.concatenate(nodes)
+        self.frontier_attitudes = np.concatenate(attitudes)
+        #Forget outboxes that their owners have replaced by bigger ones.
+        names = {name for name, _, _ in incoming}
+        for name in [name for name in self._inboxes if name not in names and len(self._inboxes) > 2 * (len(self.starts) - 1)]:
+            self._inboxes.pop(name).close()
+
+    def _outbox(self, index: int, size: int) -> shared_memory.SharedMemory:
+        """
+        Returns outbox index, with room for at least size events (replacing it by a bigger one if needed).
+        """
+        block = self._outboxes[index]
+        if block is None or block.size < size * 8:
+            if block is not None:
+                block.close()
+                block.unlink()
+            block = shared_memory.SharedMemory(create=True, size=max(2 * size * 8, 1 << 16))
+            self._outboxes[index] = block
+        return block
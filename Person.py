@@ -1,6 +1,10 @@
+from typing import Callable
 import random
+from collections.abc import Sequence
+import numpy as np
 
 from BetaFunction import beta_function
+from AdoptionKernel import AdoptionKernel
 import config
 
 UNAWARE = 0
@@ -18,10 +22,15 @@ class Person:
         self.times_seen_meme: int = 0
         self.times_seen_factcheck: int = 0
     
-    def see(self, see_what: int) -> int | None:
+    def see(self, see_what: int, attitude_counts: list = None, kernel: AdoptionKernel = None,
+            uniform: Callable[[], float] = random.random) -> int | None:
         """
         Simulates the person seeing a meme or a fact-check.
         :param see_what: The type of content seen ("believer" or "disbeliever").
+        :param attitude_counts: optional. A list with the number of people per attitude (indexed by attitude),
+            which is kept up to date if this person changes their mind.
+        :param kernel: optional. The adoption kernel to use instead of beta_function.
+        :param uniform: optional. Returns a uniform random number in [0, 1) (e.g. a RandomPool's random).
         :return: The thing they retweet ("believer", "disbeliever") if they retweet anything, otherwise None.
         """
         if see_what == BELIEVER:
@@ -35,13 +44,18 @@ class Person:
             return None
 
         x = self.times_seen_meme if see_what == BELIEVER else self.times_seen_factcheck
-        if random.random() < beta_function(x): #Roll a random chance to see if they even care enough to tweet something.
-            if random.random() < self.check_probability:
+        probability = kernel.probability(x) if kernel is not None else beta_function(x)
+        if uniform() < probability: #Roll a random chance to see if they even care enough to tweet something.
+            old_attitude = self.attitude
+            if uniform() < self.check_probability:
                 # Roll another random chance to see if they fact-check.
                 # Note: in case see_what == "disbeliever" this is effectively ignored, as the person becomes disbeliever either way.
                 self.attitude = DISBELIEVER
             else:
                 self.attitude = see_what
+            if attitude_counts is not None:
+                attitude_counts[old_attitude] -= 1
+                attitude_counts[self.attitude] += 1
             return self.attitude # Tweet what you now believe in (fact-check *or* what you just saw).
         return None
     
@@ -73,3 +87,117 @@ class Person:
         else:
             attitude = "unaware"
         return f"{self.id}: {attitude}"
+
+
+#A Person whose attributes live in the arrays of a Population instead of in the object itself.
+#Views are cheap to create and are created on the fly, so the network doesn't need one object per person.
+class PersonView(Person):
+    __slots__ = ['population']
+    def __init__(self, population: 'Population', unique_id: int) -> None:
+        self.id = unique_id
+        self.population = population
+
+    @property
+    def attitude(self) -> int:
+        return int(self.population._attitudes[self.id])
+
+    @attitude.setter
+    def attitude(self, value: int) -> None:
+        self.population._attitudes[self.id] = value
+
+    @property
+    def times_seen_meme(self) -> int:
+        return int(self.population._times_seen_meme[self.id])
+
+    @times_seen_meme.setter
+    def times_seen_meme(self, value: int) -> None:
+        self.population._times_seen_meme[self.id] = value
+
+    @property
+    def times_seen_factcheck(self) -> int:
+        return int(self.population._times_seen_factcheck[self.id])
+
+    @times_seen_factcheck.setter
+    def times_seen_factcheck(self, value: int) -> None:
+        self.population._times_seen_factcheck[self.id] = value
+
+    @property
+    def check_probability(self) -> float:
+        return float(self.population._check_probability[self.id])
+
+    @check_probability.setter
+    def check_probability(self, value: float) -> None:
+        self.population._check_probability[self.id] = value
+
+
+#Stores the state of every person in the network as NumPy arrays (index = person id).
+#Indexing it gives PersonViews, so it can be used wherever a list of people is expected.
+class Population(Sequence):
+    def __init__(self, size: int = 0) -> None:
+        self.size: int = size
+        #The underscored arrays may have spare capacity at the end, so appending people stays cheap.
+        self._attitudes = np.full(size, UNAWARE, dtype=np.int8)
+        self._times_seen_meme = np.zeros(size, dtype=np.int32)
+        self._times_seen_factcheck = np.zeros(size, dtype=np.int32)
+        self._check_probability = np.full(size, config.FACT_CHECK_PROBABILITY, dtype=np.float64)
+
+    #Each property is an array with one entry per person. Writing into them changes the people.
+    @property
+    def attitudes(self) -> np.ndarray:
+        return self._attitudes[:self.size]
+
+    @property
+    def times_seen_meme(self) -> np.ndarray:
+        return self._times_seen_meme[:self.size]
+
+    @property
+    def times_seen_factcheck(self) -> np.ndarray:
+        return self._times_seen_factcheck[:self.size]
+
+    @property
+    def check_probability(self) -> np.ndarray:
+        return self._check_probability[:self.size]
+
+    def append(self, person: Person) -> None:
+        """
+        Copies the state of a person into the arrays. Their id has to be the next free index.
+        """
+        if person.id != self.size:
+            raise ValueError(f"Person ids must be consecutive in a compact network: expected {self.size}, got {person.id}.")
+        if self.size == len(self._attitudes):
+            self._grow(max(16, 2 * self.size))
+        self._attitudes[self.size] = person.attitude
+        self._times_seen_meme[self.size] = person.times_seen_meme
+        self._times_seen_factcheck[self.size] = person.times_seen_factcheck
+        self._check_probability[self.size] = person.check_probability
+        self.size += 1
+
+    def views(self, ids: np.ndarray) -> list:
+        """
+        Returns a PersonView for each of the given ids.
+        """
+        return [PersonView(self, i) for i in ids.tolist()]
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.size))]
+        index = int(index)
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError("Population index out of range")
+        return PersonView(self, index)
+
+    #---Private Methods---------------------------------------------------
+    def _grow(self, capacity: int) -> None:
+        """
+        Reallocates the arrays with room for capacity people.
+        """
+        extra = capacity - len(self._attitudes)
+        self._attitudes = np.concatenate([self._attitudes, np.full(extra, UNAWARE, dtype=np.int8)])
+        self._times_seen_meme = np.concatenate([self._times_seen_meme, np.zeros(extra, dtype=np.int32)])
+        self._times_seen_factcheck = np.concatenate([self._times_seen_factcheck, np.zeros(extra, dtype=np.int32)])
+        self._check_probability = np.concatenate([self._check_probability, np.full(extra, config.FACT_CHECK_PROBABILITY)])
@@ -0,0 +1,91 @@
+from typing import Tuple, Union
+import math
+import multiprocessing as mp
+import numpy as np
+
+#Fast generators for directed Erdos-Renyi graphs without self-loops, returning edge arrays (sources, targets).
+#Instead of flipping a coin for each of the n(n-1) possible edges (which is what nx.erdos_renyi_graph does),
+#G(n, p) jumps straight from one edge to the next: the gap between two edges is geometrically distributed.
+#That makes the cost O(n + m) instead of O(n^2).
+
+#Graphs with at least this many nodes are generated in parallel chunks.
+PARALLEL_THRESHOLD = 10_000_000
+#Number of source nodes per chunk. Fixed (rather than depending on the number of workers) so results only depend on the seed.
+ROWS_PER_CHUNK = 1_000_000
+
+
+def gnp_edges(n: int, p: float, seed: Union[int, np.random.SeedSequence] = None, num_workers: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Generates a directed G(n, p) graph: every possible edge (u, v) with u != v exists with probability p.
+    :param n: The number of nodes.
+    :param p: The probability of each edge.
+    :param seed: optional. Seed for the random numbers (an int or a SeedSequence).
+    :param num_workers: optional. Worker processes for big graphs (0 means one per CPU core).
+    :return: (sources, targets), sorted by source and then target.
+    """
+    seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    if n < PARALLEL_THRESHOLD:
+        return _gnp_rows(n, p, 0, n, seed_sequence)
+
+    row_starts = list(range(0, n, ROWS_PER_CHUNK))
+    tasks = [(n, p, start, min(start + ROWS_PER_CHUNK, n), child) for start, child in zip(row_starts, seed_sequence.spawn(len(row_starts)))]
+    with mp.Pool(num_workers or None) as pool:
+        chunks = pool.starmap(_gnp_rows, tasks)
+    return np.concatenate([sources for sources, _ in chunks]), np.concatenate([targets for _, targets in chunks])
+
+
+def gnm_edges(n: int, m: int, seed: Union[int, np.random.SeedSequence] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Generates a directed G(n, m) graph: m distinct edges (u, v) with u != v, chosen uniformly at random.
+    :return: (sources, targets), sorted by source and then target.
+    """
+    num_possible = n * (n - 1)
+    if m > num_possible:
+        raise ValueError(f"A directed graph with {n} nodes has at most {num_possible} edges, not {m}.")
+    rng = np.random.default_rng(seed)
+    if m > num_possible // 2:
+        indices = np.sort(rng.choice(num_possible, m, replace=False))
+    else:
+        #Draw a few too many, remove duplicates and keep a random m of them.
+        indices = np.zeros(0, dtype=np.int64)
+        while len(indices) < m:
+            extra = int((m - len(indices)) * 1.1) + 16
+            indices = np.unique(np.concatenate([indices, rng.integers(0, num_possible, extra)]))
+        indices = np.sort(rng.choice(indices, m, replace=False))
+    return _index_to_edge(indices, n)
+
+
+#---Private Methods---------------------------------------------------
+def _gnp_rows(n: int, p: float, first_row: int, end_row: int, seed_sequence: np.random.SeedSequence) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Generates the edges of G(n, p) whose source is in [first_row, end_row).
+    Edge (u, v) has index u * (n - 1) + (v if v < u else v - 1), and we walk over the indices with geometric jumps.
+    """
+    start = first_row * (n - 1)
+    end = end_row * (n - 1)
+    if p <= 0 or end <= start:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    if p >= 1:
+        return _index_to_edge(np.arange(start, end, dtype=np.int64), n)
+
+    rng = np.random.default_rng(seed_sequence)
+    expected = (end - start) * p
+    batch_size = int(expected + 5 * math.sqrt(expected) + 64)
+    chunks = []
+    position = start - 1
+    while True:
+        indices = position + np.cumsum(rng.geometric(p, batch_size))
+        indices = indices[indices < end]
+        chunks.append(indices)
+        if len(indices) < batch_size:
+            break
+        position = indices[-1]
+        batch_size = max(64, batch_size // 4)
+    return _index_to_edge(np.concatenate(chunks), n)
+
+
+def _index_to_edge(indices: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    sources = indices // (n - 1)
+    targets = indices % (n - 1)
+    targets += targets >= sources
+    return sources, targets
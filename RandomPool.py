@@ -0,0 +1,76 @@
+from typing import Callable, List, Sequence, Tuple, TypeVar, Union
+import functools
+import itertools
+import numpy as np
+
+#The random numbers of one simulation run.
+#Every SocialNetwork owns a RandomPool, and everything random that happens to it (generating the graph,
+#seeding the meme, interventions, every exposure) draws from the pool's numpy Generator. So a run only depends on
+#its own seed: the same seed gives exactly the same cascade, no matter what else happens in the process (or in other processes).
+#
+#The python engine needs one uniform number at a time, and calling a Generator for each of them is slow.
+#Instead, uniforms are drawn in big blocks and handed out one by one (pool.random()), which is about as fast as random.random().
+
+T = TypeVar("T")
+
+#The number of uniforms drawn at once.
+BLOCK_SIZE = 1 << 16
+
+
+class RandomPool:
+    def __init__(self, seed: Union[int, np.random.SeedSequence, None] = None) -> None:
+        """
+        :param seed: optional. An int or a SeedSequence. Without a seed, the pool is seeded from the operating system.
+        """
+        self.seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self.generator = np.random.default_rng(self.seed_sequence)
+        self._block_iterator = iter([])
+        #Returns the next uniform number in [0, 1). (next() on a chain of blocks, so no python code runs per call.)
+        self.random: Callable[[], float] = functools.partial(next, itertools.chain.from_iterable(iter(self._next_block, None)))
+
+    def random_array(self, size: int) -> np.ndarray:
+        """
+        Returns an array of size uniform numbers in [0, 1) (for the vectorised engines).
+        """
+        return self.generator.random(size)
+
+    def sample(self, population: Sequence[T], k: int) -> List[T]:
+        """
+        Chooses k distinct elements of population, like random.sample.
+        """
+        return [population[i] for i in self.generator.choice(len(population), k, replace=False).tolist()]
+
+    def shuffle(self, items: list) -> None:
+        """
+        Shuffles a list in place, like random.shuffle.
+        """
+        items[:] = [items[i] for i in self.generator.permutation(len(items)).tolist()]
+
+    def spawn(self) -> np.random.SeedSequence:
+        """
+        Returns a new, independent seed derived from this pool's seed (e.g. for generating a graph).
+        """
+        return self.seed_sequence.spawn(1)[0]
+
+    def get_state(self) -> Tuple[dict, np.ndarray]:
+        """
+        Returns the state of the pool: the state of the Generator, and the uniforms of the current block not handed out yet.
+        """
+        _, arguments, *position = self._block_iterator.__reduce__()
+        block = arguments[0] if arguments else []
+        remaining = block[position[0]:] if position else []
+        return self.generator.bit_generator.state, np.array(remaining, dtype=np.float64)
+
+    def set_state(self, state: Tuple[dict, np.ndarray]) -> None:
+        """
+        Continues from a state returned by get_state(): the pool then gives exactly the same numbers as it did from there.
+        """
+        generator_state, remaining = state
+        self.generator.bit_generator.state = generator_state
+        self._block_iterator = iter(np.asarray(remaining, dtype=np.float64).tolist())
+        blocks = itertools.chain([self._block_iterator], iter(self._next_block, None))
+        self.random = functools.partial(next, itertools.chain.from_iterable(blocks))
+
+    def _next_block(self):
+        self._block_iterator = iter(self.generator.random(BLOCK_SIZE).tolist())
+        return self._block_iterator
@@ -0,0 +1,174 @@
+from typing import Union
+import math
+import imageio
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+
+from SocialNetwork import SocialNetwork
+from Person import UNAWARE, BELIEVER, DISBELIEVER
+
+#Renders the evolution of a network as an animation (GIF, or MP4 if imageio-ffmpeg is installed).
+#Unlike SocialNetwork.visualise, the nodes and edges are only laid out and drawn once. For every frame,
+#only the colours of the nodes change, and the picture goes straight into the video file (no PNG per frame).
+#For big networks, a sample of max_nodes people can be drawn instead. The sample is stratified by degree,
+#so the hubs, which are few but matter a lot, are in it too.
+
+#The colour of each attitude (the same as Person.get_colour).
+COLOURS = np.zeros((3, 4))
+COLOURS[UNAWARE] = (0.5, 0.5, 0.5, 1.0)
+COLOURS[BELIEVER] = (0.0, 0.5, 0.0, 1.0)
+COLOURS[DISBELIEVER] = (1.0, 0.0, 0.0, 1.0)
+
+
+class NetworkRenderer:
+    def __init__(self, sn: SocialNetwork, path: str, fps: float = 2, max_nodes: int = 0,
+                 seed: Union[int, None] = None, size: float = 6.4, dpi: int = 100) -> None:
+        """
+        :param sn: The network to draw. The graph shouldn't change while rendering (the attitudes will, of course).
+        :param path: The animation file, e.g. "network_evolution.gif".
+        :param fps: optional. Frames per second.
+        :param max_nodes: optional. If the network is bigger than this, only draw a degree-stratified sample
+            of this many people (0 draws everyone).
+        :param seed: optional. Seed for the sample and the layout.
+        :param size, dpi: optional. The size of the picture, in inches and dots per inch.
+        """
+        self.sn = sn
+        rng = np.random.default_rng(seed)
+        graph = sn._as_compact_graph()
+        self.nodes = degree_stratified_sample(graph.in_degree() + graph.out_degree(), max_nodes, rng) \
+            if 0 < max_nodes < len(sn.people) else np.arange(len(sn.people))
+        subgraph = graph.subgraph(self.nodes)
+        sources, targets = subgraph.edges()
+        positions = spring_layout(len(self.nodes), sources, targets, rng)
+
+        self.figure = Figure(figsize=(size, size), dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.figure)
+        axes = self.figure.add_axes([0, 0, 1, 1])
+        axes.set_axis_off()
+        #The more edges, the fainter they are drawn, so the nodes stay visible.
+        axes.add_collection(LineCollection(np.stack([positions[sources], positions[targets]], axis=1),
+                                           colors="black", linewidths=0.5, alpha=min(1.0, 200 / max(len(sources), 1) + 0.05)))
+        self.scatter = axes.scatter(positions[:, 0], positions[:, 1], s=380 / math.sqrt(len(self.nodes)), zorder=2)
+        axes.set_xlim(-1.05, 1.05)
+        axes.set_ylim(-1.05, 1.05)
+        self.writer = imageio.get_writer(path, fps=fps, **({"loop": 0} if path.endswith(".gif") else {}))
+        self.path = path
+
+    def add_frame(self) -> None:
+        """
+        Draws the current attitudes and appends the picture to the animation.
+        """
+        if self.sn.backend == "compact":
+            attitudes = self.sn.people.attitudes[self.nodes]
+        else:
+            attitudes = np.array([self.sn.people[i].attitude for i in self.nodes.tolist()], dtype=np.int8)
+        self.scatter.set_facecolor(COLOURS[attitudes])
+        self.canvas.draw()
+        self.writer.append_data(np.asarray(self.canvas.buffer_rgba())[:, :, :3])
+
+    def close(self) -> None:
+        """
+        Finishes the animation file.
+        """
+        self.writer.close()
+
+    def __enter__(self) -> 'NetworkRenderer':
+        return self
+
+    def __exit__(self, *exception) -> None:
+        self.close()
+
+
+def degree_stratified_sample(degree: np.ndarray, size: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Picks size people, the same fraction from each degree class (degree 0, 1, 2-3, 4-7, ...),
+    but at least one from every class, so even the rare high-degree classes are represented.
+    :return: the sorted ids of the sample.
+    """
+    strata = np.floor(np.log2(degree + 1)).astype(np.int64)
+    order = np.argsort(strata, kind="stable")
+    boundaries = np.flatnonzero(np.diff(strata[order])) + 1
+    chosen = []
+    for members in np.split(order, boundaries):
+        take = max(1, int(round(size * len(members) / len(degree))))
+        chosen.append(rng.choice(members, min(take, len(members)), replace=False))
+    chosen = np.concatenate(chosen)
+    if len(chosen) > size:
+        #Rounding up the small classes took too many: drop some from the big ones.
+        degrees = degree[chosen]
+        chosen = chosen[np.argsort(-degrees + rng.random(len(chosen)), kind="stable")[:size]]
+    return np.sort(chosen)
+
+
+def spring_layout(num_nodes: int, sources: np.ndarray, targets: np.ndarray, rng: np.random.Generator,
+                  iterations: int = 50, exact_limit: int = 2000) -> np.ndarray:
+    """
+    The Fruchterman-Reingold layout of nx.spring_layout, in plain NumPy.
+    Up to exact_limit nodes, every pair of nodes repels each other, computed block by block to keep memory small.
+    For more nodes that is too slow, so nodes are repelled by the centres of mass of a grid of cells instead
+    (and exactly by the other nodes in their own cell).
+    :return: an array of shape (num_nodes, 2) with positions between -1 and 1.
+    """
+    positions = rng.random((num_nodes, 2))
+    if num_nodes <= 1:
+        return positions * 0
+    k = math.sqrt(1.0 / num_nodes)
+    temperature = 0.1
+    cooling = temperature / (iterations + 1)
+    for _ in range(iterations):
+        if num_nodes <= exact_limit:
+            displacement = _repulsion(positions, positions, np.ones(num_nodes), k)
+        else:
+            displacement = _grid_repulsion(positions, k)
+        delta = positions[sources] - positions[targets]
+        attraction = delta * (np.sqrt((delta ** 2).sum(axis=1)) / k)[:, None]
+        np.subtract.at(displacement, sources, attraction)
+        np.add.at(displacement, targets, attraction)
+        length = np.maximum(np.sqrt((displacement ** 2).sum(axis=1)), 0.01)
+        positions += displacement * (np.minimum(length, temperature) / length)[:, None]
+        temperature -= cooling
+    #Scale so that nearly everything fills the picture. The few nodes that were pushed far away (e.g. people without
+    #any edges) are put on the border, instead of squeezing everybody else into the middle.
+    positions -= np.median(positions, axis=0)
+    positions /= max(np.quantile(np.abs(positions), 0.99), 1e-12)
+    return np.clip(positions, -1, 1)
+
+
+#---Private Methods---------------------------------------------------
+def _repulsion(positions: np.ndarray, sources: np.ndarray, masses: np.ndarray, k: float, block_size: int = 256) -> np.ndarray:
+    """
+    The repulsion on each position from all the (weighted) sources, block by block.
+    """
+    displacement = np.zeros((len(positions), 2))
+    for start in range(0, len(positions), block_size):
+        delta = positions[start:start + block_size, None, :] - sources[None, :, :]
+        distance_squared = np.maximum((delta ** 2).sum(axis=2), 1e-4)
+        displacement[start:start + block_size] = (delta * (k * k * masses / distance_squared)[:, :, None]).sum(axis=1)
+    return displacement
+
+
+def _grid_repulsion(positions: np.ndarray, k: float, cells_per_side: int = 32) -> np.ndarray:
+    lowest = positions.min(axis=0)
+    span = np.maximum(positions.max(axis=0) - lowest, 1e-12)
+    cell_xy = np.minimum(((positions - lowest) / span * cells_per_side).astype(np.int64), cells_per_side - 1)
+    cell = cell_xy[:, 0] * cells_per_side + cell_xy[:, 1]
+    mass = np.bincount(cell, minlength=cells_per_side ** 2).astype(np.float64)
+    occupied = np.flatnonzero(mass)
+    centres = np.stack([np.bincount(cell, positions[:, 0])[occupied], np.bincount(cell, positions[:, 1])[occupied]], axis=1) / mass[occupied, None]
+
+    #Far field: every cell except the node's own one. Near field: the other nodes in the same cell.
+    own_cell = np.searchsorted(occupied, cell)
+    displacement = np.zeros((len(positions), 2))
+    for start in range(0, len(positions), 256):
+        block = slice(start, start + 256)
+        masses = np.tile(mass[occupied], (len(own_cell[block]), 1))
+        masses[np.arange(len(masses)), own_cell[block]] = 0
+        delta = positions[block, None, :] - centres[None, :, :]
+        distance_squared = np.maximum((delta ** 2).sum(axis=2), 1e-4)
+        displacement[block] = (delta * (k * k * masses / distance_squared)[:, :, None]).sum(axis=1)
+    order = np.argsort(cell, kind="stable")
+    for members in np.split(order, np.flatnonzero(np.diff(cell[order])) + 1):
+        displacement[members] += _repulsion(positions[members], positions[members], np.ones(len(members)), k)
+    return displacement
@@ -0,0 +1,44 @@
+from typing import Dict
+import json
+import numpy as np
+
+#A snapshot of everything that changes while a cascade runs (see SocialNetwork.snapshot()):
+#everyone's attitude, times_seen counters and check probability, the pending spreading events,
+#the statistics so far and the state of the random numbers. The graph itself is not part of it.
+#All of it is stored as NumPy arrays, so a snapshot is small and saving, loading and restoring it is fast.
+#People are referred to by their index in network.people.
+
+#The arrays every snapshot has.
+FIELDS = ["attitudes", "times_seen_meme", "times_seen_factcheck", "check_probability",
+          "queue_nodes", "queue_attitudes", "frontier_nodes", "frontier_attitudes", "pruned_nodes", "pruned_attitudes",
+          "step_history", "max_fraction_believers", "random_remaining"]
+
+
+class Snapshot:
+    def __init__(self, arrays: Dict[str, np.ndarray], random_state: dict) -> None:
+        """
+        :param arrays: one array per name in FIELDS.
+        :param random_state: the state of the network's Generator (see RandomPool.get_state).
+        """
+        self.arrays = arrays
+        self.random_state = random_state
+
+    def num_people(self) -> int:
+        return len(self.arrays["attitudes"])
+
+    def save(self, path: str) -> None:
+        """
+        Writes the snapshot to a .npz file.
+        """
+        np.savez(path, random_state=np.array(json.dumps(self.random_state)), **self.arrays)
+
+    @staticmethod
+    def load(path: str) -> 'Snapshot':
+        """
+        Reads a snapshot written by save().
+        """
+        with np.load(path) as data:
+            missing = [name for name in FIELDS + ["random_state"] if name not in data]
+            if missing:
+                raise ValueError(f"{path} is not a snapshot: it is missing {missing}")
+            return Snapshot({name: data[name] for name in FIELDS}, json.loads(str(data["random_state"])))
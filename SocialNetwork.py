@@ -1,67 +1,169 @@
+from typing import Dict
 from typing import List
 from typing import Tuple
+from typing import Deque
+from typing import NamedTuple
+from typing import Union
+from collections import deque
 import networkx as nx
 import numpy as np
 import matplotlib.pyplot as plt
-import random
-from numpy.random import choice
 import math
 import pickle
 
-from Person import Person, BELIEVER, DISBELIEVER, UNAWARE
+from Person import Person, Population, BELIEVER, DISBELIEVER, UNAWARE
 from Bianconi import BianconiBarabasiModel
+from CompactGraph import CompactGraph, index_dtype
+from FrontierEngine import evolve_frontier
+from AdoptionKernel import AdoptionKernel, BetaKernel
+from RandomPool import RandomPool
+from CentralityIndex import CentralityIndex
+from Interventions import Intervention, EdgeMask, CheckProbabilityOverride
+from Snapshot import Snapshot
+from Instrumentation import AnyProfiler, NULL_PROFILER
+from GraphCache import load_igraph_cached
+from EdgeListImport import import_edge_list
+from RandomGraphs import gnp_edges, gnm_edges
+
+
+#What happened during one call of evolve_state.
+class StepRecord(NamedTuple):
+    new_believers: int
+    new_disbelievers: int
+    events_processed: int
+    queue_length: int #The number of events left for the next step.
 
 
 #This file defines our model of information spreading in a social network.
 class SocialNetwork:
     #---Model Creation----------------------------------------------------
-    def __init__(self) -> None:
-        self.graph = nx.DiGraph()
-        self.people: List[Person] = []
-        self.spreading_event_queue: List[Tuple[Person, int]] = []
+    def __init__(self, backend: str = "networkx", seed: Union[int, np.random.SeedSequence] = None) -> None:
+        """
+        :param backend: optional. "networkx" stores the graph as a DiGraph of Person objects.
+            "compact" stores it as CSR arrays (see CompactGraph) and the people as arrays (see Population),
+            which uses far less memory on big networks. In that case self.people hands out PersonViews.
+        :param seed: optional. Seed for all the randomness of this network (see RandomPool.py).
+        """
+        if backend == "networkx":
+            self.graph = nx.DiGraph()
+            self.people: List[Person] = []
+        elif backend == "compact":
+            self.graph = CompactGraph()
+            self.people = Population()
+        else:
+            raise ValueError(f"Unknown graph backend: {backend}")
+        self.backend = backend
+        self.engine = "python"
+        self.rng = RandomPool(seed)
+        self.spreading_event_queue: Deque[Tuple[Person, int]] = deque()
+        #Pending events of the vectorised engine, as arrays (see FrontierEngine.py).
+        self.frontier_nodes = np.zeros(0, dtype=np.int64)
+        self.frontier_attitudes = np.zeros(0, dtype=np.int8)
+        #If True, events that cannot change anyone's mind are not queued, only counted (see _apply_pruned).
+        self.prune_absorbing = False
+        #The probability of reacting to a meme or fact-check after seeing it x times (see AdoptionKernel.py).
+        self.kernel: AdoptionKernel = BetaKernel()
+        self._pruned_events: List[Tuple[Person, int]] = []
+        self._pruned_nodes = np.zeros(0, dtype=np.int64)
+        self._pruned_attitudes = np.zeros(0, dtype=np.int8)
         self.max_fraction_believers = 0.0
+        #The number of people with each attitude (indexed by attitude), kept up to date as people change their minds.
+        #If you change someone's attitude yourself (not through seed_meme or evolve_state), call recount_attitudes().
+        self.attitude_counts: List[int] = [0, 0, 0]
+        self.step_history: List[StepRecord] = []
+        #If True, the people who change their mind (in seed_meme or evolve_state) are remembered until take_changes(),
+        #so e.g. a TrajectoryRecorder doesn't have to compare everyone's attitude after every step.
+        self.track_changes = False
+        self._changes: List[np.ndarray] = []
+        self._positions: Dict[Person, int] = None
+        #Times the steps of the simulation. NULL_PROFILER does nothing; set a Profiler to measure (see Instrumentation.py).
+        self.profiler: AnyProfiler = NULL_PROFILER
         self.pos = None
+        #Applied interventions, in order (see Interventions.py), and what the network looked like without them.
+        self.interventions: List[Intervention] = []
+        self._base_graph = None
+        self._base_edges = None
+        self._base_check_probability = None
+        self._centrality: CentralityIndex = None
+        self._centrality_graph = None
+        self._centrality_version = None
+        #Counts the changes to a networkx graph (compact graphs keep their own version), so centrality() knows when to recompute.
+        self._graph_version = 0
 
     def add_person(self, person: Person) -> None:
+        #Note: in a compact network, the person's state is copied. Use self.people[person.id] to change it afterwards.
+        self._check_no_interventions()
         self.people.append(person)
-        self.graph.add_node(person)
+        self.attitude_counts[person.attitude] += 1
+        if self.backend == "compact":
+            self.graph.add_node()
+        else:
+            self.graph.add_node(person)
+            self._graph_version += 1
+            self._positions = None
         self.pos = None
 
     def add_follower(self, follower: Person, person_to_follow: Person) -> None:
         #Each person has an edge *to* each of their followers.
         # (so information spreads in the direction of the edges)
-        self.graph.add_edge(person_to_follow, follower)
+        self._check_no_interventions()
+        if self.backend == "compact":
+            self.graph.add_edge(person_to_follow.id, follower.id)
+        else:
+            self.graph.add_edge(person_to_follow, follower)
+            self._graph_version += 1
         self.pos = None
 
-    def seed_meme(self, num_initial_believers: int, fraction_disbelievers: float = 0.0, use_hubs: bool = False) -> None:
+    def get_followers(self, person: Person) -> List[Person]:
+        """
+        Returns the people who follow the given person (i.e. who see what they tweet).
+        """
+        if self.backend == "compact":
+            return self.people.views(self.graph.successors(person.id))
+        return self.graph.successors(person)
+
+    def set_engine(self, engine: str) -> None:
+        """
+        Chooses how evolve_state processes spreading events.
+        :param engine: "python" processes one event at a time with Person.see.
+            "vectorized" processes each timestep as a batch of arrays (only for compact networks, but much faster).
+        """
+        if engine == "vectorized" and self.backend != "compact":
+            raise ValueError("The vectorized engine needs a compact network (backend=\"compact\").")
+        if engine not in ["python", "vectorized"]:
+            raise ValueError(f"Unknown simulation engine: {engine}")
+        self.engine = engine
+
+    def seed_meme(self, num_initial_believers: int, fraction_disbelievers: float = 0.0, use_hubs: bool = False, hub_measure: str = "degree") -> None:
         """
         Seeds the meme in the network by setting a number of people to "believer".
         :param num_initial_believers: The number of initial believers.
         :param fraction_disbelievers: optional. Fraction of initial believers who are replaced with disbelievers.
         :param use_hubs: optional. If True, initial *dis*believers are chosen from hub nodes.
+        :param hub_measure: optional. The centrality measure that decides who is a hub (see identify_hub_nodes).
         """
         if num_initial_believers > len(self.people):
             raise ValueError(f"Number of initial believers ({num_initial_believers}) exceeds the number of people ({len(self.people)}) in the network.")
         
-        initial_believers = random.sample(self.people, int(num_initial_believers * (1 - fraction_disbelievers)))
+        initial_believers = self.rng.sample(self.people, int(num_initial_believers * (1 - fraction_disbelievers)))
         for person in initial_believers:
-            person.attitude = BELIEVER
-            for follower in self.graph.successors(person):
+            self._set_attitude(person, BELIEVER)
+            for follower in self.get_followers(person):
                 self.spreading_event_queue.append((follower, BELIEVER))
-        self.max_fraction_believers = num_initial_believers / len(self.people) if self.people else 0.0
+        self.max_fraction_believers = max(self.max_fraction_believers, self.get_fraction_believers())
 
         if fraction_disbelievers == 0.0:
             return
         
         #Start of optional part: For the experiment where we replace some initial believers with disbelievers:
         if use_hubs:
-            hubs = self.identify_hub_nodes(threshold=0.95)
-            initial_disbelievers = random.sample([person for person, _ in hubs], int(num_initial_believers * fraction_disbelievers))
+            hubs = self.identify_hub_nodes(threshold=0.95, measure=hub_measure)
+            initial_disbelievers = self.rng.sample([person for person, _ in hubs], int(num_initial_believers * fraction_disbelievers))
         else:
-            initial_disbelievers = random.sample([person for person in self.people if person not in initial_believers], int(num_initial_believers * fraction_disbelievers))
+            initial_disbelievers = self.rng.sample([person for person in self.people if person not in initial_believers], int(num_initial_believers * fraction_disbelievers))
         for person in initial_disbelievers:
-            person.attitude = DISBELIEVER
-            for follower in self.graph.successors(person):
+            self._set_attitude(person, DISBELIEVER)
+            for follower in self.get_followers(person):
                 self.spreading_event_queue.append((follower, DISBELIEVER))
 
 
@@ -71,17 +173,63 @@ class SocialNetwork:
         """
         Evolve the state of each person in the network by spreading the meme.
         """
-        num_spreading_events = len(self.spreading_event_queue)
-        for _ in range(num_spreading_events):
-            person, attitude = self.spreading_event_queue.pop(0)
-            retweet = person.see(attitude)
-            if retweet:
-                for follower in self.graph.successors(person):
-                    self.spreading_event_queue.append((follower, retweet))
-
-        self.max_fraction_believers = max(self.max_fraction_believers, self.get_fraction_believers())
+        profiler = self.profiler
+        profiler.begin_step()
+        with profiler.phase("kernel_update"):
+            self.kernel.update()
+        if self.engine == "vectorized":
+            self._evolve_frontier()
+            return
 
+        num_spreading_events = len(self.spreading_event_queue) + len(self._pruned_events) + len(self._pruned_nodes)
+        with profiler.phase("apply_pruned"):
+            self._apply_pruned()
+        new_attitudes = [0, 0, 0]
+        changed = []
+        #Timed like in the vectorized engine (with NULL_PROFILER, these are just self.kernel and self.rng.random).
+        kernel = profiler.timed_kernel(self.kernel)
+        random = profiler.timed("rng", self.rng.random)
+        with profiler.phase("events"):
+            for _ in range(len(self.spreading_event_queue)):
+                person, attitude = self.spreading_event_queue.popleft()
+                retweet = person.see(attitude, self.attitude_counts, kernel, random)
+                if retweet:
+                    new_attitudes[retweet] += 1
+                    if self.track_changes:
+                        changed.append(person)
+                    for follower in self.get_followers(person):
+                        if self.prune_absorbing and follower.attitude in (DISBELIEVER, retweet):
+                            self._pruned_events.append((follower, retweet))
+                        else:
+                            self.spreading_event_queue.append((follower, retweet))
+
+        if self.prune_absorbing:
+            with profiler.phase("pruning"):
+                if all(person.attitude in (DISBELIEVER, attitude) for person, attitude in self.spreading_event_queue):
+                    #People may have changed their minds after these events were queued, so that none of them matters anymore.
+                    self._pruned_events.extend(self.spreading_event_queue)
+                    self.spreading_event_queue.clear()
+        if changed:
+            self._changes.append(self._indices(changed))
+        self._finish_step(new_attitudes[BELIEVER], new_attitudes[DISBELIEVER], num_spreading_events)
+
+
+
+    def take_changes(self) -> np.ndarray:
+        """
+        Returns the people (by index in self.people) who changed their mind since the last call, in the order they did
+        (so someone can be in it twice). Only changes made while track_changes is True are included.
+        """
+        changes = np.concatenate(self._changes) if self._changes else np.zeros(0, dtype=np.int64)
+        self._changes = []
+        return changes
 
+    def num_pending_events(self) -> int:
+        """
+        Returns the number of spreading events that still have to be processed.
+        (With prune_absorbing, events that cannot change anyone's mind are not counted.)
+        """
+        return len(self.spreading_event_queue) + len(self.frontier_nodes)
 
     #---Model Results---------------------------------------------------
     def visualise(self, save_path: str = None, with_labels: bool = False) -> None:
@@ -91,7 +239,7 @@ class SocialNetwork:
         if self.pos is None:
             self._save_layout()
         nx.draw(
-            self.graph, self.pos, 
+            self._as_networkx(), self.pos, 
             with_labels=with_labels,
             node_color=self._get_colours(),
             node_size=380 / math.sqrt(len(self.people)), #Keep total graph area roughly constant
@@ -107,8 +255,30 @@ class SocialNetwork:
         """
         Returns the fraction of people who believe in the meme.
         """
-        num_believers = sum(1 for person in self.people if person.attitude == BELIEVER)
-        return num_believers / len(self.people) if self.people else 0.0
+        return self.attitude_counts[BELIEVER] / len(self.people) if self.people else 0.0
+
+    def get_fraction_disbelievers(self) -> float:
+        """
+        Returns the fraction of people who have fact-checked the meme.
+        """
+        return self.attitude_counts[DISBELIEVER] / len(self.people) if self.people else 0.0
+
+    def get_fraction_unaware(self) -> float:
+        """
+        Returns the fraction of people who haven't made up their mind about the meme (yet).
+        """
+        return self.attitude_counts[UNAWARE] / len(self.people) if self.people else 0.0
+
+    def recount_attitudes(self) -> None:
+        """
+        Recomputes attitude_counts from scratch. Only needed after changing people's attitudes by hand.
+        """
+        if self.backend == "compact":
+            self.attitude_counts = np.bincount(self.people.attitudes, minlength=3).tolist()
+        else:
+            self.attitude_counts = [0, 0, 0]
+            for person in self.people:
+                self.attitude_counts[person.attitude] += 1
     
     def get_max_fraction_believers(self) -> float:
         """
@@ -133,32 +303,218 @@ class SocialNetwork:
 
 
     #---Experiments / Interventions---------------------------------------------------
-    def make_sparse(self, frac_to_rmv: float):
-        edges = list(self.graph.edges())
-        random.shuffle(edges)
-        self.graph.remove_edges_from(edges[:int(frac_to_rmv * len(edges))])
+    def make_sparse(self, frac_to_rmv: float) -> EdgeMask:
+        """
+        Removes a random fraction of the edges. This is an intervention: remove_intervention() brings them back.
+        :return: the intervention.
+        """
+        #Removes a fraction of the edges that are still there. The mask only hides these, so removing an earlier mask
+        #brings back the edges that one hid.
+        kept = np.flatnonzero(self._edge_keep())
+        keep = np.ones(self._number_of_base_edges(), dtype=bool)
+        keep[kept[self.rng.generator.permutation(len(kept))[:int(frac_to_rmv * len(kept))]]] = False
+        mask = EdgeMask(keep)
+        self.apply_intervention(mask)
+        return mask
+
+    def make_hubs_factcheckers(self, threshold: float, measure: str = "degree") -> CheckProbabilityOverride:
+        """
+        Makes the hubs very likely to fact-check. This is an intervention: remove_intervention() undoes it.
+        :return: the intervention.
+        """
+        hubs = self.identify_hub_nodes(threshold, measure)
+        index = {person: i for i, person in enumerate(self.people)} if self.backend != "compact" else None
+        hub_ids = [person.id if index is None else index[person] for person, _ in hubs]
+        override = CheckProbabilityOverride(hub_ids, 0.9)
+        self.apply_intervention(override)
+        return override
+
+    def apply_intervention(self, intervention: Intervention) -> None:
+        """
+        Adds an intervention (see Interventions.py) on top of the ones already applied.
+        """
+        self.interventions.append(intervention)
+        self._update_interventions()
 
-    def make_hubs_factcheckers(self, threshold: float) -> None:
-        hubs = self.identify_hub_nodes(threshold)
-        hubs = {person for person, _ in hubs}
+    def remove_intervention(self, intervention: Intervention) -> None:
+        """
+        Removes an applied intervention. The network is then the same as if it had never been applied.
+        """
+        self.interventions = [applied for applied in self.interventions if applied is not intervention]
+        self._update_interventions()
 
-        for person in self.people:
-            if person in hubs:
-                person.check_probability = 0.9
+    def clear_interventions(self) -> None:
+        """
+        Removes all interventions, restoring the base network.
+        """
+        self.interventions = []
+        self._update_interventions()
 
-        print(f"Found {len(hubs)} hubs..")
+    def reset_state(self) -> None:
+        """
+        Makes everyone unaware again and forgets the cascade (pending events, statistics), so another experiment
+        can be run on the same network. Interventions stay applied.
+        """
+        if self.backend == "compact":
+            self.people.attitudes[:] = UNAWARE
+            self.people.times_seen_meme[:] = 0
+            self.people.times_seen_factcheck[:] = 0
+        else:
+            for person in self.people:
+                person.attitude = UNAWARE
+                person.times_seen_meme = 0
+                person.times_seen_factcheck = 0
+        self.spreading_event_queue.clear()
+        self.frontier_nodes = np.zeros(0, dtype=np.int64)
+        self.frontier_attitudes = np.zeros(0, dtype=np.int8)
+        self._pruned_events = []
+        self._pruned_nodes = np.zeros(0, dtype=np.int64)
+        self._pruned_attitudes = np.zeros(0, dtype=np.int8)
+        self.max_fraction_believers = 0.0
+        self.step_history = []
+        self.recount_attitudes()
 
+    def identify_hub_nodes(self, threshold: float, measure: str = "degree") -> List[Tuple[Person, float]]:
+        """
+        Identify hub nodes in the network based on centrality.
+        :param threshold: The quantile of the centrality scores above which someone is a hub (0.99 gives the top 1%).
+        :param measure: optional. The centrality measure, see CentralityIndex.py ("degree" is degree centrality).
+        return: a list of tuples of hub node, centrality score, from most to least central
+        """
+        index = self.centrality()
+        hubs = index.top_fraction(measure, threshold)
+        scores = index.scores(measure)[hubs].tolist()
+        if self.backend == "compact":
+            return list(zip(self.people.views(hubs), scores))
+        return [(self.people[i], score) for i, score in zip(hubs.tolist(), scores)]
+
+    def centrality(self) -> CentralityIndex:
+        """
+        Returns the centrality index of the network (see CentralityIndex.py), indexed like self.people.
+        The scores are computed when first needed, and again after the edges have changed (e.g. by make_sparse).
+        """
+        if self._centrality is None or self._centrality_graph is not self.graph or self._centrality_version != self._edges_version():
+            self.use_centrality(CentralityIndex(self._as_compact_graph()))
+        return self._centrality
 
-    def identify_hub_nodes(self, threshold: float) -> List[Tuple[Person, float]]:
+    def use_centrality(self, index: CentralityIndex) -> None:
         """
-        Identify hub nodes in the network based on degree centrality.
-        return: a list of tuples of hub node, centrality score
+        Makes centrality() return the given index until the edges change, e.g. an index that was computed once for
+        many networks on the same graph (see Ensemble.py). It has to be the index of a graph with the same edges.
         """
-        centrality = nx.degree_centrality(self.graph)
-        sorted_centrality = sorted(centrality.items(), key=lambda x: x[1], reverse=True)
-        threshold_value = np.percentile([score for _, score in sorted_centrality], threshold * 100)
-        hub_nodes = [(person, score) for person, score in sorted_centrality if score >= threshold_value]
-        return hub_nodes
+        self._centrality = index
+        self._centrality_graph = self.graph
+        self._centrality_version = self._edges_version()
+
+    def clear_centrality(self) -> None:
+        """
+        Forgets the computed centrality scores, so the next centrality() computes them again (e.g. to time that).
+        Scores saved in a graph cache are not removed.
+        """
+        self._centrality = None
+
+    #---Checkpoints---------------------------------------------------
+    def snapshot(self) -> Snapshot:
+        """
+        Captures the dynamic state of the simulation (see Snapshot.py), so it can be resumed or branched later.
+        Save it with snapshot.save(path).
+        """
+        if self.backend == "compact":
+            position = None
+            state = [self.people.attitudes.copy(), self.people.times_seen_meme.copy(),
+                     self.people.times_seen_factcheck.copy(), self.people.check_probability.copy()]
+        else:
+            position = {person: i for i, person in enumerate(self.people)}
+            state = [np.array([person.attitude for person in self.people], dtype=np.int8),
+                     np.array([person.times_seen_meme for person in self.people], dtype=np.int32),
+                     np.array([person.times_seen_factcheck for person in self.people], dtype=np.int32),
+                     np.array([person.check_probability for person in self.people], dtype=np.float64)]
+
+        node_type = index_dtype(len(self.people))
+        def event_arrays(events) -> Tuple[np.ndarray, np.ndarray]:
+            nodes = [person.id if position is None else position[person] for person, _ in events]
+            return np.array(nodes, dtype=node_type), np.array([attitude for _, attitude in events], dtype=np.int8)
+        queue_nodes, queue_attitudes = event_arrays(self.spreading_event_queue)
+        pruned_nodes, pruned_attitudes = event_arrays(self._pruned_events)
+
+        random_state, random_remaining = self.rng.get_state()
+        arrays = {
+            "attitudes": state[0], "times_seen_meme": state[1], "times_seen_factcheck": state[2], "check_probability": state[3],
+            "queue_nodes": queue_nodes, "queue_attitudes": queue_attitudes,
+            "frontier_nodes": self.frontier_nodes.astype(node_type), "frontier_attitudes": self.frontier_attitudes.copy(),
+            "pruned_nodes": np.concatenate([pruned_nodes, self._pruned_nodes]).astype(node_type),
+            "pruned_attitudes": np.concatenate([pruned_attitudes, self._pruned_attitudes]),
+            "step_history": np.array(self.step_history, dtype=np.int64).reshape(-1, len(StepRecord._fields)),
+            "max_fraction_believers": np.array(self.max_fraction_believers),
+            "random_remaining": random_remaining,
+        }
+        return Snapshot(arrays, random_state)
+
+    def restore(self, snapshot: Snapshot) -> None:
+        """
+        Puts the simulation back in the state of a snapshot. The network must have the same people (and graph)
+        as the one the snapshot was taken from. Continuing from here gives exactly the same cascade as it did then.
+        """
+        if snapshot.num_people() != len(self.people):
+            raise ValueError(f"The snapshot has {snapshot.num_people()} people, but the network has {len(self.people)}.")
+        arrays = snapshot.arrays
+        if self.backend == "compact":
+            self.people.attitudes[:] = arrays["attitudes"]
+            self.people.times_seen_meme[:] = arrays["times_seen_meme"]
+            self.people.times_seen_factcheck[:] = arrays["times_seen_factcheck"]
+            self.people.check_probability[:] = arrays["check_probability"]
+        else:
+            for person, attitude, times_seen_meme, times_seen_factcheck, check_probability in zip(
+                    self.people, arrays["attitudes"].tolist(), arrays["times_seen_meme"].tolist(),
+                    arrays["times_seen_factcheck"].tolist(), arrays["check_probability"].tolist()):
+                person.attitude = attitude
+                person.times_seen_meme = times_seen_meme
+                person.times_seen_factcheck = times_seen_factcheck
+                person.check_probability = check_probability
+
+        people = self.people.views(arrays["queue_nodes"]) if self.backend == "compact" else [self.people[i] for i in arrays["queue_nodes"].tolist()]
+        self.spreading_event_queue = deque(zip(people, arrays["queue_attitudes"].tolist()))
+        self.frontier_nodes = arrays["frontier_nodes"].astype(np.int64)
+        self.frontier_attitudes = arrays["frontier_attitudes"].copy()
+        #Pruned events are only counted (see _apply_pruned), so compact networks can keep all of them as arrays.
+        self._pruned_events = []
+        if self.backend == "compact":
+            self._pruned_nodes = arrays["pruned_nodes"].astype(np.int64)
+            self._pruned_attitudes = arrays["pruned_attitudes"].copy()
+        else:
+            self._pruned_events = list(zip([self.people[i] for i in arrays["pruned_nodes"].tolist()], arrays["pruned_attitudes"].tolist()))
+        self.step_history = [StepRecord(*record) for record in arrays["step_history"].tolist()]
+        self.max_fraction_believers = float(arrays["max_fraction_believers"])
+        self.rng.set_state((snapshot.random_state, arrays["random_remaining"]))
+        self.recount_attitudes()
+
+    def fork(self, snapshot: Snapshot = None, seed: Union[int, np.random.SeedSequence] = None) -> 'SocialNetwork':
+        """
+        Makes a new network with the same graph and settings, in the state of the snapshot (default: the current state).
+        Compact networks share the graph, so forking many runs from one snapshot is cheap.
+        The fork's interventions start out empty (but the check probabilities of the snapshot are kept),
+        so you can apply a different intervention in every fork.
+        :param seed: optional. By default, every fork continues the random numbers of the snapshot (common random numbers),
+            so forks differ only by what you change in them, which is what you want when comparing interventions.
+            Give every fork its own seed to get independent runs from the same snapshot instead.
+        """
+        snapshot = snapshot or self.snapshot()
+        if self.backend == "compact":
+            network = SocialNetwork.from_compact_graph(self.graph)
+        else:
+            network = SocialNetwork("networkx")
+            #The edges are added in the graph's own order (not sorted like a CompactGraph's), so everyone's followers
+            #are visited in the same order as in this network, and forks without changes run identically.
+            position = {person: i for i, person in enumerate(self.people)}
+            edges = np.array([(position[user], position[follower]) for user, follower in self.graph.edges()], dtype=np.int64).reshape(-1, 2)
+            network._init_edges(len(self.people), edges[:, 0], edges[:, 1])
+        network.engine = self.engine
+        network.prune_absorbing = self.prune_absorbing
+        network.kernel = self.kernel
+        network.restore(snapshot)
+        if seed is not None:
+            network.rng = RandomPool(seed)
+        return network
 
     #---Private Methods---------------------------------------------------
     def _get_colours(self) -> List[str]:
@@ -166,47 +522,278 @@ class SocialNetwork:
         Returns a list of colours for each person in the network based on their attitude.
         """
         return [person.get_colour() for person in self.people]
+
+    def _evolve_frontier(self) -> None:
+        """
+        Vectorised version of evolve_state: processes all pending events of this timestep as arrays.
+        """
+        if self.spreading_event_queue:
+            #Events queued by seed_meme (or by the python engine) are moved to the end of the frontier.
+            queued_nodes = np.fromiter((person.id for person, _ in self.spreading_event_queue), dtype=np.int64)
+            queued_attitudes = np.fromiter((attitude for _, attitude in self.spreading_event_queue), dtype=np.int8)
+            self.frontier_nodes = np.concatenate([self.frontier_nodes, queued_nodes])
+            self.frontier_attitudes = np.concatenate([self.frontier_attitudes, queued_attitudes])
+            self.spreading_event_queue.clear()
+
+        num_spreading_events = len(self.frontier_nodes) + len(self._pruned_nodes)
+        profiler = self.profiler
+        with profiler.phase("apply_pruned"):
+            self._apply_pruned()
+        with profiler.phase("frontier"):
+            self.frontier_nodes, self.frontier_attitudes, transitions = evolve_frontier(
+                self.graph.offsets, self.graph.targets,
+                self.people.attitudes, self.people.times_seen_meme, self.people.times_seen_factcheck,
+                self.people.check_probability,
+                self.frontier_nodes, self.frontier_attitudes,
+                beta=profiler.timed("kernel", self.kernel), random=profiler.timed("rng", self.rng.random_array)
+            )
+        if self.track_changes:
+            self._changes.append(transitions.nodes)
+        if self.prune_absorbing:
+            with profiler.phase("pruning"):
+                targets = self.people.attitudes[self.frontier_nodes]
+                dead = (targets == DISBELIEVER) | (targets == self.frontier_attitudes)
+                self._pruned_nodes = self.frontier_nodes[dead]
+                self._pruned_attitudes = self.frontier_attitudes[dead]
+                self.frontier_nodes = self.frontier_nodes[~dead]
+                self.frontier_attitudes = self.frontier_attitudes[~dead]
+        with profiler.phase("attitude_counts"):
+            changes = np.bincount(transitions.new_attitudes, minlength=3) - np.bincount(transitions.old_attitudes, minlength=3)
+            for attitude in [UNAWARE, BELIEVER, DISBELIEVER]:
+                self.attitude_counts[attitude] += int(changes[attitude])
+            new_attitudes = np.bincount(transitions.new_attitudes, minlength=3)
+        self._finish_step(int(new_attitudes[BELIEVER]), int(new_attitudes[DISBELIEVER]), num_spreading_events)
+
+    def _set_attitude(self, person: Person, attitude: int) -> None:
+        self.attitude_counts[person.attitude] -= 1
+        person.attitude = attitude
+        self.attitude_counts[attitude] += 1
+        if self.track_changes:
+            self._changes.append(self._indices([person]))
+
+    def _indices(self, people: List[Person]) -> np.ndarray:
+        """
+        Returns the indices of the given people in self.people.
+        """
+        if self.backend == "compact":
+            return np.fromiter((person.id for person in people), dtype=np.int64, count=len(people))
+        if self._positions is None:
+            self._positions = {person: i for i, person in enumerate(self.people)}
+        return np.fromiter((self._positions[person] for person in people), dtype=np.int64, count=len(people))
+
+    def _apply_pruned(self) -> None:
+        """
+        Processes the pruned events in bulk. They can't change anyone's mind, so all that's left to do is count them.
+        Pruned events are applied at the start of the step in which they would have been processed,
+        so the times_seen counters are the same as without pruning at the end of every step.
+        """
+        for person, attitude in self._pruned_events:
+            if attitude == BELIEVER:
+                person.times_seen_meme += 1
+            else:
+                person.times_seen_factcheck += 1
+        self._pruned_events = []
+        if len(self._pruned_nodes):
+            is_meme = self._pruned_attitudes == BELIEVER
+            np.add.at(self.people.times_seen_meme, self._pruned_nodes[is_meme], 1)
+            np.add.at(self.people.times_seen_factcheck, self._pruned_nodes[~is_meme], 1)
+            self._pruned_nodes = np.zeros(0, dtype=np.int64)
+            self._pruned_attitudes = np.zeros(0, dtype=np.int8)
+
+    def _finish_step(self, new_believers: int, new_disbelievers: int, events_processed: int) -> None:
+        """
+        Bookkeeping at the end of evolve_state.
+        """
+        if self.num_pending_events() == 0:
+            #Nothing left can change anyone's mind: the cascade is over.
+            #Count the remaining pruned events right away, so the counters are final when the simulation stops.
+            self._apply_pruned()
+        self.step_history.append(StepRecord(new_believers, new_disbelievers, events_processed, self.num_pending_events()))
+        self.profiler.end_step(self.step_history[-1])
+        self.max_fraction_believers = max(self.max_fraction_believers, self.get_fraction_believers())
+
+    def _as_networkx(self) -> nx.DiGraph:
+        """
+        Returns the graph as a networkx DiGraph of people (converting it if the network is compact).
+        """
+        if self.backend == "compact":
+            return self.graph.to_networkx(self.people)
+        return self.graph
+
+    def _check_no_interventions(self) -> None:
+        if self.interventions:
+            raise ValueError("Can't add people or followers while interventions are applied. Call clear_interventions() first.")
+
+    def _number_of_base_edges(self) -> int:
+        if self.backend == "compact":
+            return (self._base_graph if self._base_graph is not None else self.graph).number_of_edges()
+        return len(self._base_edges) if self._base_edges is not None else self.graph.number_of_edges()
+
+    def _edge_keep(self) -> np.ndarray:
+        """
+        Returns which edges of the base network the applied edge masks keep.
+        """
+        keep = np.ones(self._number_of_base_edges(), dtype=bool)
+        for intervention in self.interventions:
+            if isinstance(intervention, EdgeMask):
+                keep &= intervention.keep
+        return keep
+
+    def _update_interventions(self) -> None:
+        """
+        Rebuilds the effective network from the base network and the applied interventions.
+        Every step is a vectorised pass over the edges or the people (except on networkx networks).
+        """
+        masks = [intervention for intervention in self.interventions if isinstance(intervention, EdgeMask)]
+        if self.backend == "compact":
+            if masks and self._base_graph is None:
+                self._base_graph = self.graph
+            if self._base_graph is not None:
+                self.graph = self._base_graph.masked(self._edge_keep()) if masks else self._base_graph
+            if not masks:
+                self._base_graph = None
+        else:
+            if masks and self._base_edges is None:
+                self._base_edges = list(self.graph.edges())
+            if self._base_edges is not None:
+                #Re-adding the edges in their original order also restores the order of everyone's followers.
+                self.graph.clear_edges()
+                self.graph.add_edges_from(edge for edge, keep in zip(self._base_edges, self._edge_keep().tolist()) if keep)
+                self._graph_version += 1
+            if not masks:
+                self._base_edges = None
+
+        overrides = [intervention for intervention in self.interventions if isinstance(intervention, CheckProbabilityOverride)]
+        if self.backend == "compact":
+            if overrides and self._base_check_probability is None:
+                self._base_check_probability = self.people.check_probability.copy()
+            if self._base_check_probability is not None:
+                self.people.check_probability[:] = self._base_check_probability
+                for override in overrides:
+                    self.people.check_probability[override.people] = override.probability
+        else:
+            if overrides and self._base_check_probability is None:
+                self._base_check_probability = [person.check_probability for person in self.people]
+            if self._base_check_probability is not None:
+                for person, probability in zip(self.people, self._base_check_probability):
+                    person.check_probability = probability
+                for override in overrides:
+                    for i in override.people.tolist():
+                        self.people[i].check_probability = override.probability
+        if not overrides:
+            self._base_check_probability = None
+
+    def _edges_version(self) -> int:
+        """
+        Returns a number that changes whenever the edges of the graph change.
+        """
+        return self.graph.version if self.backend == "compact" else self._graph_version
+
+    def _as_compact_graph(self) -> CompactGraph:
+        """
+        Returns the graph as a CompactGraph whose node i is self.people[i] (converting it if the network uses networkx).
+        """
+        if self.backend == "compact":
+            return self.graph
+        position = {person: i for i, person in enumerate(self.people)}
+        edges = np.array([(position[user], position[follower]) for user, follower in self.graph.edges()], dtype=np.int64).reshape(-1, 2)
+        return CompactGraph.from_edges(len(self.people), edges[:, 0], edges[:, 1])
+
+    def _init_compact(self, num_people: int, sources: np.ndarray, targets: np.ndarray) -> None:
+        """
+        Fills an empty compact network with num_people people and the given user -> follower edges in one go.
+        """
+        self.people = Population(num_people)
+        self.graph = CompactGraph.from_edges(num_people, sources, targets)
+        self.recount_attitudes()
+        self.pos = None
+
+    def _init_edges(self, num_people: int, users: np.ndarray, followers: np.ndarray) -> None:
+        """
+        Fills an empty network (of either backend) with num_people people and an edge from users[i] to followers[i] for each i.
+        """
+        if self.backend == "compact":
+            self._init_compact(num_people, users, followers)
+            return
+        self.people = [Person(i) for i in range(num_people)]
+        self._positions = None
+        self.graph.add_nodes_from(self.people)
+        self.graph.add_edges_from((self.people[user], self.people[follower]) for user, follower in zip(users.tolist(), followers.tolist()))
+        self._graph_version += 1
+        self.recount_attitudes()
     
     def _save_layout(self) -> None:
         """
         Gives the graph a visual layout and remembers it.
         Used so the layout doesn't change every time we visualise the graph.
         """
-        self.pos = nx.spring_layout(self.graph)
+        self.pos = nx.spring_layout(self._as_networkx())
 
 
     #---Static Methods---------------------------------------------------
     @staticmethod
-    def create_random(num_people: int, follow_prob: float) -> 'SocialNetwork':
+    def from_compact_graph(graph: CompactGraph, seed: Union[int, np.random.SeedSequence] = None) -> 'SocialNetwork':
+        """
+        Creates a compact social network of fresh (unaware) people on top of an existing graph.
+        The graph arrays are not copied, so many networks can share one (possibly shared-memory) graph.
+        :param seed: optional. Seed for the randomness of the network.
+        """
+        network = SocialNetwork("compact", seed)
+        network.graph = graph
+        network.people = Population(graph.number_of_nodes())
+        network.recount_attitudes()
+        return network
+
+    @staticmethod
+    def create_random(num_people: int, follow_prob: float, backend: str = "networkx", seed: int = None) -> 'SocialNetwork':
         """
         Creates a random (Erdos-Renyi) social network.
         :param num_people: The number of people in the network.
         :param follow_prob: The probability of following.
+        :param backend: optional. "networkx" or "compact", see __init__.
+        :param seed: optional. Seed for generating the graph and for the randomness of the network.
         """
-        network = SocialNetwork()
-        people = [Person(i) for i in range(num_people)]
-        network.people = people
-        network.graph = nx.erdos_renyi_graph(num_people, follow_prob, directed=True)
-        mapping = {i: person for i, person in enumerate(people)}
-        network.graph = nx.relabel_nodes(network.graph, mapping)
+        network = SocialNetwork(backend, seed)
+        network._init_edges(num_people, *gnp_edges(num_people, follow_prob, network.rng.spawn()))
+        return network
 
+    @staticmethod
+    def create_random_with_edges(num_people: int, num_follows: int, backend: str = "networkx", seed: int = None) -> 'SocialNetwork':
+        """
+        Creates a random (Erdos-Renyi) social network with exactly num_follows edges.
+        :param num_people: The number of people in the network.
+        :param num_follows: The number of edges.
+        :param backend: optional. "networkx" or "compact", see __init__.
+        :param seed: optional. Seed for generating the graph and for the randomness of the network.
+        """
+        network = SocialNetwork(backend, seed)
+        network._init_edges(num_people, *gnm_edges(num_people, num_follows, network.rng.spawn()))
         return network
-    
+
     @staticmethod
-    def from_bianconi(bianconi_model: BianconiBarabasiModel) -> 'SocialNetwork':
+    def from_bianconi(bianconi_model: BianconiBarabasiModel, backend: str = "networkx", seed: Union[int, np.random.SeedSequence] = None) -> 'SocialNetwork':
         """
         Creates a social network from a Bianconi-Barabasi model.
         :param bianconi_model: The Bianconi-Barabasi model instance.
+        :param backend: optional. "networkx" or "compact", see __init__.
+        :param seed: optional. Seed for the directions of the edges and for the randomness of the network.
         """
-        network = SocialNetwork()
+        network = SocialNetwork(backend, seed)
+        edges = bianconi_model.get_edges()
+        if backend == "compact":
+            #Every undirected edge gets a random direction.
+            flip = network.rng.random_array(len(edges)) < 0.5
+            sources = np.where(flip, edges[:, 0], edges[:, 1])
+            targets = np.where(flip, edges[:, 1], edges[:, 0])
+            network._init_compact(bianconi_model.get_num_nodes(), sources, targets)
+            return network
         
-        for node in bianconi_model.get_graph().nodes():
+        for node in range(bianconi_model.get_num_nodes()):
             person = Person(node)
             network.add_person(person)
 
-        for edge in bianconi_model.get_graph().edges():
-            user, follower = edge
-            if random.random() < 0.5:
+        for user, follower in edges.tolist():
+            if network.rng.random() < 0.5:
                 network.add_follower(network.people[follower], network.people[user])
             else:
                 network.add_follower(network.people[user], network.people[follower])
@@ -214,31 +801,58 @@ class SocialNetwork:
         return network
     
     @staticmethod
-    def import_from_igraph(ig_net_path: str, n_samples=0) -> 'SocialNetwork':
+    def import_from_igraph(ig_net_path: str, n_samples=0, backend: str = "networkx", use_cache: bool = True,
+                           seed: Union[int, np.random.SeedSequence] = None) -> 'SocialNetwork':
         """
         creates social network from igraph
         :param ig_net_path: path to igraph file stored as pickle
         :param n_samples: size of the sub graph to take from igraph; use entire graph if 0
+        :param backend: optional. "networkx" or "compact", see __init__.
+        :param use_cache: optional. If True, the graph is converted once into a memory-mapped cache next to the
+            pickle (see GraphCache.py), which makes later imports near-instant.
+        :param seed: optional. Seed for the sample and for the randomness of the network.
         """
-        with open(ig_net_path, "rb") as f:
-            i_graph = pickle.load(f)  
-
-        if n_samples != 0:
-            node_ids = random.sample(range(i_graph.vcount()), n_samples)
-            i_graph = i_graph.subgraph(node_ids)
+        if use_cache:
+            graph = load_igraph_cached(ig_net_path)
+        else:
+            with open(ig_net_path, "rb") as f:
+                i_graph = pickle.load(f)
+            #igraph edges go from follower to user, ours go from user to follower.
+            edges = np.array(i_graph.get_edgelist(), dtype=np.int64).reshape(-1, 2)
+            graph = CompactGraph.from_edges(i_graph.vcount(), edges[:, 1], edges[:, 0])
 
-        network = SocialNetwork()
+        return SocialNetwork._from_loaded_graph(graph, n_samples, backend, seed)
 
-        for node_id in range(i_graph.vcount()):
-            person = Person(node_id)
-            network.add_person(person)
+    @staticmethod
+    def import_from_edge_list(edge_list_path: str, n_samples=0, backend: str = "compact", follower_first: bool = True,
+                              seed: Union[int, np.random.SeedSequence] = None) -> 'SocialNetwork':
+        """
+        creates social network from a (possibly gzipped) edge list, such as the SNAP twitter data.
+        The file is streamed and converted once into a memory-mapped cache (see EdgeListImport.py),
+        so this also works for networks that are far too big for import_from_igraph.
+        :param edge_list_path: path to the edge list. Each line holds two ids.
+        :param n_samples: size of the sub graph to take; use entire graph if 0
+        :param backend: optional. "networkx" or "compact", see __init__. Use "compact" for big networks!
+        :param follower_first: optional. If True, a line "a b" means a follows b, otherwise b follows a.
+        :param seed: optional. Seed for the sample and for the randomness of the network.
+        """
+        graph = import_edge_list(edge_list_path, follower_first=follower_first)
+        return SocialNetwork._from_loaded_graph(graph, n_samples, backend, seed)
 
-        for edge in i_graph.es:
-            user = edge.target
-            follower = edge.source
-            
-            network.add_follower(
-                    network.people[follower],
-                    network.people[user]
-            )
-        return network
\ No newline at end of file
+    @staticmethod
+    def _from_loaded_graph(graph: CompactGraph, n_samples: int, backend: str, seed: Union[int, np.random.SeedSequence]) -> 'SocialNetwork':
+        """
+        Creates a social network from an imported graph, optionally keeping only a random sample of n_samples people.
+        """
+        network = SocialNetwork(backend, seed)
+        if n_samples != 0 and n_samples != graph.number_of_nodes():
+            node_ids = network.rng.sample(range(graph.number_of_nodes()), n_samples)
+            graph = graph.subgraph(node_ids)
+
+        if backend == "compact":
+            network.graph = graph
+            network.people = Population(graph.number_of_nodes())
+            network.recount_attitudes()
+            return network
+        network._init_edges(graph.number_of_nodes(), *graph.edges())
+        return network
@@ -0,0 +1,163 @@
+from typing import Dict, List, Union
+from contextlib import contextmanager
+import hashlib
+import itertools
+import json
+import os
+import numpy as np
+
+from Experiments import build_network
+from Ensemble import run_ensemble
+import config
+
+#Runs an experiment for many parameter settings ("points") in one go.
+#Points that share a graph (same model_type, num_people, num_edges and input_data_path) share one loaded network,
+#and every finished point is cached on disk, so an interrupted sweep picks up where it left off.
+
+#The config settings that determine the graph. Points that agree on these share a network.
+GRAPH_SETTINGS = ["model_type", "num_people", "num_edges", "input_data_path"]
+#The config settings that can be changed per point without rebuilding the graph.
+#They are all part of the cache key: the engine, pruning and batching of replicas change the random numbers a run draws,
+#so they change the results for the same seed, too.
+POINT_SETTINGS = ["experiment_type", "centrality_measure", "num_with_initial_meme", "timesteps", "ALPHA", "GAMMA", "OMEGA", "FACT_CHECK_PROBABILITY",
+                  "simulation_engine", "prune_absorbing", "replicas_per_pass"]
+
+
+def expand_grid(grid: Dict[str, list]) -> List[dict]:
+    """
+    Turns a grid such as {"ALPHA": [0.1, 0.3], "experiment_type": ["baseline", "sparse"]} into the list of all combinations.
+    """
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def run_sweep(points: Union[Dict[str, list], List[dict]], num_replicas: int = 1, num_workers: int = 0,
+              seed: int = 0, cache_dir: str = "sweep_cache") -> List[dict]:
+    """
+    Runs the configured simulation once per point and returns one result per point (in the same order).
+    :param points: A grid (see expand_grid) or a list of dicts, each mapping config setting names to values.
+        Settings that a point doesn't mention keep their value from config.py.
+    :param num_replicas: optional. The number of runs per point (see Ensemble.run_ensemble).
+    :param num_workers: optional. Worker processes per point (0 means one per CPU core).
+    :param seed: optional. Seed for the runs. Together with the parameters and the graph, it determines the cache entry.
+    :param cache_dir: optional. Directory where the result of each finished point is stored.
+    :return: a list of dicts with the settings of each point, its per-step mean fraction of believers
+        and the maximum fraction of believers of each run.
+    """
+    if isinstance(points, dict):
+        points = expand_grid(points)
+    for point in points:
+        unknown = set(point) - set(GRAPH_SETTINGS) - set(POINT_SETTINGS)
+        if unknown:
+            raise ValueError(f"Cannot sweep over {sorted(unknown)}. Choose from {GRAPH_SETTINGS + POINT_SETTINGS}.")
+    os.makedirs(cache_dir, exist_ok=True)
+
+    results = [None] * len(points)
+    graph_keys = [tuple(point.get(name, getattr(config, name)) for name in GRAPH_SETTINGS) for point in points]
+    for graph_key in dict.fromkeys(graph_keys):
+        indices = [i for i, key in enumerate(graph_keys) if key == graph_key]
+        network = None
+        fingerprint = None
+        for i in indices:
+            with config_overrides(points[i]):
+                settings = {name: getattr(config, name) for name in GRAPH_SETTINGS + POINT_SETTINGS}
+                if fingerprint is None:
+                    fingerprint = _known_fingerprint(cache_dir, settings, seed)
+                if fingerprint is not None:
+                    cache_path = _cache_path(cache_dir, settings, fingerprint, seed, num_replicas)
+                    if os.path.exists(cache_path):
+                        results[i] = _load(cache_path)
+                        continue
+                if network is None:
+                    #Only build the graph once there is an unfinished point that needs it.
+                    #The seed makes generated (or sampled) graphs the same when a sweep is resumed.
+                    network = build_network(backend="compact", seed=seed)
+                    fingerprint = network.graph.fingerprint()
+                    _remember_fingerprint(cache_dir, settings, seed, fingerprint)
+                cache_path = _cache_path(cache_dir, settings, fingerprint, seed, num_replicas)
+                if os.path.exists(cache_path):
+                    results[i] = _load(cache_path)
+                    continue
+
+                print(f"Running sweep point {i + 1}/{len(points)}: {points[i]}")
+                ensemble = run_ensemble(network, num_replicas, num_workers, seed, replicas_per_pass=config.replicas_per_pass)
+                results[i] = {
+                    "settings": settings,
+                    "graph": fingerprint,
+                    "seed": seed,
+                    "mean_fraction_believers": ensemble.mean().tolist(),
+                    "max_fractions_believers": ensemble.max_fractions.tolist(),
+                }
+                _save(cache_path, results[i])
+    return results
+
+
+@contextmanager
+def config_overrides(overrides: dict):
+    """
+    Temporarily sets config settings to the given values.
+    """
+    old_values = {name: getattr(config, name) for name in overrides}
+    for name, value in overrides.items():
+        setattr(config, name, value)
+    try:
+        yield
+    finally:
+        for name, value in old_values.items():
+            setattr(config, name, value)
+
+
+#---Private Methods---------------------------------------------------
+def _cache_path(cache_dir: str, settings: dict, fingerprint: str, seed: int, num_replicas: int) -> str:
+    description = json.dumps({"settings": settings, "graph": fingerprint, "seed": seed, "replicas": num_replicas}, sort_keys=True)
+    return os.path.join(cache_dir, hashlib.sha256(description.encode()).hexdigest() + ".json")
+
+
+def _known_fingerprint(cache_dir: str, settings: dict, seed: int) -> Union[str, None]:
+    """
+    Returns the fingerprint of the graph these settings produced in an earlier sweep, if any.
+    This lets us skip finished points without building the graph.
+    """
+    index_path = os.path.join(cache_dir, "graphs.json")
+    if not os.path.exists(index_path):
+        return None
+    return _load(index_path).get(_graph_source(settings, seed))
+
+
+def _remember_fingerprint(cache_dir: str, settings: dict, seed: int, fingerprint: str) -> None:
+    index_path = os.path.join(cache_dir, "graphs.json")
+    index = _load(index_path) if os.path.exists(index_path) else {}
+    index[_graph_source(settings, seed)] = fingerprint
+    _save(index_path, index)
+
+
+def _graph_source(settings: dict, seed: int) -> str:
+    """
+    Describes everything the graph depends on: its settings, the seed and (for real graphs) the version of the input file.
+    """
+    source = {name: settings[name] for name in GRAPH_SETTINGS}
+    source["seed"] = seed
+    if settings["model_type"] == "real":
+        stat = os.stat(settings["input_data_path"])
+        source["input_file"] = [os.path.abspath(settings["input_data_path"]), stat.st_size, stat.st_mtime_ns]
+    return json.dumps(source, sort_keys=True)
+
+
+def _load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save(path: str, data: dict) -> None:
+    """
+    Writes the file atomically, so an interrupted sweep never leaves a half-written file behind.
+    """
+    with open(path + ".tmp", "w") as f:
+        json.dump(data, f)
+    os.replace(path + ".tmp", path)
+
+
+if __name__ == "__main__":
+    for result in run_sweep(config.sweep_grid, config.num_replicas, config.num_workers, config.random_seed or 0, config.sweep_cache_dir):
+        changed = {name: result["settings"][name] for name in config.sweep_grid}
+        print(f"{changed}: at most {np.mean(result['max_fractions_believers']):.2%} believers")
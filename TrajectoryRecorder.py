@@ -0,0 +1,218 @@
+from typing import List, Tuple
+import os
+import queue
+import threading
+import numpy as np
+
+from SocialNetwork import SocialNetwork
+from CompactGraph import index_dtype
+
+#Records everyone's attitude at every time step, without keeping it all in memory.
+#Only the changes are stored: after each step, the recorder asks the network who changed their mind (which the
+#simulation keeps track of, see SocialNetwork.take_changes), and appends (timestep, person, new attitude) to a buffer.
+#So a step costs time for the people who changed, not for everyone. Full buffers are written to disk by a background thread, so the simulation
+#doesn't wait for the disk. Everyone changes their mind at most a couple of times, so the whole trajectory of a run takes
+#only a few bytes per person, and rebuilding the attitudes at any time step (Trajectory.reconstruct) is quick.
+#
+#A trajectory is a directory with:
+# - initial.npy: everyone's attitude when recording started (after seeding),
+# - chunk_<first>_<last>.npz: the changes of time steps first..last, as the arrays "timesteps", "nodes" and "attitudes".
+#Files are written under a temporary name and then renamed, so a trajectory can be read while it is still being recorded.
+
+#The number of changes that are collected before they are written to disk.
+CHUNK_SIZE = 1 << 20
+
+
+class TrajectoryRecorder:
+    def __init__(self, sn: SocialNetwork, path: str, chunk_size: int = CHUNK_SIZE) -> None:
+        """
+        Starts recording the attitudes of the network. Call record(timestep) after every evolve_state, and close() at the end.
+        :param sn: The network. Its people shouldn't change while recording (their attitudes will, of course,
+            but only through seed_meme and evolve_state).
+        :param path: The directory to store the trajectory in. A trajectory that is already there is replaced.
+        :param chunk_size: optional. The number of changes per file.
+        """
+        self.sn = sn
+        self.path = path
+        self.chunk_size = chunk_size
+        os.makedirs(path, exist_ok=True)
+        for name in os.listdir(path):
+            if name.startswith("chunk_") or name == "initial.npy":
+                os.remove(os.path.join(path, name))
+        self.attitudes = _current_attitudes(sn).copy()
+        sn.track_changes = True
+        sn.take_changes()
+        self.node_dtype = index_dtype(len(self.attitudes))
+        self._buffer: List[Tuple[int, np.ndarray, np.ndarray]] = []
+        self._buffered = 0
+        self._error = None
+        #At most a few chunks wait for the disk at once, so memory stays bounded even if the disk is slow.
+        self._queue: queue.Queue = queue.Queue(maxsize=4)
+        self._writer = threading.Thread(target=self._write_loop, name="TrajectoryRecorder", daemon=True)
+        self._writer.start()
+        self._queue.put(("initial.npy", {"attitudes": self.attitudes.copy()}))
+
+    def record(self, timestep: int) -> None:
+        """
+        Records the attitudes after a time step (only the people who changed their mind since the last call are stored).
+        """
+        self._check_writer()
+        #(Someone who changed their mind twice in one step is stored once, with their final attitude.)
+        changed = np.unique(self.sn.take_changes())
+        current = _attitudes_of(self.sn, changed)
+        changed = changed[current != self.attitudes[changed]]
+        if len(changed) == 0:
+            return
+        self.attitudes[changed] = _attitudes_of(self.sn, changed)
+        self._buffer.append((timestep, changed.astype(self.node_dtype), self.attitudes[changed]))
+        self._buffered += len(changed)
+        if self._buffered >= self.chunk_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Hands the buffered changes to the background writer.
+        """
+        if not self._buffer:
+            return
+        timesteps = np.concatenate([np.full(len(nodes), timestep, dtype=np.int32) for timestep, nodes, _ in self._buffer])
+        nodes = np.concatenate([nodes for _, nodes, _ in self._buffer])
+        attitudes = np.concatenate([attitudes for _, _, attitudes in self._buffer])
+        name = f"chunk_{int(timesteps[0])}_{int(timesteps[-1])}.npz"
+        self._queue.put((name, {"timesteps": timesteps, "nodes": nodes, "attitudes": attitudes}))
+        self._buffer = []
+        self._buffered = 0
+
+    def close(self) -> None:
+        """
+        Writes everything that is left and waits until it is on disk.
+        """
+        self.sn.track_changes = False
+        if not self._writer.is_alive():
+            self._check_writer()
+            return
+        self.flush()
+        self._queue.put(None)
+        self._writer.join()
+        self._check_writer()
+
+    def __enter__(self) -> 'TrajectoryRecorder':
+        return self
+
+    def __exit__(self, *exception) -> None:
+        self.close()
+
+    def _write_loop(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            if self._error is not None:
+                continue
+            name, arrays = job
+            try:
+                temporary = os.path.join(self.path, "writing_" + name)
+                with open(temporary, "wb") as f:
+                    if name.endswith(".npy"):
+                        np.save(f, arrays["attitudes"])
+                    else:
+                        np.savez(f, **arrays)
+                os.replace(temporary, os.path.join(self.path, name))
+            except Exception as error:
+                #Keep taking jobs, so the simulation never waits for a writer that has stopped.
+                self._error = error
+
+    def _check_writer(self) -> None:
+        if self._error is not None:
+            raise RuntimeError(f"Writing the trajectory to {self.path} failed") from self._error
+
+
+#Reads a trajectory written by a TrajectoryRecorder.
+class Trajectory:
+    def __init__(self, path: str) -> None:
+        """
+        :param path: The directory of the trajectory.
+        """
+        self.path = path
+        self.initial = np.load(os.path.join(path, "initial.npy"))
+        chunks = []
+        for name in os.listdir(path):
+            if name.startswith("chunk_") and name.endswith(".npz"):
+                first, last = name[len("chunk_"):-len(".npz")].split("_")
+                chunks.append((int(first), int(last), name))
+        #(first timestep, last timestep, file name) of every chunk, in order.
+        self.chunks = sorted(chunks)
+
+    def num_people(self) -> int:
+        return len(self.initial)
+
+    def last_timestep(self) -> int:
+        """
+        Returns the last time step in which someone changed their mind (-1 if nobody did).
+        """
+        return self.chunks[-1][1] if self.chunks else -1
+
+    def changes(self, first: int = 0, last: int = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Returns the changes of time steps first..last (inclusive; by default until the end), in order,
+        as the arrays (timesteps, nodes, new attitudes). Only the files that contain these time steps are read.
+        """
+        parts = []
+        for chunk_first, chunk_last, name in self.chunks:
+            if chunk_last < first or (last is not None and chunk_first > last):
+                continue
+            with np.load(os.path.join(self.path, name)) as data:
+                timesteps, nodes, attitudes = data["timesteps"], data["nodes"], data["attitudes"]
+            keep = (timesteps >= first) & (timesteps <= last if last is not None else True)
+            parts.append((timesteps[keep], nodes[keep], attitudes[keep]))
+        if not parts:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int8)
+        return tuple(np.concatenate(arrays) for arrays in zip(*parts))
+
+    def reconstruct(self, timestep: int) -> np.ndarray:
+        """
+        Returns everyone's attitude (by index in network.people) after the given time step.
+        A negative timestep gives the attitudes when recording started.
+        """
+        attitudes = self.initial.copy()
+        if timestep >= 0:
+            _, nodes, new_attitudes = self.changes(0, timestep)
+            #The changes are in order, so later changes of a person overwrite earlier ones.
+            attitudes[nodes] = new_attitudes
+        return attitudes
+
+    def fractions(self, attitude: int) -> np.ndarray:
+        """
+        Returns the fraction of people with the given attitude after every time step 0..last_timestep(),
+        without rebuilding the attitudes of every step.
+        """
+        timesteps, nodes, new_attitudes = self.changes()
+        counts = np.zeros(self.last_timestep() + 1, dtype=np.int64)
+        #Each change replaces the previous attitude of that person, so keep track of it.
+        attitudes = self.initial.copy()
+        old_attitudes = np.empty_like(new_attitudes)
+        for start, end in _runs(timesteps):
+            old_attitudes[start:end] = attitudes[nodes[start:end]]
+            attitudes[nodes[start:end]] = new_attitudes[start:end]
+        np.add.at(counts, timesteps, (new_attitudes == attitude).astype(np.int64) - (old_attitudes == attitude))
+        return (np.count_nonzero(self.initial == attitude) + np.cumsum(counts)) / len(self.initial)
+
+
+def _current_attitudes(sn: SocialNetwork) -> np.ndarray:
+    if sn.backend == "compact":
+        return sn.people.attitudes
+    return np.fromiter((person.attitude for person in sn.people), dtype=np.int8, count=len(sn.people))
+
+
+def _attitudes_of(sn: SocialNetwork, people: np.ndarray) -> np.ndarray:
+    if sn.backend == "compact":
+        return sn.people.attitudes[people]
+    return np.fromiter((sn.people[i].attitude for i in people.tolist()), dtype=np.int8, count=len(people))
+
+
+def _runs(timesteps: np.ndarray) -> List[Tuple[int, int]]:
+    """
+    Returns the (start, end) of every run of equal time steps.
+    """
+    boundaries = np.concatenate([[0], np.flatnonzero(np.diff(timesteps)) + 1, [len(timesteps)]])
+    return list(zip(boundaries[:-1].tolist(), boundaries[1:].tolist()))
@@ -4,18 +4,43 @@ num_edges : int = 1342310 #small full: 1342310. Note: real network will note res
 model_type : str = "real" # "real" for twitter data, "random" for ER network, 'bianconi' for Bianconi-Barabasi model
 num_with_initial_meme : int = 1000
 timesteps : int = 100 # maximum number of timesteps before the simulation is forcefully stopped.
+graph_backend : str = "networkx" # "networkx" stores a DiGraph of Person objects, "compact" stores NumPy arrays (much less memory for big networks).
+simulation_engine : str = "python" # "python" processes events one by one, "vectorized" processes each timestep as arrays (needs graph_backend = "compact").
+prune_absorbing : bool = False # If True, spreading events that cannot change anyone's mind are counted in bulk instead of queued, and the simulation stops as soon as nothing can change anymore.
+
+num_replicas : int = 1 # number of independent runs. If more than 1, they run in parallel (on a compact graph) and the plot shows their mean and spread.
+num_workers : int = 0 # number of worker processes for num_replicas > 1. 0 means one per CPU core.
+random_seed : int | None = None # seed for the random numbers of the runs. None gives different results every time.
+replicas_per_pass : int = 1 # number of replicas simulated together, in lockstep (see MultiCascade.py). Try e.g. 16 for small graphs.
+num_partitions : int = 1 # number of worker processes that simulate a single run together, each on a part of the graph (see Partitioned.py). For very big networks.
+
+#For parameter sweeps (run Sweep.py): every combination of these values is simulated. Finished combinations are cached in sweep_cache_dir.
+sweep_grid : dict = {"ALPHA": [0.1, 0.3, 0.5], "experiment_type": ["baseline", "sparse", "central_checkers"]}
+sweep_cache_dir : str = "sweep_cache"
+
+#For benchmarks (run Benchmark.py): the time and memory of the main components on synthetic graphs, compared with a stored baseline.
+benchmark_scales : list = [1000, 10000, 100000] #The sizes (numbers of people) of the synthetic graphs. Add 1000000 for the largest ones (takes a while).
+benchmark_repeats : int = 3 #Every benchmark is timed this many times; the fastest time counts.
+benchmark_tolerance : float = 0.5 #A component more than 50% slower (or using more than 50% more memory) than in the baseline counts as a regression.
+benchmark_baseline_path : str = "benchmark_baseline.json" #The first run stores its results here; later runs are compared with them.
+benchmark_real_data : str | None = None #Optionally, a network file (like input_data_path) to benchmark importing and simulating it as well.
 
 #For replicating the experiments:
 experiment_type : str = "baseline" #Can be: "baseline", "sparse", "central_checkers", "nonhub_initial_checkers", "hub_initial_checkers"
+centrality_measure : str = "degree" #Who counts as a hub in "central_checkers" and "hub_initial_checkers". Can be: "degree", "in_degree", "out_degree", "pagerank", "kcore"
 
 #Input configurations.
 input_data_path : str = "twitter_small_cir.pkl" #path to the input data, only used for real network.
+use_graph_cache : bool = True #If True, the input data is converted once into a fast cache (a directory next to it ending in .csr).
 
 #Output configurations.
 timesteps_per_checkpoint : int = 1
+trajectory_path : str | None = None #If set, everyone's attitude at every time step is recorded in this directory (see TrajectoryRecorder.py).
 save_plot_path : str = "twitter_small_cir_plot.png" #path to save the plot of the fraction believers over time.
 save_network_visualisation_path : str = "network_evolution.gif" #path to save the network visualisation (a GIF showing a picture of the graph evolving).
-visualise_network : bool = False #Whether to make the GIF or not. Turn this to False for large networks: it will take ages and look rubbish.
+visualise_network : bool = False #Whether to make the GIF or not. For large networks, set visualise_max_nodes as well.
+visualise_max_nodes : int = 2000 #Networks with more people are drawn as a sample of this many people (0 draws everyone).
+profile_path : str | None = None #If set, the time spent in each phase and statistics of every step are saved here (.json, or .csv for just the steps).
 
 
 # beta config. See "Spreading Dynamics of Information on Online Social Networks" or the report for an explanation of what these do.
@@ -0,0 +1,56 @@
+import networkx as nx
+import numpy as np
+import pytest
+from networkx.algorithms.link_analysis.pagerank_alg import _pagerank_python
+
+from CompactGraph import CompactGraph
+from CentralityIndex import CentralityIndex
+from SocialNetwork import SocialNetwork
+
+
+def _reference_pagerank(num_people, sources, targets):
+    #PageRank of the follow graph: followers point at the people they follow.
+    follow_graph = nx.DiGraph()
+    follow_graph.add_nodes_from(range(num_people))
+    follow_graph.add_edges_from(zip(targets, sources))
+    scores = _pagerank_python(follow_graph)
+    return np.array([scores[i] for i in range(num_people)])
+
+
+@pytest.mark.parametrize("num_people, sources, targets", [
+    #The last people in id order have no followers.
+    (5, [0, 1, 1, 1], [1, 0, 2, 3]),
+    #Nobody after person 0 has followers.
+    (4, [0, 0, 0], [1, 2, 3]),
+    #People without followers in between.
+    (6, [1, 1, 3, 4, 4], [0, 2, 1, 0, 5]),
+])
+def test_pagerank_matches_networkx(num_people, sources, targets):
+    graph = CompactGraph.from_edges(num_people, np.array(sources), np.array(targets))
+    scores = CentralityIndex(graph).scores("pagerank")
+    np.testing.assert_allclose(scores, _reference_pagerank(num_people, sources, targets), atol=1e-6)
+
+
+def test_pagerank_matches_networkx_on_random_graph():
+    rng = np.random.default_rng(3)
+    sources = rng.integers(0, 150, 600)
+    targets = rng.integers(0, 200, 600)
+    keep = sources != targets
+    sources, targets = sources[keep], targets[keep]
+    graph = CompactGraph.from_edges(200, sources, targets)
+    #from_edges drops repeated edges, so the reference uses the graph's own edges.
+    sources, targets = graph.edges()
+    scores = CentralityIndex(graph).scores("pagerank")
+    np.testing.assert_allclose(scores, _reference_pagerank(200, sources.tolist(), targets.tolist()), atol=1e-6)
+
+
+def test_networkx_centrality_follows_edge_masks():
+    #Two masks of the same size: the index must not mistake the second graph for the first.
+    sn = SocialNetwork.create_random(300, 0.03, seed=1)
+    sn.make_sparse(0.5)
+    first = sn.centrality().scores("degree").copy()
+    sn.clear_interventions()
+    sn.make_sparse(0.5)
+    second = sn.centrality().scores("degree")
+    assert not np.array_equal(first, second)
+    np.testing.assert_array_equal(second, CentralityIndex(sn._as_compact_graph()).scores("degree"))
@@ -0,0 +1,45 @@
+import numpy as np
+
+from Bianconi import BianconiBarabasiModel
+from SocialNetwork import SocialNetwork
+
+
+def _bianconi(backend):
+    model = BianconiBarabasiModel(2000, 3, seed=1)
+    model.run()
+    return SocialNetwork.from_bianconi(model, backend=backend, seed=2)
+
+
+def _run(sn, timesteps):
+    for _ in range(timesteps):
+        sn.evolve_state()
+    return [tuple(record) for record in sn.step_history]
+
+
+def test_unchanged_fork_runs_identically_on_networkx_bianconi():
+    #A networkx graph visits followers in the order the edges were added, which is not sorted for Bianconi networks.
+    sn = _bianconi("networkx")
+    sn.seed_meme(20)
+    _run(sn, 2)
+    fork = sn.fork()
+    assert _run(fork, 10) == _run(sn, 10)
+    assert [person.attitude for person in fork.people] == [person.attitude for person in sn.people]
+
+
+def test_unchanged_fork_runs_identically_on_compact_graph():
+    sn = _bianconi("compact")
+    sn.set_engine("vectorized")
+    sn.seed_meme(20)
+    _run(sn, 2)
+    fork = sn.fork()
+    assert _run(fork, 10) == _run(sn, 10)
+    np.testing.assert_array_equal(fork.people.attitudes, sn.people.attitudes)
+
+
+def test_forks_with_seeds_run_independently():
+    sn = _bianconi("networkx")
+    sn.seed_meme(20)
+    snapshot = sn.snapshot()
+    first, second, again = (sn.fork(snapshot, seed=seed) for seed in (1, 2, 1))
+    assert _run(first, 10) == _run(again, 10)
+    assert _run(first, 10) != _run(second, 10)